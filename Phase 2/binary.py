@@ -3,11 +3,15 @@ The code  below defines a binary search tree (BST) for books, where each node
 stores the book title as the key and a dictionary containing ISBN and author 
 information as the value. The BookBST class allows for inserting new books into 
 the tree while maintaining the binary search property (left child is smaller, 
-right child is larger) and searching for books by their title.
+right child is larger), deleting books, and searching for books by their title. 
+The operations walk the tree iteratively, so a degenerate tree built from sorted 
+titles is slow but never raises RecursionError.
 
 """
 
 class TreeNode:
+    __slots__ = ("key", "value", "left", "right")  # No per-node __dict__, saving memory per book
+
     def __init__(self, key, value):
         self.key = key  # Book title (used as the node's key)
         self.value = value  # Dictionary containing book details (ISBN, author)
@@ -24,33 +28,55 @@ class BookBST:
        # If the root is empty, the new node becomes the root.
         if self.root is None:
             self.root = TreeNode(key, value)  # Insert at the root if tree is empty
-        else:
-            self._insert(self.root, key, value)  # Delegate to helper method for recursive insertion
-    
-    def _insert(self, node, key, value):
-        # Recursively insert a new book into the BST.
-        # Insert left if the key is smaller, and right if larger.
-        if key < node.key:
-            if node.left is None:
-                node.left = TreeNode(key, value)  # Insert as left child
-            else:
-                self._insert(node.left, key, value)  # Recur on the left subtree
-        elif key > node.key:
-            if node.right is None:
-                node.right = TreeNode(key, value)  # Insert as right child
+            return
+        # Walk down iteratively so sorted input can't exhaust the recursion limit
+        node = self.root
+        while True:
+            if key < node.key:
+                if node.left is None:
+                    node.left = TreeNode(key, value)  # Insert as left child
+                    return
+                node = node.left  # Continue in the left subtree
+            elif key > node.key:
+                if node.right is None:
+                    node.right = TreeNode(key, value)  # Insert as right child
+                    return
+                node = node.right  # Continue in the right subtree
             else:
-                self._insert(node.right, key, value)  # Recur on the right subtree
+                return  # Duplicate titles are ignored
+
+    def delete(self, key):
+        # Remove a book by title (key) from the BST.
+        # Return True if it was removed, otherwise return False.
+        parent = None
+        node = self.root
+        while node is not None and node.key != key:
+            parent = node
+            node = node.left if key < node.key else node.right
+        if node is None:
+            return False  # Title not in the tree
+        if node.left is not None and node.right is not None:
+            # Two children: copy the in-order successor here and remove the successor instead
+            parent = node
+            successor = node.right
+            while successor.left is not None:
+                parent = successor
+                successor = successor.left
+            node.key, node.value = successor.key, successor.value
+            node = successor
+        child = node.left if node.left is not None else node.right  # At most one child remains
+        if parent is None:
+            self.root = child
+        elif parent.left is node:
+            parent.left = child
+        else:
+            parent.right = child
+        return True
 
     def search(self, key):
         # Search for a book by title (key) in the BST. 
        #  Return the node if found, otherwise return None.
-        return self._search(self.root, key)  # Start search from the root
-    
-    def _search(self, node, key):
-        # Recursively search for a node with the given key (book title).
-        # Return the node if found, otherwise return None.
-        if node is None or node.key == key:
-            return node  # Base case: found the node or reached the end of the tree
-        if key < node.key:
-            return self._search(node.left, key)  # Recur on the left subtree
-        return self._search(node.right, key)  # Recur on the right subtree
+        node = self.root  # Start search from the root
+        while node is not None and node.key != key:
+            node = node.left if key < node.key else node.right  # Move to the left or right subtree
+        return node
@@ -2,7 +2,8 @@
 The code below defines a library catalog that uses hash tables (dictionaries) to store and retrieve books by their ISBN, title,
 and author. The LibraryCatalog class allows adding new books and searching for books by their ISBN, title,or author. It maintains
 three dictionaries: one mapping ISBNs to book details, another mapping titles to ISBNs for reverse lookup, and a third mapping
-authors to lists of ISBNs for books they have written. 
+authors to lists of ISBNs for books they have written. Batch variants of the ISBN and title searches resolve many
+keys in one call without a method call per key.
 """
 
 class LibraryCatalog:
@@ -29,6 +30,21 @@ class LibraryCatalog:
         isbn = self.books_by_title.get(title, None)
         return self.search_by_isbn(isbn) if isbn else "Book not found"
 
+    def search_many_by_isbn(self, isbns):
+        # Search for a batch of books by ISBN, returning results in input order
+        get = self.books_by_isbn.get
+        return [get(isbn, "Book not found") for isbn in isbns]
+
+    def search_many_by_title(self, titles):
+        # Search for a batch of books by title, returning results in input order
+        get_isbn = self.books_by_title.get
+        get_book = self.books_by_isbn.get
+        results = []
+        for title in titles:
+            isbn = get_isbn(title)
+            results.append(get_book(isbn, "Book not found") if isbn else "Book not found")
+        return results
+
     def search_by_author(self, author):
         # Search for books by author
         return self.books_by_author.get(author, [])
@@ -8,6 +8,8 @@ the linked list.
 
 
 class ListNode:
+    __slots__ = ("book_title", "next")  # No per-node __dict__, saving memory per checked-out book
+
     # Initialize a node with the book title and a pointer to the next node.
     def __init__(self, book_title):
         self.book_title = book_title  # Book title stored in this node
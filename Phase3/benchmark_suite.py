@@ -0,0 +1,311 @@
+"""
+This code is the benchmark harness for the library catalog structures, replacing
+the one-off timing loops that used to live in test_data_structures.py. It runs the
+same workloads against the Phase 2 proof-of-concept structures (LibraryCatalog,
+BookBST, CheckedOutBooks) and the Phase 3 ones (ScalableHashTable,
+ScalableAVLTree, OptimizedCheckedOutBooks):
+
+    build        insert n keys in random order
+    lookup_hit   look up keys that are present
+    lookup_miss  look up keys that are absent
+    delete       remove distinct keys that are present
+
+Sizes are parameterized, lookup keys follow a uniform or Zipf-skewed distribution,
+every timed operation is recorded so latencies can be reported as percentiles,
+each workload gets a warmup pass and can be repeated, and peak memory during the
+build is measured with tracemalloc. Results can be written as JSON and compared
+against an earlier run to spot regressions. Example:
+
+    python benchmark_suite.py --sizes 10000 100000 --zipf 1.1 --repeat 3 --json run.json
+    python benchmark_suite.py --sizes 10000 100000 --zipf 1.1 --compare run.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from itertools import accumulate
+
+from benchmarks import percentile
+from scalable_hash_table import ScalableHashTable
+from scalable_avl_tree import ScalableAVLTree
+from optimized_checked_out_books import OptimizedCheckedOutBooks
+
+# The Phase 2 proof-of-concept structures live in a sibling directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Phase 2"))
+from binary import BookBST
+from hash import LibraryCatalog
+from linkedlist import CheckedOutBooks
+
+class StructureAdapter:
+    """
+    Maps the benchmark workloads onto one structure's own method names. Each
+    operation is a (method name, argument builder) pair; arguments are built from
+    key ids before timing starts, so only the method call itself is measured. A
+    missing operation (None) means the structure doesn't support that workload.
+    max_ops caps the number of timed operations for structures whose lookups or
+    deletes are O(n).
+    """
+
+    def __init__(self, name, factory, insert, lookup=None, delete=None, max_ops=None):
+        self.name = name
+        self.factory = factory
+        self.insert = insert
+        self.lookup = lookup
+        self.delete = delete
+        self.max_ops = max_ops
+
+
+def isbn_key(i):
+    # Key used by the ISBN-keyed structures
+    return f"978-{i:010d}"
+
+
+def title_key(i):
+    # Key used by the title-keyed structures
+    return f"Title {i:08d}"
+
+
+def author_key(i):
+    # Author names repeat so author indexes have realistic list lengths
+    return f"Author {i % 1000}"
+
+
+ISBN_ARGS = lambda i: (isbn_key(i),)
+TITLE_ARGS = lambda i: (title_key(i),)
+
+ADAPTERS = (
+    StructureAdapter(
+        "LibraryCatalog", LibraryCatalog,
+        ("add_book", lambda i: (isbn_key(i), title_key(i), author_key(i))),
+        lookup=("search_by_isbn", ISBN_ARGS)),
+    StructureAdapter(
+        "BookBST", BookBST,
+        ("insert", lambda i: (title_key(i), isbn_key(i))),
+        lookup=("search", TITLE_ARGS),
+        delete=("delete", TITLE_ARGS)),
+    StructureAdapter(
+        "CheckedOutBooks", CheckedOutBooks,
+        ("check_out", TITLE_ARGS),
+        delete=("return_book", TITLE_ARGS),
+        max_ops=500),
+    StructureAdapter(
+        "ScalableHashTable", ScalableHashTable,
+        ("add_book", lambda i: (isbn_key(i), (title_key(i), author_key(i)))),
+        lookup=("search_by_isbn", ISBN_ARGS),
+        delete=("remove_book", ISBN_ARGS)),
+    StructureAdapter(
+        "ScalableAVLTree", ScalableAVLTree,
+        ("insert", lambda i: (title_key(i), isbn_key(i))),
+        lookup=("search", TITLE_ARGS),
+        delete=("delete", TITLE_ARGS)),
+    StructureAdapter(
+        "OptimizedCheckedOutBooks", OptimizedCheckedOutBooks,
+        ("check_out", TITLE_ARGS),
+        delete=("return_book", TITLE_ARGS)),
+)
+
+
+def key_sampler(n, zipf, rng):
+    """
+    Return a function drawing k key ids from range(n). With zipf > 0 the ids follow
+    a Zipf distribution with that exponent (rank r has weight 1 / r**zipf); ranks
+    are shuffled onto ids so the hot keys are scattered through the key space.
+    """
+    ids = list(range(n))
+    if zipf <= 0:
+        return lambda k: [rng.randrange(n) for _ in range(k)]
+    rng.shuffle(ids)
+    cumulative = list(accumulate(1.0 / rank ** zipf for rank in range(1, n + 1)))
+    return lambda k: rng.choices(ids, cum_weights=cumulative, k=k)
+
+
+def time_operations(structure, operation, key_ids):
+    # Run operation for each key id and return the per-call latencies in seconds
+    name, build_args = operation
+    method = getattr(structure, name)
+    arguments = [build_args(i) for i in key_ids]
+    clock = time.perf_counter
+    latencies = []
+    append = latencies.append
+    for args in arguments:
+        start = clock()
+        method(*args)
+        append(clock() - start)
+    return latencies
+
+
+def summarize(latencies):
+    # Reduce raw latencies to throughput and percentile figures
+    total = sum(latencies)
+    return {
+        "ops": len(latencies),
+        "ops_per_s": len(latencies) / total if total else float("inf"),
+        "mean_us": total / len(latencies) * 1e6,
+        "p50_us": percentile(latencies, 0.50) * 1e6,
+        "p90_us": percentile(latencies, 0.90) * 1e6,
+        "p99_us": percentile(latencies, 0.99) * 1e6,
+        "p999_us": percentile(latencies, 0.999) * 1e6,
+        "max_us": max(latencies) * 1e6,
+    }
+
+
+def build(adapter, key_ids):
+    # Create a structure and insert key_ids, returning it with the insert latencies
+    structure = adapter.factory()
+    return structure, time_operations(structure, adapter.insert, key_ids)
+
+
+def measure_peak_memory(adapter, key_ids):
+    # Peak traced bytes while building the structure (run separately, as tracing slows timing)
+    name, build_args = adapter.insert
+    arguments = [build_args(i) for i in key_ids]
+    tracemalloc.start()
+    structure = adapter.factory()
+    method = getattr(structure, name)
+    for args in arguments:
+        method(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def run_structure(adapter, n, ops, zipf, repeat, seed, measure_memory=True):
+    """
+    Run every supported workload for one structure at size n and return a list of
+    result records. Latencies from all repeats are pooled before summarizing.
+    """
+    rng = random.Random(seed)
+    present = list(range(n))
+    rng.shuffle(present)
+    sample = key_sampler(n, zipf, rng)
+    ops = min(ops, adapter.max_ops or ops)
+    records = []
+
+    def record(workload, latencies, **extra):
+        entry = {"structure": adapter.name, "size": n, "workload": workload,
+                 "distribution": f"zipf({zipf})" if zipf > 0 else "uniform"}
+        entry.update(summarize(latencies))
+        entry.update(extra)
+        records.append(entry)
+
+    build_latencies = []
+    structure = None
+    for _ in range(repeat):
+        structure, latencies = build(adapter, present)
+        build_latencies.extend(latencies)
+    extra = {}
+    if measure_memory:
+        peak = measure_peak_memory(adapter, present)
+        extra = {"peak_bytes": peak, "peak_bytes_per_key": peak / n}
+    record("build", build_latencies, **extra)
+
+    if adapter.lookup:
+        for workload, draw in (("lookup_hit", lambda: sample(ops)),
+                               ("lookup_miss", lambda: [n + rng.randrange(n) for _ in range(ops)])):
+            time_operations(structure, adapter.lookup, draw()[:max(1, ops // 10)])  # Warmup
+            latencies = []
+            for _ in range(repeat):
+                latencies.extend(time_operations(structure, adapter.lookup, draw()))
+            record(workload, latencies)
+
+    if adapter.delete:
+        latencies = []
+        for _ in range(repeat):
+            # Deletes consume keys, so every repeat starts from a freshly built structure
+            structure, _ = build(adapter, present)
+            latencies.extend(time_operations(structure, adapter.delete, rng.sample(present, min(ops, n))))
+        record("delete", latencies)
+    return records
+
+
+def run_suite(sizes=(10000, 100000), ops=20000, zipf=0.0, repeat=3, seed=42,
+              structures=None, measure_memory=True):
+    """
+    Run the suite and return a JSON-serializable report. structures optionally
+    restricts the run to the named adapters.
+    """
+    selected = [a for a in ADAPTERS if structures is None or a.name in structures]
+    results = []
+    for n in sizes:
+        for adapter in selected:
+            for entry in run_structure(adapter, n, ops, zipf, repeat, seed, measure_memory):
+                results.append(entry)
+                print_record(entry)
+    return {
+        "meta": {
+            "python": sys.version.split()[0],
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "sizes": list(sizes), "ops": ops, "zipf": zipf, "repeat": repeat, "seed": seed,
+        },
+        "results": results,
+    }
+
+
+def print_record(entry):
+    # Print one result line
+    memory = f"  peak {entry['peak_bytes_per_key']:6.1f} B/key" if "peak_bytes_per_key" in entry else ""
+    print(f"{entry['structure']:25} n={entry['size']:<9,} {entry['workload']:12} "
+          f"{entry['ops_per_s']:12,.0f} ops/s  p50 {entry['p50_us']:8.2f} us  "
+          f"p99 {entry['p99_us']:8.2f} us  max {entry['max_us']:10.1f} us{memory}")
+
+
+def compare_reports(baseline, current, threshold=0.10):
+    """
+    Print the change in p50 latency and throughput for every (structure, size,
+    workload) present in both reports, flagging throughput drops beyond threshold.
+    Returns the list of regressed keys.
+    """
+    def index(report):
+        return {(r["structure"], r["size"], r["workload"], r["distribution"]): r for r in report["results"]}
+
+    old, new = index(baseline), index(current)
+    regressions = []
+    for key in sorted(set(old) & set(new), key=str):
+        ratio = new[key]["ops_per_s"] / old[key]["ops_per_s"]
+        flag = ""
+        if ratio < 1 - threshold:
+            flag = "  REGRESSION"
+            regressions.append(key)
+        print(f"{key[0]:25} n={key[1]:<9,} {key[2]:12} throughput x{ratio:5.2f}  "
+              f"p50 {old[key]['p50_us']:8.2f} -> {new[key]['p50_us']:8.2f} us{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the library catalog structures.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000],
+                        help="structure sizes to benchmark")
+    parser.add_argument("--ops", type=int, default=20000, help="timed operations per workload")
+    parser.add_argument("--zipf", type=float, default=0.0,
+                        help="Zipf exponent for lookup keys (0 for uniform)")
+    parser.add_argument("--repeat", type=int, default=3, help="repetitions per workload")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--structures", nargs="+", choices=[a.name for a in ADAPTERS],
+                        help="only benchmark these structures")
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc peak measurement")
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--compare", help="compare against a report written earlier with --json")
+    args = parser.parse_args(argv)
+
+    report = run_suite(args.sizes, args.ops, args.zipf, args.repeat, args.seed,
+                       args.structures, not args.no_memory)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"\nComparison against {args.compare}:")
+        compare_reports(baseline, report)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,992 @@
+"""
+This code collects benchmarks for the Phase 3 data structures. Each benchmark
+function builds its inputs up front so that only the structure under test is
+measured, prints a short comparison table, and returns the raw numbers so the
+results can be reused elsewhere. Run the module directly to execute all of them,
+optionally passing the number of entries to use (default 200,000).
+"""
+
+import csv
+import gc
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+from scalable_hash_table import ScalableHashTable
+from compact_hash_table import CompactHashTable
+from scalable_avl_tree import AVLNode, ScalableAVLTree
+from optimized_checked_out_books import OptimizedCheckedOutBooks
+from concurrent_catalog import ConcurrentCatalog, ConcurrentCheckedOutBooks
+from sharded_catalog import ShardedCatalog
+from checkout_ledger import CheckoutLedger
+from lookup_cache import LookupCache, CachedCatalog, CachedAVLTree
+from catalog_ingest import ingest
+from title_search import TitleSearchIndex, tokenize
+from instrumentation import instrument, uninstrument
+from write_ahead_log import DurableCatalog
+from key_encoding import EncodedCatalog
+
+# The Phase 2 proof-of-concept structures live in a sibling directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Phase 2"))
+from binary import BookBST
+from linkedlist import CheckedOutBooks
+from hash import LibraryCatalog
+
+
+def percentile(samples, fraction):
+    # Return the given percentile (0.0-1.0) of a list of samples
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(fraction * len(ordered)))
+    return ordered[index]
+
+
+def measure_memory(build):
+    # Return the bytes allocated by build() that are still alive once it returns
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return after - before
+
+
+def benchmark_hash_tables(n=200000):
+    """
+    Compare the chaining ScalableHashTable with the open-addressing CompactHashTable.
+    Reports structural memory per entry (keys and values are pre-built and excluded)
+    and per-call add_book latency percentiles, where resize pauses show up in p99/max.
+    """
+    print(f"Hash table benchmark ({n:,} entries)")
+    isbns = [f"978-{i:010d}" for i in range(n)]
+    books = [(f"Book {i}", f"Author {i}") for i in range(n)]
+    results = {}
+    for name, cls in (("chaining", ScalableHashTable), ("open-addressing", CompactHashTable)):
+        def build():
+            table = cls()
+            for isbn, book in zip(isbns, books):
+                table.add_book(isbn, book)
+            return table
+        memory = measure_memory(build)
+
+        table = cls()
+        latencies = []
+        clock = time.perf_counter
+        for isbn, book in zip(isbns, books):
+            start = clock()
+            table.add_book(isbn, book)
+            latencies.append(clock() - start)
+        results[name] = {
+            "bytes_per_entry": memory / n,
+            "insert_p50_us": percentile(latencies, 0.50) * 1e6,
+            "insert_p99_us": percentile(latencies, 0.99) * 1e6,
+            "insert_max_ms": max(latencies) * 1e3,
+            "total_s": sum(latencies),
+        }
+        r = results[name]
+        print(f"  {name:16} {r['bytes_per_entry']:7.1f} B/entry  "
+              f"p50 {r['insert_p50_us']:6.2f} us  p99 {r['insert_p99_us']:6.2f} us  "
+              f"max {r['insert_max_ms']:8.2f} ms  total {r['total_s']:.2f} s")
+    return results
+
+
+def benchmark_avl_bulk_load(n=200000):
+    """
+    Compare building a ScalableAVLTree with repeated insert against bulk_load, and
+    merging a 10% batch into an existing tree against inserting it key by key.
+    """
+    print(f"AVL bulk load benchmark ({n:,} entries)")
+    pairs = [(f"Book {i:08d}", f"ISBN-{i}") for i in range(n)]
+    shuffled = pairs[:]
+    random.Random(42).shuffle(shuffled)
+    batch = [(f"Book {i:08d}a", f"ISBN-{i}a") for i in range(0, n, 10)]
+    results = {}
+
+    start = time.perf_counter()
+    tree = ScalableAVLTree()
+    for key, value in shuffled:
+        tree.insert(key, value)
+    results["insert_loop_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ScalableAVLTree.bulk_load(shuffled)
+    results["bulk_load_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ScalableAVLTree.bulk_load(pairs, presorted=True)
+    results["bulk_load_presorted_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for key, value in batch:
+        tree.insert(key, value)
+    results["batch_insert_loop_s"] = time.perf_counter() - start
+
+    tree = ScalableAVLTree.bulk_load(pairs, presorted=True)
+    start = time.perf_counter()
+    tree.merge(batch)
+    results["batch_merge_s"] = time.perf_counter() - start
+
+    for name, seconds in results.items():
+        print(f"  {name:22} {seconds:7.3f} s")
+    return results
+
+
+class RecursiveAVLTree:
+    """
+    Baseline for benchmark_tree_operations: the original recursive AVL insert and
+    search, on the same slotted nodes as ScalableAVLTree. It has no delete and
+    doesn't maintain subtree sizes.
+    """
+
+    def __init__(self):
+        self.root = None
+
+    @staticmethod
+    def _height(node):
+        return node.height if node else 0
+
+    def _rotate_right(self, y):
+        x = y.left
+        y.left, x.right = x.right, y
+        y.height = 1 + max(self._height(y.left), self._height(y.right))
+        x.height = 1 + max(self._height(x.left), self._height(x.right))
+        return x
+
+    def _rotate_left(self, x):
+        y = x.right
+        x.right, y.left = y.left, x
+        x.height = 1 + max(self._height(x.left), self._height(x.right))
+        y.height = 1 + max(self._height(y.left), self._height(y.right))
+        return y
+
+    def insert(self, key, value):
+        self.root = self._insert(self.root, key, value)
+
+    def _insert(self, node, key, value):
+        if not node:
+            return AVLNode(key, value)
+        if key < node.key:
+            node.left = self._insert(node.left, key, value)
+        elif key > node.key:
+            node.right = self._insert(node.right, key, value)
+        else:
+            return node
+        node.height = 1 + max(self._height(node.left), self._height(node.right))
+        balance = self._height(node.left) - self._height(node.right)
+        if balance > 1 and key < node.left.key:
+            return self._rotate_right(node)
+        if balance < -1 and key > node.right.key:
+            return self._rotate_left(node)
+        if balance > 1 and key > node.left.key:
+            node.left = self._rotate_left(node.left)
+            return self._rotate_right(node)
+        if balance < -1 and key < node.right.key:
+            node.right = self._rotate_right(node.right)
+            return self._rotate_left(node)
+        return node
+
+    def search(self, key):
+        return self._search(self.root, key)
+
+    def _search(self, node, key):
+        if not node or node.key == key:
+            return node
+        if key < node.key:
+            return self._search(node.left, key)
+        return self._search(node.right, key)
+
+
+def benchmark_tree_operations(n=200000):
+    """
+    Time inserting, looking up and deleting n shuffled keys in ScalableAVLTree and
+    the Phase 2 BookBST, and inserting and looking them up in the recursive
+    RecursiveAVLTree. Keys are shuffled so the unbalanced BookBST stays shallow.
+    """
+    print(f"Tree operations benchmark ({n:,} keys)")
+    keys = [f"Book {i:08d}" for i in range(n)]
+    random.Random(42).shuffle(keys)
+    lookups = keys[:]
+    random.Random(7).shuffle(lookups)
+    results = {}
+    for name, cls in (("RecursiveAVLTree", RecursiveAVLTree), ("ScalableAVLTree", ScalableAVLTree),
+                      ("BookBST", BookBST)):
+        tree = cls()
+        start = time.perf_counter()
+        for key in keys:
+            tree.insert(key, key)
+        insert_s = time.perf_counter() - start
+        start = time.perf_counter()
+        for key in lookups:
+            tree.search(key)
+        search_s = time.perf_counter() - start
+        results[name] = {"insert_s": insert_s, "search_s": search_s}
+        if not hasattr(tree, "delete"):
+            print(f"  {name:16} insert {insert_s:6.2f} s  search {search_s:6.2f} s")
+            continue
+        start = time.perf_counter()
+        for key in lookups:
+            tree.delete(key)
+        results[name]["delete_s"] = time.perf_counter() - start
+        print(f"  {name:16} insert {insert_s:6.2f} s  search {search_s:6.2f} s  "
+              f"delete {results[name]['delete_s']:6.2f} s")
+    return results
+
+
+def benchmark_node_memory(n=200000):
+    """
+    Report structural bytes per key for the node-based structures: ScalableAVLTree,
+    the Phase 2 BookBST and the Phase 2 linked-list CheckedOutBooks. Keys and values
+    are pre-built and shared, so only node overhead is counted.
+    """
+    print(f"Node memory benchmark ({n:,} keys)")
+    keys = [f"Book {i:08d}" for i in range(n)]
+    random.Random(42).shuffle(keys)
+
+    def build_avl():
+        return ScalableAVLTree.bulk_load((key, key) for key in keys)
+
+    def build_bst():
+        tree = BookBST()
+        for key in keys:
+            tree.insert(key, key)
+        return tree
+
+    def build_list():
+        books = CheckedOutBooks()
+        for key in keys:
+            books.check_out(key)
+        return books
+
+    results = {}
+    for name, build in (("ScalableAVLTree", build_avl), ("BookBST", build_bst),
+                        ("CheckedOutBooks", build_list)):
+        results[name] = measure_memory(build) / n
+        print(f"  {name:16} {results[name]:7.1f} B/key")
+    return results
+
+
+def benchmark_batch_lookups(n=200000, batch_size=500):
+    """
+    Compare per-key cost of the batch lookup APIs with a loop of single-key calls,
+    resolving batches of batch_size random keys (about 10% misses) against n entries.
+    """
+    print(f"Batch lookup benchmark ({n:,} entries, batches of {batch_size})")
+    rng = random.Random(42)
+    avl_tree = ScalableAVLTree.bulk_load((f"Book {i:08d}", f"ISBN-{i}") for i in range(n))
+    table = ScalableHashTable()
+    catalog = LibraryCatalog()
+    for i in range(n):
+        table.add_book(f"ISBN-{i}", (f"Book {i:08d}", f"Author {i % 1000}"))
+        catalog.add_book(f"ISBN-{i}", f"Book {i:08d}", f"Author {i % 1000}")
+    batches = []
+    for _ in range(max(1, 200000 // batch_size)):
+        ids = [rng.randrange(int(n * 1.1)) for _ in range(batch_size)]
+        batches.append(([f"Book {i:08d}" for i in ids], [f"ISBN-{i}" for i in ids]))
+
+    cases = (
+        ("ScalableAVLTree", lambda titles, isbns: [avl_tree.search(t) for t in titles],
+         lambda titles, isbns: avl_tree.search_many(titles)),
+        ("ScalableHashTable", lambda titles, isbns: [table.search_by_isbn(k) for k in isbns],
+         lambda titles, isbns: table.search_many_by_isbn(isbns)),
+        ("LibraryCatalog", lambda titles, isbns: [catalog.search_by_title(t) for t in titles],
+         lambda titles, isbns: catalog.search_many_by_title(titles)),
+    )
+    total_keys = len(batches) * batch_size
+    results = {}
+    for name, single, many in cases:
+        timings = {}
+        for mode, lookup in (("single", single), ("many", many)):
+            start = time.perf_counter()
+            for titles, isbns in batches:
+                lookup(titles, isbns)
+            timings[mode] = (time.perf_counter() - start) / total_keys * 1e9
+        results[name] = {"single_ns_per_key": timings["single"], "many_ns_per_key": timings["many"]}
+        print(f"  {name:18} single {timings['single']:7.0f} ns/key  "
+              f"search_many {timings['many']:7.0f} ns/key")
+    return results
+
+
+def benchmark_snapshot_startup(n=200000):
+    """
+    Compare cold-start options for an n-book catalog: re-inserting every book into
+    ScalableHashTable and ScalableAVLTree, bulk-loading the tree, and mapping saved
+    snapshots. Also reports lookup cost on the mapped snapshot.
+    """
+    print(f"Snapshot start-up benchmark ({n:,} books)")
+    books = [(f"978-{i:010d}", (f"Book {i:08d}", f"Author {i % 1000}")) for i in range(n)]
+    random.Random(42).shuffle(books)
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        table_path = os.path.join(directory, "table.snap")
+        tree_path = os.path.join(directory, "tree.snap")
+
+        start = time.perf_counter()
+        table = ScalableHashTable()
+        for isbn, book in books:
+            table.add_book(isbn, book)
+        results["rebuild_hash_table_s"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        tree = ScalableAVLTree()
+        for isbn, book in books:
+            tree.insert(book[0], isbn)
+        results["rebuild_avl_tree_s"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        ScalableAVLTree.bulk_load((book[0], isbn) for isbn, book in books)
+        results["bulk_load_avl_tree_s"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        table.save(table_path)
+        tree.save(tree_path)
+        results["save_both_s"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        mapped_table = ScalableHashTable.load(table_path)
+        mapped_tree = ScalableAVLTree.load(tree_path)
+        mapped_table.search_by_isbn(books[0][0])
+        results["load_both_s"] = time.perf_counter() - start
+
+        lookups = [isbn for isbn, _ in books[:20000]]
+        start = time.perf_counter()
+        for isbn in lookups:
+            mapped_table.search_by_isbn(isbn)
+        results["mapped_lookup_us"] = (time.perf_counter() - start) / len(lookups) * 1e6
+        results["snapshot_mb"] = (os.path.getsize(table_path) + os.path.getsize(tree_path)) / 1e6
+        mapped_table.close()
+        mapped_tree.close()
+
+    for name, amount in results.items():
+        print(f"  {name:22} {amount:9.4f}")
+    return results
+
+
+class GlobalLockCatalog:
+    """
+    Baseline for benchmark_concurrency: a ScalableHashTable and an
+    OptimizedCheckedOutBooks behind one lock shared by every operation.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.table = ScalableHashTable()
+        self.checked_out = OptimizedCheckedOutBooks()
+
+    def add_book(self, key, value):
+        with self.lock:
+            self.table.add_book(key, value)
+
+    def search_by_isbn(self, isbn):
+        with self.lock:
+            return self.table.search_by_isbn(isbn)
+
+    def check_out(self, book_title):
+        with self.lock:
+            self.checked_out.check_out(book_title)
+
+    def return_book(self, book_title):
+        with self.lock:
+            return self.checked_out.return_book(book_title)
+
+
+class StripedCatalog:
+    """
+    The striped design for benchmark_concurrency: ConcurrentCatalog plus
+    ConcurrentCheckedOutBooks, exposing the same four operations as GlobalLockCatalog.
+    """
+
+    def __init__(self):
+        self.catalog = ConcurrentCatalog()
+        self.checked_out = ConcurrentCheckedOutBooks()
+        self.add_book = self.catalog.add_book
+        self.search_by_isbn = self.catalog.search_by_isbn
+        self.check_out = self.checked_out.check_out
+        self.return_book = self.checked_out.return_book
+
+
+def benchmark_concurrency(n=200000, thread_counts=(1, 2, 4, 8)):
+    """
+    Measure desk throughput (operations per second) with several worker threads
+    for one global lock versus the striped, lock-free-read design. Each worker does
+    80% ISBN lookups, 10% check-outs/returns and 10% new books, so the catalog
+    keeps resizing while readers run. Lookup latency is also recorded, since the
+    striped design's main benefit under the GIL is that reads don't queue behind a resize.
+    """
+    print(f"Concurrency benchmark ({n:,} operations per run)")
+    results = {}
+    for threads in thread_counts:
+        per_thread = n // threads
+        for name, cls in (("global lock", GlobalLockCatalog), ("striped", StripedCatalog)):
+            desk = cls()
+            for i in range(10000):
+                desk.add_book(f"978-{i}", (f"Book {i}", f"Author {i}"))
+
+            lookup_latencies = []
+
+            def worker(seed):
+                rng = random.Random(seed)
+                clock = time.perf_counter
+                latencies = []
+                for j in range(per_thread):
+                    roll = rng.random()
+                    if roll < 0.8:
+                        isbn = f"978-{rng.randrange(10000)}"
+                        begin = clock()
+                        desk.search_by_isbn(isbn)
+                        latencies.append(clock() - begin)
+                    elif roll < 0.85:
+                        desk.check_out(f"Book {rng.randrange(10000)}")
+                    elif roll < 0.9:
+                        desk.return_book(f"Book {rng.randrange(10000)}")
+                    else:
+                        desk.add_book(f"978-{seed}-{j}", (f"Book {seed}-{j}", "Author"))
+                lookup_latencies.extend(latencies)
+
+            workers = [threading.Thread(target=worker, args=(seed,)) for seed in range(threads)]
+            start = time.perf_counter()
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+            ops_per_s = per_thread * threads / (time.perf_counter() - start)
+            results[f"{name} x{threads}"] = {
+                "ops_per_s": ops_per_s,
+                "lookup_p99_us": percentile(lookup_latencies, 0.99) * 1e6,
+                "lookup_max_ms": max(lookup_latencies) * 1e3,
+            }
+            r = results[f"{name} x{threads}"]
+            print(f"  {name:12} {threads} threads  {ops_per_s:10,.0f} ops/s  "
+                  f"lookup p99 {r['lookup_p99_us']:7.1f} us  max {r['lookup_max_ms']:7.2f} ms")
+    return results
+
+
+def benchmark_sharded_catalog(n=200000, lookups=200000, batch_size=1000, shard_counts=None):
+    """
+    Measure batch ISBN lookup throughput against the number of shard processes,
+    with one in-process ScalableHashTable as the baseline. By default the shard
+    counts are powers of two up to the number of CPUs (at least 1 and 2).
+    """
+    cores = multiprocessing.cpu_count()
+    shard_counts = shard_counts or sorted({1, 2} | {2 ** k for k in range(cores.bit_length()) if 2 ** k <= cores})
+    print(f"Sharded catalog benchmark ({n:,} books, {lookups:,} lookups in batches of {batch_size}, "
+          f"{cores} CPUs)")
+    rng = random.Random(42)
+    books = [(f"978-{i}", f"Book {i:08d}", f"Author {i % 1000}") for i in range(n)]
+    batches = [[f"978-{rng.randrange(n)}" for _ in range(batch_size)] for _ in range(lookups // batch_size)]
+
+    table = ScalableHashTable()
+    for isbn, title, author in books:
+        table.add_book(isbn, (title, author))
+    start = time.perf_counter()
+    for batch in batches:
+        table.search_many_by_isbn(batch)
+    results = {"in-process": lookups / (time.perf_counter() - start)}
+    print(f"  {'in-process':12} {results['in-process']:12,.0f} lookups/s")
+
+    for shards in shard_counts:
+        with ShardedCatalog(shards) as catalog:
+            for i in range(0, n, 10000):
+                catalog.add_books(books[i:i + 10000])
+            start = time.perf_counter()
+            for batch in batches:
+                catalog.search_many_by_isbn(batch)
+            name = f"{shards} shards"
+            results[name] = lookups / (time.perf_counter() - start)
+        print(f"  {name:12} {results[name]:12,.0f} lookups/s  x{results[name] / results['in-process']:.2f}")
+    return results
+
+
+def benchmark_checkout_ledger(n=1000000, overdue_fraction=0.01):
+    """
+    Build a CheckoutLedger with n active loans and time the nightly overdue sweep
+    (about overdue_fraction of loans overdue) against a full scan, plus per-patron
+    lookups and returns.
+    """
+    print(f"Checkout ledger benchmark ({n:,} active loans)")
+    rng = random.Random(42)
+    ledger = CheckoutLedger()
+    patrons = max(1, n // 20)
+    start = time.perf_counter()
+    for i in range(n):
+        ledger.check_out(f"978-{i:010d}", f"patron {rng.randrange(patrons)}", rng.random())
+    results = {"check_out_us": (time.perf_counter() - start) / n * 1e6}
+
+    now = overdue_fraction
+    start = time.perf_counter()
+    overdue = ledger.overdue(now)
+    results["overdue_heap_ms"] = (time.perf_counter() - start) * 1e3
+    start = time.perf_counter()
+    scanned = sorted((loan for loan in ledger.loans.values() if loan.due < now), key=lambda loan: loan.due)
+    results["overdue_scan_ms"] = (time.perf_counter() - start) * 1e3
+    assert len(overdue) == len(scanned)
+    results["overdue_loans"] = len(overdue)
+
+    queries = [f"patron {rng.randrange(patrons)}" for _ in range(10000)]
+    start = time.perf_counter()
+    for patron in queries:
+        ledger.loans_for(patron)
+    results["loans_for_us"] = (time.perf_counter() - start) / len(queries) * 1e6
+
+    returns = [f"978-{rng.randrange(n):010d}" for _ in range(10000)]
+    start = time.perf_counter()
+    for isbn in returns:
+        ledger.return_book(isbn)
+    results["return_us"] = (time.perf_counter() - start) / len(returns) * 1e6
+
+    for name, amount in results.items():
+        print(f"  {name:18} {amount:12.3f}")
+    return results
+
+
+def benchmark_lookup_cache(n=200000, lookups=200000, zipf=1.1, maxsize=1000):
+    """
+    Time Zipf-skewed searches (about 5% misses) with and without a maxsize-entry
+    LookupCache in front: titles on ScalableAVLTree and ScalableHashTable, and
+    ISBNs on a memory-mapped snapshot, where each uncached lookup is expensive.
+    """
+    print(f"Lookup cache benchmark ({n:,} books, {lookups:,} Zipf({zipf}) lookups, cache {maxsize})")
+    rng = random.Random(42)
+    tree = ScalableAVLTree.bulk_load((f"Book {i:08d}", f"978-{i}") for i in range(n))
+    table = ScalableHashTable()
+    for i in range(n):
+        table.add_book(f"978-{i}", (f"Book {i:08d}", f"Author {i % 1000}"))
+    ranks = list(range(int(n * 1.05)))  # Ids past n are books that don't exist
+    rng.shuffle(ranks)
+    weights = [1.0 / (r + 1) ** zipf for r in range(len(ranks))]
+    ids = rng.choices(ranks, weights=weights, k=lookups)
+    titles = [f"Book {i:08d}" for i in ids]
+    isbns = [f"978-{i}" for i in ids]
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "table.snap")
+        table.save(path)
+        mapped = ScalableHashTable.load(path)
+        cached_tree = CachedAVLTree(tree, LookupCache(maxsize))
+        cached_table = CachedCatalog(table, LookupCache(maxsize))
+        cached_mapped = CachedCatalog(mapped, LookupCache(maxsize))
+        cases = (
+            ("ScalableAVLTree", titles, tree.search, cached_tree.search, cached_tree.cache),
+            ("ScalableHashTable", titles, table.search_by_title, cached_table.search_by_title,
+             cached_table.cache),
+            ("MappedCatalog", isbns, mapped.search_by_isbn, cached_mapped.search_by_isbn,
+             cached_mapped.cache),
+        )
+        for name, keys, direct, cached_search, cache in cases:
+            timings = {}
+            for mode, search in (("direct", direct), ("cached", cached_search)):
+                start = time.perf_counter()
+                for key in keys:
+                    search(key)
+                timings[mode] = (time.perf_counter() - start) / lookups * 1e9
+            stats = cache.stats()
+            results[name] = {"direct_ns": timings["direct"], "cached_ns": timings["cached"], **stats}
+            print(f"  {name:18} direct {timings['direct']:7.0f} ns  cached {timings['cached']:7.0f} ns  "
+                  f"hit rate {stats['hit_rate']:.1%}  evictions {stats['evictions']:,}")
+        mapped.close()
+    return results
+
+
+def synthetic_titles(n, vocabulary=50000, zipf=1.0, seed=42):
+    # n (title, author) pairs of 2-6 made-up words drawn Zipf-style from a fixed vocabulary
+    rng = random.Random(seed)
+    syllables = [c + v for c in "bcdfghklmnprstvz" for v in "aeiou"] + ["th", "st", "er", "on", "an"]
+    words = set()
+    while len(words) < vocabulary:
+        words.add("".join(rng.choices(syllables, k=rng.randint(2, 4))))
+    words = sorted(words)
+    rng.shuffle(words)
+    cumulative = []
+    total = 0.0
+    for rank in range(1, vocabulary + 1):
+        total += 1.0 / rank ** zipf
+        cumulative.append(total)
+    surnames = words[1000:21000]
+    books = []
+    for i in range(n):
+        title = " ".join(rng.choices(words, cum_weights=cumulative, k=rng.randint(2, 6))).title()
+        books.append((title, f"{words[i % 997].title()} {surnames[i % len(surnames)].title()}"))
+    return books
+
+
+def benchmark_title_search(n=200000, queries=2000, scans=5):
+    """
+    Build a TitleSearchIndex over n synthetic titles and time one-word, two-word
+    and misspelled two-word queries (words taken from real titles, top 10 results),
+    against a linear scan over every title for the same words.
+    """
+    print(f"Title search benchmark ({n:,} titles, {queries:,} queries per kind)")
+    rng = random.Random(7)
+    books = synthetic_titles(n)
+    index = TitleSearchIndex()
+    start = time.perf_counter()
+    for i, (title, author) in enumerate(books):
+        index.add_book(f"978-{i}", title, author)
+    build_s = time.perf_counter() - start
+    print(f"  build {build_s:.1f} s ({n / build_s:,.0f} titles/s), vocabulary {len(index.postings):,} tokens")
+
+    def sample_words(count):
+        words = tokenize(books[rng.randrange(n)][0])
+        return rng.sample(words, min(count, len(words)))
+
+    def misspell(word):
+        i = rng.randrange(len(word))
+        return word[:i] + rng.choice("abcdefghijklmnopqrstuvwxyz".replace(word[i], "")) + word[i + 1:]
+
+    kinds = {
+        "one word": [" ".join(sample_words(1)) for _ in range(queries)],
+        "two words": [" ".join(sample_words(2)) for _ in range(queries)],
+        "one typo": [" ".join(misspell(w) if len(w) >= 6 else w for w in sample_words(2))
+                     for _ in range(queries)],
+        "two typos": [" ".join(misspell(misspell(w)) if len(w) >= 6 else w for w in sample_words(2))
+                      for _ in range(queries)],
+    }
+    results = {"build_s": build_s}
+    for kind, texts in kinds.items():
+        latencies = []
+        for text in texts:
+            start = time.perf_counter()
+            index.search(text, k=10)
+            latencies.append(time.perf_counter() - start)
+        results[kind] = {"mean_us": sum(latencies) / len(latencies) * 1e6,
+                         "p50_us": percentile(latencies, 0.50) * 1e6,
+                         "p99_us": percentile(latencies, 0.99) * 1e6}
+        print(f"  {kind:12} mean {results[kind]['mean_us']:8.1f} us  p50 {results[kind]['p50_us']:8.1f} us  "
+              f"p99 {results[kind]['p99_us']:8.1f} us")
+
+    titles = [title.lower() for title, _ in books]
+    start = time.perf_counter()
+    for text in kinds["two words"][:scans]:
+        words = text.split()
+        [i for i, title in enumerate(titles) if all(word in title for word in words)]
+    results["linear_scan_us"] = (time.perf_counter() - start) / scans * 1e6
+    print(f"  linear scan  mean {results['linear_scan_us']:8.0f} us (two words, substring match)")
+    return results
+
+
+def benchmark_instrumentation(n=200000):
+    """
+    Time n hash table adds and lookups and n AVL inserts and searches on plain
+    structures, on instrumented ones, and again after uninstrumenting, to show
+    what recording costs and that switching it off costs nothing.
+    """
+    print(f"Instrumentation overhead ({n:,} operations per phase)")
+    rng = random.Random(42)
+    keys = [f"978-{i}" for i in range(n)]
+    rng.shuffle(keys)
+    results = {}
+    for mode in ("plain", "instrumented", "uninstrumented"):
+        table = tree = None
+        gc.collect()  # Don't bill this phase for collecting the previous phase's structures
+        table = ScalableHashTable()
+        tree = ScalableAVLTree()
+        if mode != "plain":
+            instrument(table)
+            instrument(tree)
+        if mode == "uninstrumented":
+            uninstrument(table)
+            uninstrument(tree)
+        timings = {}
+        for name, method, args in (("table add", table.add_book, [(k, (k, "Author")) for k in keys]),
+                                   ("table lookup", table.search_by_isbn, [(k,) for k in keys]),
+                                   ("tree insert", tree.insert, [(k, k) for k in keys]),
+                                   ("tree search", tree.search, [(k,) for k in keys])):
+            start = time.perf_counter()
+            for arguments in args:
+                method(*arguments)
+            timings[name] = (time.perf_counter() - start) / n * 1e9
+        results[mode] = timings
+        print(f"  {mode:15} " + "  ".join(f"{name} {ns:6.0f} ns" for name, ns in timings.items()))
+    return results
+
+
+def benchmark_write_ahead_log(n=200000, writes=20000, thread_counts=(1, 4, 16, 64), directory=None):
+    """
+    Measure durable writes per second to a DurableCatalog with group commit on and
+    off, for several writer threads, and how many records share each fsync. Then
+    time recovery of n logged writes by replaying the log, and from a checkpoint.
+    directory chooses the file system under test (default: the temp directory).
+    """
+    print(f"Write-ahead log benchmark ({writes:,} durable writes per run, {n:,} for recovery)")
+    results = {}
+    for group_commit in (False, True):
+        for threads in thread_counts:
+            with tempfile.TemporaryDirectory(dir=directory) as path:
+                catalog = DurableCatalog(path, group_commit=group_commit, checkpoint_interval=None)
+                per_thread = writes // threads
+
+                def writer(thread):
+                    for i in range(per_thread):
+                        catalog.add_book(f"978-{thread}-{i}", (f"Book {thread}-{i}", "Author"))
+
+                workers = [threading.Thread(target=writer, args=(thread,)) for thread in range(threads)]
+                start = time.perf_counter()
+                for thread in workers:
+                    thread.start()
+                for thread in workers:
+                    thread.join()
+                elapsed = time.perf_counter() - start
+                catalog.close()
+            name = f"group commit {'on' if group_commit else 'off'} x{threads}"
+            results[name] = {"writes_per_s": per_thread * threads / elapsed,
+                             "records_per_fsync": per_thread * threads / catalog.log.commits}
+            r = results[name]
+            print(f"  {name:22} {r['writes_per_s']:10,.0f} writes/s  {r['records_per_fsync']:6.1f} records/fsync")
+
+    with tempfile.TemporaryDirectory(dir=directory) as path:
+        with DurableCatalog(path, sync=False, checkpoint_interval=None) as catalog:
+            for i in range(n):
+                catalog.add_book(f"978-{i}", (f"Book {i}", f"Author {i % 1000}"))
+        log_bytes = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+        gc.collect()
+        start = time.perf_counter()
+        catalog = DurableCatalog(path, checkpoint_interval=None)
+        results["replay_s"] = time.perf_counter() - start
+        assert catalog.replayed == n
+        start = time.perf_counter()
+        catalog.checkpoint()
+        results["checkpoint_s"] = time.perf_counter() - start
+        catalog.close()
+        catalog = None
+        gc.collect()
+        start = time.perf_counter()
+        DurableCatalog(path, checkpoint_interval=None).close()
+        results["checkpoint_recovery_s"] = time.perf_counter() - start
+    print(f"  replay {n:,} records ({log_bytes / 1e6:.0f} MB)  {results['replay_s']:6.2f} s  "
+          f"({n / results['replay_s']:,.0f} records/s)")
+    print(f"  full checkpoint  {results['checkpoint_s']:6.2f} s   recovery from it  "
+          f"{results['checkpoint_recovery_s']:6.2f} s")
+    return results
+
+
+def benchmark_persistent_avl(n=200000, versions=2000, seconds=3.0):
+    """
+    Compare a plain ScalableAVLTree with a persistent (path-copying) one: insert
+    cost, memory kept alive per retained snapshot, and full-tree reader scans per
+    second while a writer thread keeps inserting. The plain tree either holds one
+    lock for a whole scan or copies the tree under the lock and scans the copy;
+    the persistent tree's readers scan an O(1) snapshot without any lock.
+    """
+    print(f"Persistent AVL tree benchmark ({n:,} keys)")
+    rng = random.Random(42)
+    keys = [f"Book {i:08d}" for i in range(n)]
+    rng.shuffle(keys)
+    results = {}
+    for name, persistent in (("plain", False), ("persistent", True)):
+        gc.collect()
+        tree = ScalableAVLTree(persistent=persistent)
+        start = time.perf_counter()
+        for key in keys:
+            tree.insert(key, key)
+        results[f"{name} insert_us"] = (time.perf_counter() - start) / n * 1e6
+    print(f"  insert           plain {results['plain insert_us']:6.2f} us   "
+          f"persistent {results['persistent insert_us']:6.2f} us")
+
+    # Memory per version: each insert followed by a retained snapshot, against one full copy
+    extra = [f"Extra {i:08d}" for i in range(versions)]
+
+    def build_versions():
+        kept = []
+        for key in extra:
+            tree.insert(key, key)
+            kept.append(tree.snapshot())
+        return kept
+
+    results["bytes_per_version"] = measure_memory(build_versions) / versions
+    plain = ScalableAVLTree.bulk_load(((key, key) for key in keys), presorted=False)
+    results["bytes_per_full_copy"] = measure_memory(plain.snapshot)
+    print(f"  memory per version  {results['bytes_per_version']:8,.0f} bytes   "
+          f"(a full copy: {results['bytes_per_full_copy'] / 1e6:,.1f} MB)")
+
+    for mode in ("lock held during scan", "copy under lock", "persistent snapshot"):
+        gc.collect()
+        tree = ScalableAVLTree.bulk_load(((key, key) for key in keys), presorted=False)
+        if mode == "persistent snapshot":
+            tree.persistent = True
+        lock = threading.Lock()
+        stop = threading.Event()
+        inserts = [0]
+
+        def writer():
+            i = 0
+            while not stop.is_set():
+                key = f"New {i:08d}"
+                if mode == "persistent snapshot":
+                    tree.insert(key, key)
+                else:
+                    with lock:
+                        tree.insert(key, key)
+                i += 1
+            inserts[0] = i
+
+        thread = threading.Thread(target=writer)
+        scans = 0
+        start = time.perf_counter()
+        thread.start()
+        while time.perf_counter() - start < seconds:
+            if mode == "lock held during scan":
+                with lock:
+                    count = sum(1 for _ in tree.items())
+            elif mode == "copy under lock":
+                with lock:
+                    version = tree.snapshot()
+                count = sum(1 for _ in version.items())
+            else:
+                count = sum(1 for _ in tree.snapshot().items())
+            scans += 1
+        stop.set()
+        thread.join()
+        elapsed = time.perf_counter() - start
+        results[mode] = {"scans_per_s": scans / elapsed, "inserts_per_s": inserts[0] / elapsed}
+        r = results[mode]
+        print(f"  {mode:22} {r['scans_per_s']:6.2f} scans/s  {r['inserts_per_s']:10,.0f} inserts/s")
+    return results
+
+
+def benchmark_key_encoding(n=200000, lookups=200000, authors=20000):
+    """
+    Compare the string-keyed LibraryCatalog and ScalableHashTable with
+    EncodedCatalog (integer ISBNs, interned titles and authors, array('Q') author
+    postings): memory kept alive after loading n books parsed as fresh strings,
+    and ISBN and author lookup times. EncodedCatalog's ISBN lookups are timed
+    both from strings (encoding included) and from integer codes.
+    """
+    print(f"Key encoding benchmark ({n:,} books, {authors:,} authors, {lookups:,} lookups)")
+    isbns = []
+    for i in range(n):
+        first12 = f"979{i:09d}"
+        check = (10 - sum(int(d) * (3 if k % 2 else 1) for k, d in enumerate(first12)) % 10) % 10
+        isbns.append(f"{first12}{check}")
+    rng = random.Random(42)
+
+    def parsed_rows():
+        # Fresh string objects per row, as a CSV reader produces them
+        for i, isbn in enumerate(isbns):
+            yield "".join(isbn), f"Book {i:08d}", f"Author {i % authors}"
+
+    loaders = {
+        "LibraryCatalog": lambda: _load(LibraryCatalog(), parsed_rows(), separate=True),
+        "ScalableHashTable": lambda: _load(ScalableHashTable(), parsed_rows()),
+        "EncodedCatalog": lambda: _load(EncodedCatalog(), parsed_rows()),
+    }
+    results = {}
+    structures = {}
+    for name, load in loaders.items():
+        gc.collect()
+        results[name] = {"memory_mb": measure_memory(load) / 1e6}
+        structures[name] = load()
+
+    queries = [isbns[rng.randrange(n)] for _ in range(lookups)]
+    codes = [int(isbn) for isbn in queries]
+    author_queries = [f"Author {rng.randrange(authors)}" for _ in range(lookups // 10)]
+    for name, structure in structures.items():
+        timings = {"isbn": (structure.search_by_isbn, queries), "author": (structure.search_by_author, author_queries)}
+        if name == "EncodedCatalog":
+            timings["code"] = (structure.search_by_code, codes)
+            timings["author codes"] = (structure.codes_by_author, author_queries)
+        for kind, (method, keys) in timings.items():
+            start = time.perf_counter()
+            for key in keys:
+                method(key)
+            results[name][f"{kind}_us"] = (time.perf_counter() - start) / len(keys) * 1e6
+    for name, r in results.items():
+        extra = ""
+        if "code_us" in r:
+            extra = f"  by code {r['code_us']:5.2f} us  author codes {r['author codes_us']:5.2f} us"
+        print(f"  {name:18} {r['memory_mb']:7.1f} MB  isbn {r['isbn_us']:5.2f} us  "
+              f"author {r['author_us']:5.2f} us{extra}")
+    return results
+
+
+def _load(structure, rows, separate=False):
+    # Add (isbn, title, author) rows to structure; separate=True for add_book(isbn, title, author)
+    for isbn, title, author in rows:
+        if separate:
+            structure.add_book(isbn, title, author)
+        else:
+            structure.add_book(isbn, (title, author))
+    return structure
+
+
+def write_catalog_export(path, n, seed=42):
+    # Write an n-row CSV export with valid ISBN-13s, in random order
+    rng = random.Random(seed)
+    ids = list(range(n))
+    rng.shuffle(ids)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["isbn", "title", "author"])
+        for i in ids:
+            first12 = f"979{i:09d}"
+            check = (10 - sum(int(d) * (3 if k % 2 else 1) for k, d in enumerate(first12)) % 10) % 10
+            writer.writerow([f"{first12}{check}", f"Book {i:08d}", f"Author {i % 50000}"])
+
+
+def _ingest_in_fresh_process(path, targets, workers):
+    # Run one ingestion so peak RSS reflects only this configuration
+    structures = {
+        "catalog": LibraryCatalog() if "catalog" in targets else None,
+        "hash_table": ScalableHashTable() if "hash_table" in targets else None,
+        "avl_tree": ScalableAVLTree() if "avl_tree" in targets else None,
+    }
+    stats = ingest(path, workers=workers, **structures)
+    return {"rows": stats.rows, "rows_per_s": stats.rows_per_s, "peak_rss_mb": stats.peak_rss / 1e6}
+
+
+def benchmark_ingest(n=5000000, configurations=None):
+    """
+    Generate an n-row CSV export and report rows/sec and peak RSS for several
+    ingestion configurations. Each runs in a freshly spawned process so the peak
+    RSS belongs to that configuration alone.
+    """
+    print(f"Ingestion benchmark ({n:,} rows)")
+    configurations = configurations or (
+        ("parse only", (), 0),
+        ("parse only, 2 workers", (), 2),
+        ("hash table", ("hash_table",), 0),
+        ("catalog + hash table + AVL tree", ("catalog", "hash_table", "avl_tree"), 0),
+    )
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "export.csv")
+        write_catalog_export(path, n)
+        print(f"  export size {os.path.getsize(path) / 1e6:.0f} MB")
+        context = multiprocessing.get_context("spawn")
+        for name, targets, workers in configurations:
+            with ProcessPoolExecutor(1, mp_context=context) as runner:
+                results[name] = runner.submit(_ingest_in_fresh_process, path, targets, workers).result()
+            r = results[name]
+            print(f"  {name:32} {r['rows_per_s']:10,.0f} rows/s  peak RSS {r['peak_rss_mb']:8.0f} MB")
+    return results
+
+
+def run_all_benchmarks(n=200000):
+    """
+    Run every benchmark in this module with n entries.
+    """
+    benchmark_hash_tables(n)
+    benchmark_avl_bulk_load(n)
+    benchmark_tree_operations(n)
+    benchmark_persistent_avl(n)
+    benchmark_node_memory(n)
+    benchmark_batch_lookups(n)
+    benchmark_key_encoding(n)
+    benchmark_snapshot_startup(n)
+    benchmark_concurrency(n)
+    benchmark_sharded_catalog(n)
+    benchmark_checkout_ledger(n)
+    benchmark_lookup_cache(n)
+    benchmark_instrumentation(n)
+    benchmark_write_ahead_log(n)
+    benchmark_ingest(n)
+    benchmark_title_search(n)
+
+
+if __name__ == "__main__":
+    run_all_benchmarks(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,209 @@
+"""
+This code implements a streaming ingestion pipeline for large catalog exports in
+CSV, TSV or JSONL format, or as a single JSON array. Rows are read lazily and
+grouped into fixed-size batches, so memory use is bounded by the batch size
+rather than the file size (plus whatever the target structures hold); a JSON
+array has to be loaded whole. Each row's ISBN is normalized to its 13-digit form
+(ISBN-10s are converted) and validated by check digit; rows with a bad ISBN or a
+missing title, JSON lines that don't decode and values that aren't objects are
+counted and skipped. Valid batches are applied to any mix of a LibraryCatalog, a
+ScalableHashTable, a ScalableAVLTree (keyed by title) and a TitleSearchIndex.
+With workers > 0, parsing and validation run in a process pool while the calling
+process remains the single writer and applies the batches in file order.
+"""
+import csv
+import itertools
+import json
+import os
+import resource
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from isbn import normalize_isbn
+
+DEFAULT_FIELDS = ("isbn", "title", "author")
+DELIMITERS = {"csv": ",", "tsv": "\t"}
+FORMATS_BY_EXTENSION = {".csv": "csv", ".txt": "csv", ".tsv": "tsv", ".jsonl": "jsonl", ".ndjson": "jsonl",
+                        ".json": "json"}
+
+
+def detect_format(path):
+    # Pick "csv", "tsv", "jsonl" or "json" from the file extension
+    extension = os.path.splitext(path)[1].lower()
+    if extension in FORMATS_BY_EXTENSION:
+        return FORMATS_BY_EXTENSION[extension]
+    raise ValueError(f"Can't tell the format of {path}; pass fmt='csv', 'tsv', 'jsonl' or 'json'")
+
+
+def _decode_lines(lines):
+    # Decode JSONL lines, yielding None for a line that isn't valid JSON so it gets rejected
+    for line in lines:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                yield None
+
+
+def read_rows(path, fmt=None):
+    # Lazily yield one value per CSV/TSV row, JSONL line or JSON array element
+    fmt = fmt or detect_format(path)
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt in DELIMITERS:
+            yield from csv.DictReader(f, delimiter=DELIMITERS[fmt])
+        elif fmt == "jsonl":
+            yield from _decode_lines(f)
+        elif fmt == "json":
+            rows = json.load(f)
+            if not isinstance(rows, list):
+                raise ValueError(f"{path} should hold a JSON array of rows")
+            yield from rows
+        else:
+            raise ValueError(f"Unknown format {fmt!r}")
+
+
+def chunked(iterable, size):
+    # Yield lists of up to size items from iterable
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def normalize_rows(rows, fields=DEFAULT_FIELDS):
+    """
+    Turn raw row dictionaries into (isbn, title, author) tuples. Returns the valid
+    books and the number of rejected rows, counting rows that aren't dictionaries.
+    """
+    isbn_field, title_field, author_field = fields
+    books = []
+    rejected = 0
+    for row in rows:
+        if not isinstance(row, dict):
+            rejected += 1
+            continue
+        try:
+            isbn = normalize_isbn(str(row.get(isbn_field) or ""))
+        except ValueError:
+            rejected += 1
+            continue
+        title = (row.get(title_field) or "").strip()
+        if not title:
+            rejected += 1
+            continue
+        books.append((isbn, title, (row.get(author_field) or "").strip()))
+    return books, rejected
+
+
+def _parse_lines(lines, fmt, fieldnames, fields):
+    # Worker-side parsing of one chunk of raw lines
+    if fmt in DELIMITERS:
+        rows = csv.DictReader(lines, fieldnames=fieldnames, delimiter=DELIMITERS[fmt])
+    else:
+        rows = _decode_lines(lines)
+    return normalize_rows(rows, fields)
+
+
+def _serial_batches(path, fmt, batch_size, fields):
+    # Read, parse and normalize batches in this process
+    for rows in chunked(read_rows(path, fmt), batch_size):
+        yield normalize_rows(rows, fields)
+
+
+def _parallel_batches(path, fmt, batch_size, fields, workers):
+    # Parse batches in a process pool, keeping at most 2 * workers chunks in flight and
+    # yielding results in file order. Raw lines are split naively, so CSV fields must not
+    # contain embedded newlines in this mode.
+    with open(path, newline="", encoding="utf-8") as f, ProcessPoolExecutor(workers) as pool:
+        fieldnames = next(csv.reader([f.readline()], delimiter=DELIMITERS[fmt])) if fmt in DELIMITERS else None
+        pending = deque()
+        for lines in chunked(f, batch_size):
+            pending.append(pool.submit(_parse_lines, lines, fmt, fieldnames, fields))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def apply_batch(books, catalog=None, hash_table=None, avl_tree=None, search_index=None):
+    """
+    Add a batch of (isbn, title, author) tuples to the given structures. The AVL
+    tree (title -> ISBN) takes the whole batch through merge when the batch is
+    large relative to the tree, and one insert per book otherwise.
+    """
+    if catalog is not None:
+        add_book = catalog.add_book
+        for isbn, title, author in books:
+            add_book(isbn, title, author)
+    if hash_table is not None:
+        add_book = hash_table.add_book
+        for isbn, title, author in books:
+            add_book(isbn, (title, author))
+    if avl_tree is not None:
+        # merge costs O(n + m) and inserting costs O(m log n); measured, merge wins while the
+        # tree holds fewer than about eight times as many keys as the batch
+        if len(avl_tree) < 8 * len(books):
+            avl_tree.merge((title, isbn) for isbn, title, _ in books)
+        else:
+            insert = avl_tree.insert
+            for isbn, title, _ in books:
+                insert(title, isbn)
+    if search_index is not None:
+        add_book = search_index.add_book
+        for isbn, title, author in books:
+            add_book(isbn, title, author)
+
+
+def peak_rss_bytes():
+    # Peak resident set size of this process (ru_maxrss is KiB on Linux, bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class IngestStats:
+    def __init__(self):
+        # Counters filled in by ingest
+        self.rows = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.batches = 0
+        self.seconds = 0.0
+        self.peak_rss = 0
+
+    @property
+    def rows_per_s(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def __repr__(self):
+        return (f"IngestStats(rows={self.rows}, accepted={self.accepted}, rejected={self.rejected}, "
+                f"rows_per_s={self.rows_per_s:.0f}, peak_rss={self.peak_rss})")
+
+
+def ingest(path, catalog=None, hash_table=None, avl_tree=None, fmt=None,
+           batch_size=10000, workers=0, fields=DEFAULT_FIELDS, search_index=None):
+    """
+    Stream the export at path into the given structures and return IngestStats.
+    fields names the ISBN, title and author columns (or JSON keys). With workers > 0,
+    rows are parsed in that many worker processes, except for a JSON array, which
+    can't be split into lines and is always parsed here.
+    """
+    fmt = fmt or detect_format(path)
+    stats = IngestStats()
+    start = time.perf_counter()
+    if workers > 0 and fmt != "json":
+        batches = _parallel_batches(path, fmt, batch_size, fields, workers)
+    else:
+        batches = _serial_batches(path, fmt, batch_size, fields)
+    for books, rejected in batches:
+        apply_batch(books, catalog, hash_table, avl_tree, search_index)
+        stats.batches += 1
+        stats.accepted += len(books)
+        stats.rejected += rejected
+    stats.rows = stats.accepted + stats.rejected
+    stats.seconds = time.perf_counter() - start
+    stats.peak_rss = peak_rss_bytes()
+    return stats
@@ -0,0 +1,263 @@
+"""
+This code puts the catalog and the checked-out books map behind a small asyncio
+network service, so many clients can be served by one process. The protocol is
+one JSON object per line, over TCP or a Unix socket. Each request names an
+operation, its arguments and an optional id, and the response repeats the id with
+a "result" or an "error". For example:
+
+    {"id": 1, "op": "search_by_isbn", "isbn": "978-0262046305"}
+    {"id": 1, "result": ["Introduction to Algorithms", "Thomas H. Cormen"]}
+
+Concurrent ISBN lookups are coalesced into micro-batches. The batcher task waits
+for one lookup, gives other clients max_delay seconds to add more, and answers up
+to max_batch of them with a single search_many_by_isbn call. Writes (add_book,
+remove_book, check_out, return_book) are queued to a single mutator task, which
+applies them one at a time in arrival order. Their arguments are checked before
+they are queued: every field must be a string, and book a [title, author] pair. A
+write is acknowledged only after it has been applied, so any request sent after
+the acknowledgement sees it.
+Every operation's server-side latency is recorded in a log-scaled histogram
+(requests with an unknown or malformed op share one "invalid" histogram), which
+the "stats" operation returns. Run the module to start a server:
+
+    python catalog_service.py --port 8765 --preload 100000
+"""
+import argparse
+import asyncio
+import json
+
+from instrumentation import LatencyHistogram
+from scalable_hash_table import ScalableHashTable
+from optimized_checked_out_books import OptimizedCheckedOutBooks
+
+WRITE_OPERATIONS = {
+    # operation: (target structure attribute, request fields passed as arguments)
+    "add_book": ("catalog", ("isbn", "book")),
+    "remove_book": ("catalog", ("isbn",)),
+    "check_out": ("checked_out_books", ("title",)),
+    "return_book": ("checked_out_books", ("title",)),
+}
+# Operations with their own latency histogram; every other request is recorded under "invalid"
+OPERATIONS = {"search_by_isbn", "search_by_title", "search_by_author", "stats", *WRITE_OPERATIONS}
+
+
+def _write_argument(request, field):
+    # Check one write argument before it's queued, since a structure given a malformed book can
+    # be left half-updated: every field is a string, and book is [title, author]
+    value = request[field]
+    if field == "book":
+        if not (isinstance(value, list) and len(value) == 2 and all(isinstance(part, str) for part in value)):
+            raise ValueError("book must be a list of two strings, [title, author]")
+        return tuple(value)
+    if not isinstance(value, str):
+        raise ValueError(f"{field} must be a string")
+    return value
+
+
+class CatalogService:
+    def __init__(self, catalog=None, checked_out_books=None, max_batch=256, max_delay=0.0):
+        # max_batch caps the lookups answered together; max_delay is how long (in seconds)
+        # the batcher waits for more lookups after the first one (0 only yields to the loop)
+        self.catalog = catalog if catalog is not None else ScalableHashTable()
+        self.checked_out_books = checked_out_books if checked_out_books is not None else OptimizedCheckedOutBooks()
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.histograms = {}
+        self.batches = 0
+        self.batched_lookups = 0
+        self.lookups = None
+        self.writes = None
+        self.tasks = []
+        self.server = None
+
+    async def start(self, host="127.0.0.1", port=0, path=None):
+        # Start the batcher and mutator tasks and listen on a TCP port, or on a Unix socket
+        # if path is given. Returns the bound address.
+        self.lookups = asyncio.Queue()
+        self.writes = asyncio.Queue()
+        self.tasks = [asyncio.create_task(self._batch_lookups()), asyncio.create_task(self._apply_writes())]
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self._serve_client, path)
+        else:
+            self.server = await asyncio.start_server(self._serve_client, host, port)
+        return self.server.sockets[0].getsockname()
+
+    async def stop(self):
+        # Stop listening and cancel the background tasks
+        self.server.close()
+        await self.server.wait_closed()
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    async def search_by_isbn(self, isbn):
+        # Queue a lookup for the next micro-batch and wait for its answer
+        future = asyncio.get_running_loop().create_future()
+        self.lookups.put_nowait((isbn, future))
+        return await future
+
+    async def write(self, operation, *args):
+        # Queue a write for the mutator task and wait until it has been applied
+        future = asyncio.get_running_loop().create_future()
+        self.writes.put_nowait((operation, args, future))
+        return await future
+
+    async def _batch_lookups(self):
+        # Answer queued lookups in batches of up to max_batch with one search_many_by_isbn call
+        lookups = self.lookups
+        while True:
+            batch = [await lookups.get()]
+            if self.max_batch > 1:
+                # Let the other clients' pending requests reach the queue before draining it
+                await asyncio.sleep(self.max_delay)
+                while len(batch) < self.max_batch and not lookups.empty():
+                    batch.append(lookups.get_nowait())
+            try:
+                results = self.catalog.search_many_by_isbn([isbn for isbn, _ in batch])
+            except Exception:
+                # Retry key by key, so a bad key fails only its own lookup and not the whole batch
+                results = []
+                for isbn, _ in batch:
+                    try:
+                        results.append(self.catalog.search_many_by_isbn([isbn])[0])
+                    except Exception as error:
+                        results.append(error)
+            self.batches += 1
+            self.batched_lookups += len(batch)
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    async def _apply_writes(self):
+        # The only task that modifies the structures: apply queued writes in arrival order
+        while True:
+            operation, args, future = await self.writes.get()
+            target = getattr(self, WRITE_OPERATIONS[operation][0])
+            try:
+                result = getattr(target, operation)(*args)
+            except Exception as error:
+                if not future.done():
+                    future.set_exception(error)
+            else:
+                if not future.done():
+                    future.set_result(result)
+
+    def stats(self):
+        # Latency histograms per operation, plus micro-batching figures
+        return {
+            "latency": {operation: histogram.snapshot() for operation, histogram in self.histograms.items()},
+            "batches": self.batches,
+            "mean_batch_size": self.batched_lookups / self.batches if self.batches else 0.0,
+        }
+
+    async def handle(self, request):
+        # Run one decoded request and return its result
+        operation = request.get("op")
+        if operation == "search_by_isbn":
+            isbn = request["isbn"]
+            if not isinstance(isbn, str):
+                # Checked here so a malformed request never joins a batch with other clients' lookups
+                raise ValueError("isbn must be a string")
+            return await self.search_by_isbn(isbn)
+        if operation == "search_by_title":
+            return self.catalog.search_by_title(request["title"])
+        if operation == "search_by_author":
+            return self.catalog.search_by_author(request["author"])
+        if operation in WRITE_OPERATIONS:
+            args = [_write_argument(request, field) for field in WRITE_OPERATIONS[operation][1]]
+            return await self.write(operation, *args)
+        if operation == "stats":
+            return self.stats()
+        raise ValueError(f"Unknown operation: {operation!r}")
+
+    async def _respond(self, request, writer):
+        # Handle one request, record its latency, and write the response line
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        response = {"id": request.get("id")}
+        try:
+            response["result"] = await self.handle(request)
+        except KeyError as error:
+            response["error"] = f"Missing field: {error.args[0]}"
+        except Exception as error:
+            response["error"] = str(error) or type(error).__name__
+        finally:
+            # The op may be any JSON value, so only known names get a histogram of their own
+            operation = request.get("op")
+            if not (isinstance(operation, str) and operation in OPERATIONS):
+                operation = "invalid"
+            if operation not in self.histograms:
+                self.histograms[operation] = LatencyHistogram()
+            self.histograms[operation].record(loop.time() - start)
+        writer.write(json.dumps(response).encode() + b"\n")
+
+    async def _serve_client(self, reader, writer):
+        # Read request lines from one connection; requests run concurrently, so responses may
+        # come back out of order and carry the request's id
+        pending = set()
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("Request must be a JSON object")
+                except ValueError as error:
+                    writer.write(json.dumps({"id": None, "error": f"Bad request: {error}"}).encode() + b"\n")
+                    continue
+                task = asyncio.create_task(self._respond(request, writer))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+                if writer.transport.get_write_buffer_size() > 1 << 20:
+                    await writer.drain()
+            await asyncio.gather(*pending)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+def preload(catalog, n):
+    # Fill catalog with n generated books, ISBN "978-<i>", title "Book <i>", author "Author <i % 1000>"
+    for i in range(n):
+        catalog.add_book(f"978-{i}", (f"Book {i}", f"Author {i % 1000}"))
+
+
+async def serve(host="127.0.0.1", port=8765, path=None, books=0, max_batch=256, max_delay=0.0, ready=None):
+    """
+    Run a service until cancelled. books preloads generated books; ready, if
+    given, is called with the bound address once the server is listening.
+    """
+    service = CatalogService(max_batch=max_batch, max_delay=max_delay)
+    preload(service.catalog, books)
+    address = await service.start(host, port, path)
+    if ready is not None:
+        ready(address)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await service.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the library catalog over a JSON-lines socket.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="listen on this Unix socket path instead of TCP")
+    parser.add_argument("--preload", type=int, default=0, help="number of generated books to load")
+    parser.add_argument("--max-batch", type=int, default=256, help="largest lookup micro-batch (1 disables)")
+    parser.add_argument("--max-delay", type=float, default=0.0,
+                        help="seconds the batcher waits for more lookups after the first")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.unix, args.preload, args.max_batch, args.max_delay,
+                          ready=lambda address: print(f"Listening on {address}", flush=True)))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+This code defines a compact binary snapshot format for the catalog structures and
+a MappedCatalog class that reads it through mmap. save_snapshot writes the entries
+sorted by key as two offset arrays followed by the UTF-8 key bytes and the encoded
+values. Opening a snapshot only maps the file: lookups binary-search the key offsets
+in place and decode a single value on a hit, so start-up time does not depend on
+the number of books. ScalableHashTable and ScalableAVLTree expose this through
+their save(path) and load(path) methods. A snapshot is written to a temporary file,
+fsynced and then renamed over path, so a crash mid-save leaves the previous
+snapshot intact.
+
+File layout (integers are unsigned 64-bit in native byte order):
+    magic b"CATSNAP2" | count | key offsets (count + 1) | value offsets (count + 1)
+    | key bytes | value bytes
+Offsets are relative to the start of their byte region. Each value starts with a
+tag byte: b"s" for a string, or b"t" for a tuple of strings, followed by the
+field count and each field's byte length (unsigned 32-bit) and then the fields.
+"""
+import mmap
+import os
+from array import array
+
+MAGIC = b"CATSNAP2"
+HEADER_SIZE = len(MAGIC) + 8
+
+
+def _encode_value(value):
+    # Encode a string or tuple of strings as tagged UTF-8 bytes
+    if isinstance(value, str):
+        return b"s" + value.encode("utf-8")
+    if isinstance(value, tuple) and all(isinstance(field, str) for field in value):
+        # Fields are length-prefixed, so any character (and an empty field) survives
+        fields = [field.encode("utf-8") for field in value]
+        return b"t" + array("I", [len(fields)] + [len(field) for field in fields]).tobytes() + b"".join(fields)
+    raise TypeError(f"Snapshot values must be strings or tuples of strings, got {value!r}")
+
+
+def _decode_value(data):
+    # Reverse _encode_value
+    data = bytes(data)
+    if data[0] == ord("s"):
+        return data[1:].decode("utf-8")
+    count = array("I", data[1:5])[0]
+    position = 5 + 4 * count
+    fields = []
+    for length in array("I", data[5:position]):
+        fields.append(data[position:position + length].decode("utf-8"))
+        position += length
+    return tuple(fields)
+
+
+def save_snapshot(path, pairs, presorted=False):
+    """
+    Write (key, value) pairs with string keys to path in the snapshot format.
+    Pass presorted=True when pairs already arrive in ascending key order.
+    """
+    pairs = list(pairs)
+    if not presorted:
+        pairs.sort(key=lambda pair: pair[0])
+    key_offsets = array("Q", [0])
+    value_offsets = array("Q", [0])
+    key_chunks = []
+    value_chunks = []
+    for key, value in pairs:
+        if not isinstance(key, str):
+            raise TypeError(f"Snapshot keys must be strings, got {key!r}")
+        encoded_key = key.encode("utf-8")
+        encoded_value = _encode_value(value)
+        key_chunks.append(encoded_key)
+        value_chunks.append(encoded_value)
+        key_offsets.append(key_offsets[-1] + len(encoded_key))
+        value_offsets.append(value_offsets[-1] + len(encoded_value))
+    # Write beside path and rename over it, so readers never see a half-written snapshot
+    with open(path + ".tmp", "wb") as f:
+        f.write(MAGIC)
+        f.write(array("Q", [len(pairs)]).tobytes())
+        f.write(key_offsets.tobytes())
+        f.write(value_offsets.tobytes())
+        f.write(b"".join(key_chunks))
+        f.write(b"".join(value_chunks))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+
+class MappedCatalog:
+    """
+    Read-only view of a snapshot file. Lookups work directly on the mapped bytes;
+    nothing is deserialized up front.
+    """
+
+    def __init__(self, path):
+        # Map the file and point typed views at the offset arrays without copying them
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        if bytes(self._view[:len(MAGIC)]) != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a catalog snapshot")
+        self.count = self._view[len(MAGIC):HEADER_SIZE].cast("Q")[0]
+        table_bytes = (self.count + 1) * 8
+        self._key_offsets = self._view[HEADER_SIZE:HEADER_SIZE + table_bytes].cast("Q")
+        self._value_offsets = self._view[HEADER_SIZE + table_bytes:HEADER_SIZE + 2 * table_bytes].cast("Q")
+        self._keys_start = HEADER_SIZE + 2 * table_bytes
+        self._values_start = self._keys_start + self._key_offsets[self.count]
+
+    def close(self):
+        # Release the typed views and unmap the file
+        for name in ("_key_offsets", "_value_offsets", "_view"):
+            view = getattr(self, name, None)
+            if view is not None:
+                view.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def _key_bytes(self, i):
+        # Return the encoded key stored at position i
+        start = self._keys_start
+        return self._mmap[start + self._key_offsets[i]:start + self._key_offsets[i + 1]]
+
+    def _value(self, i):
+        # Decode the value stored at position i
+        start = self._values_start
+        return _decode_value(self._view[start + self._value_offsets[i]:start + self._value_offsets[i + 1]])
+
+    def _find(self, key):
+        # Binary-search the mapped keys; return the position of key or -1
+        target = key.encode("utf-8")
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_bytes(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count and self._key_bytes(lo) == target:
+            return lo
+        return -1
+
+    def search(self, key, default=None):
+        # Return the value stored for key, or default if it is absent
+        i = self._find(key)
+        return self._value(i) if i >= 0 else default
+
+    def search_by_isbn(self, isbn):
+        # Same contract as ScalableHashTable.search_by_isbn
+        return self.search(isbn, "Book not found")
+
+    def __contains__(self, key):
+        return self._find(key) >= 0
+
+    def items(self):
+        # Lazily yield every (key, value) pair in key order
+        for i in range(self.count):
+            yield self._key_bytes(i).decode("utf-8"), self._value(i)
@@ -0,0 +1,128 @@
+"""
+This code defines a CheckoutLedger class that extends the checked-out books map
+with full loan records. Each Loan holds the ISBN, the patron and the due date.
+The ledger keeps three structures in step: a dictionary from ISBN to its active
+loan, a per-patron dictionary of that patron's loans, and a min-heap keyed on due
+date. "Loans for patron X" is a single dictionary lookup, and "all loans overdue
+as of now" walks only the top of the heap, costing O(k log k) for k overdue
+loans instead of a scan over every loan. Returned or renewed loans leave stale heap
+entries behind, which are skipped when read and compacted away once they
+outnumber the live ones. Due dates can be any comparable values, such as
+timestamps or datetime objects.
+"""
+import heapq
+import itertools
+
+
+class Loan:
+    __slots__ = ("isbn", "patron", "due", "title", "seq")
+
+    def __init__(self, isbn, patron, due, title=None, seq=0):
+        self.isbn = isbn      # ISBN of the borrowed book
+        self.patron = patron  # Patron holding the book
+        self.due = due        # Due date (any comparable value)
+        self.title = title    # Optional title, for display
+        self.seq = seq        # Matches the loan's current heap entry; older entries are stale
+
+    def __repr__(self):
+        return f"Loan({self.isbn!r}, {self.patron!r}, {self.due!r})"
+
+
+class CheckoutLedger:
+    def __init__(self):
+        # Active loans by ISBN, loans grouped by patron, and a (due, seq, isbn) min-heap
+        self.loans = {}
+        self.loans_by_patron = {}
+        self.due_heap = []
+        self._counter = itertools.count()
+
+    def __len__(self):
+        # Number of active loans
+        return len(self.loans)
+
+    def _push(self, loan):
+        # Add a fresh heap entry for loan, compacting first if stale entries dominate
+        if len(self.due_heap) > 2 * len(self.loans) + 64:
+            self._compact()
+        loan.seq = next(self._counter)
+        heapq.heappush(self.due_heap, (loan.due, loan.seq, loan.isbn))
+
+    def _compact(self):
+        # Rebuild the heap from live entries only
+        self.due_heap = [(loan.due, loan.seq, loan.isbn) for loan in self.loans.values()]
+        heapq.heapify(self.due_heap)
+
+    def check_out(self, isbn, patron, due, title=None):
+        # Record a new loan; return False if the book is already checked out
+        if isbn in self.loans:
+            return False
+        loan = Loan(isbn, patron, due, title)
+        self.loans[isbn] = loan
+        self.loans_by_patron.setdefault(patron, {})[isbn] = loan
+        self._push(loan)
+        return True
+
+    def return_book(self, isbn):
+        # Close the loan for isbn; return False if it wasn't checked out.
+        # Its heap entry becomes stale and is skipped or compacted later.
+        loan = self.loans.pop(isbn, None)
+        if loan is None:
+            return False
+        patron_loans = self.loans_by_patron[loan.patron]
+        del patron_loans[isbn]
+        if not patron_loans:
+            del self.loans_by_patron[loan.patron]
+        return True
+
+    def renew(self, isbn, due):
+        # Move a loan's due date; return False if the book isn't checked out
+        loan = self.loans.get(isbn)
+        if loan is None:
+            return False
+        loan.due = due
+        self._push(loan)
+        return True
+
+    def get_loan(self, isbn):
+        # Return the active Loan for isbn, or None
+        return self.loans.get(isbn)
+
+    def is_checked_out(self, isbn):
+        # Return True if isbn is currently on loan
+        return isbn in self.loans
+
+    def loans_for(self, patron):
+        # Return the patron's active loans
+        return list(self.loans_by_patron.get(patron, {}).values())
+
+    def overdue(self, now):
+        # Return the loans due strictly before now, earliest first. The heap is read in place:
+        # only entries with due < now (and their direct children) are visited, nothing is popped.
+        heap = self.due_heap
+        loans = self.loans
+        found = []
+        stack = [0] if heap else []
+        while stack:
+            i = stack.pop()
+            due, seq, isbn = heap[i]
+            if not due < now:
+                continue  # Heap order: nothing below this entry is overdue either
+            loan = loans.get(isbn)
+            if loan is not None and loan.seq == seq:
+                found.append(loan)
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(heap):
+                    stack.append(child)
+        found.sort(key=lambda loan: loan.due)
+        return found
+
+    def next_due(self):
+        # Return the active loan with the earliest due date, or None, dropping stale heap tops
+        heap = self.due_heap
+        while heap:
+            due, seq, isbn = heap[0]
+            loan = self.loans.get(isbn)
+            if loan is not None and loan.seq == seq:
+                return loan
+            heapq.heappop(heap)
+        return None
@@ -0,0 +1,146 @@
+"""
+This code defines a CompactHashTable class, an open-addressing alternative to
+ScalableHashTable with the same add_book/search_by_isbn/search_by_title API.
+Instead of a list of (key, value) tuples per bucket, entries live in three
+parallel arrays: a compact array('q') of cached hashes plus flat lists of keys
+and values. Collisions are resolved with Robin Hood linear probing, which keeps
+probe sequences short and lets unsuccessful searches stop early. When the load
+factor exceeds 0.75 the table grows incrementally: a larger set of arrays is
+allocated and every following add_book migrates a few old slots, so no single
+insertion pays for a full rehash.
+"""
+from array import array
+
+EMPTY = -1           # Marker stored in the hash array for unused slots
+HASH_MASK = (1 << 63) - 1  # Keep cached hashes non-negative so EMPTY can't collide
+MIGRATE_STEP = 4     # Old slots moved into the new arrays on every add_book
+
+
+class CompactHashTable:
+    def __init__(self, capacity=128):
+        # Round the initial capacity up to a power of two so we can mask instead of modulo
+        self.table_size = 8
+        while self.table_size < capacity:
+            self.table_size *= 2
+        self.hashes, self.keys, self.values = self._allocate(self.table_size)
+        self.num_entries = 0
+        # Arrays being drained by an in-progress incremental resize (None when idle)
+        self.old_hashes = None
+        self.old_keys = None
+        self.old_values = None
+        self.migrate_index = 0
+
+    def _allocate(self, size):
+        # Create empty parallel arrays for hashes, keys and values
+        return array('q', [EMPTY]) * size, [None] * size, [None] * size
+
+    def _hash(self, key):
+        # Compute the (non-negative) cached hash for a key
+        return hash(key) & HASH_MASK
+
+    def _find_slot(self, hashes, keys, key, h):
+        # Return the slot holding key in the given arrays, or -1 if it is absent
+        mask = len(hashes) - 1
+        index = h & mask
+        distance = 0
+        while True:
+            slot_hash = hashes[index]
+            if slot_hash == EMPTY:
+                return -1
+            if slot_hash == h and keys[index] == key:
+                return index
+            # Robin Hood invariant: once we pass an entry closer to home than we are, stop
+            if (index - (slot_hash & mask)) & mask < distance:
+                return -1
+            index = (index + 1) & mask
+            distance += 1
+
+    def _place(self, h, key, value):
+        # Insert an entry known to be absent using Robin Hood displacement
+        hashes, keys, values = self.hashes, self.keys, self.values
+        mask = self.table_size - 1
+        index = h & mask
+        distance = 0
+        while True:
+            slot_hash = hashes[index]
+            if slot_hash == EMPTY:
+                hashes[index] = h
+                keys[index] = key
+                values[index] = value
+                return
+            slot_distance = (index - (slot_hash & mask)) & mask
+            if slot_distance < distance:
+                # Steal the slot from the richer entry and keep inserting the displaced one
+                hashes[index], h = h, slot_hash
+                keys[index], key = key, keys[index]
+                values[index], value = value, values[index]
+                distance = slot_distance
+            index = (index + 1) & mask
+            distance += 1
+
+    def add_book(self, key, value):
+        # Add a book with the given ISBN (key) and book data (value); an existing ISBN is updated
+        if self.old_hashes is not None:
+            self._migrate(MIGRATE_STEP)
+        h = self._hash(key)
+        index = self._find_slot(self.hashes, self.keys, key, h)
+        if index >= 0:
+            self.values[index] = value
+            return
+        if self.old_hashes is not None:
+            index = self._find_slot(self.old_hashes, self.old_keys, key, h)
+            if index >= 0:
+                # Not migrated yet; update in place and let migration carry the new value
+                self.old_values[index] = value
+                return
+        self._place(h, key, value)
+        self.num_entries += 1
+        # Start growing the table if the load factor exceeds 0.75
+        if self.old_hashes is None and self.num_entries / self.table_size > 0.75:
+            self._resize()
+
+    def _resize(self):
+        # Begin an incremental resize: keep the current arrays aside and allocate double-sized ones
+        self.old_hashes, self.old_keys, self.old_values = self.hashes, self.keys, self.values
+        self.table_size *= 2
+        self.hashes, self.keys, self.values = self._allocate(self.table_size)
+        self.migrate_index = 0
+
+    def _migrate(self, steps):
+        # Move up to `steps` old slots into the new arrays; finish the resize when drained.
+        # Old slots are left intact so probe runs in the old arrays stay unbroken; anything
+        # below migrate_index already lives in the new arrays, which are always checked first.
+        old_hashes, old_keys, old_values = self.old_hashes, self.old_keys, self.old_values
+        end = min(self.migrate_index + steps, len(old_hashes))
+        for index in range(self.migrate_index, end):
+            h = old_hashes[index]
+            if h != EMPTY:
+                self._place(h, old_keys[index], old_values[index])
+        self.migrate_index = end
+        if end == len(old_hashes):
+            self.old_hashes = self.old_keys = self.old_values = None
+
+    def search_by_isbn(self, isbn):
+        # Search for a book by ISBN and return its data
+        h = self._hash(isbn)
+        index = self._find_slot(self.hashes, self.keys, isbn, h)
+        if index >= 0:
+            return self.values[index]
+        if self.old_hashes is not None:
+            index = self._find_slot(self.old_hashes, self.old_keys, isbn, h)
+            if index >= 0:
+                return self.old_values[index]
+        return "Book not found"
+
+    def search_by_title(self, title):
+        # Search for a book by title and return its ISBN
+        regions = [(self.keys, self.values)]
+        if self.old_hashes is not None:
+            # Only the not-yet-migrated tail of the old arrays can hold entries missing from the new ones
+            start = self.migrate_index
+            regions.append((self.old_keys[start:], self.old_values[start:]))
+        for keys, values in regions:
+            for book_isbn, book_data in zip(keys, values):
+                if book_data is not None and book_data[0] == title:
+                    return book_isbn
+        return "Book not found"
@@ -0,0 +1,96 @@
+"""
+This code defines thread-safe variants of the catalog and the checked-out books
+map for a checkout desk served by many worker threads. Both split their data into
+stripes chosen by key hash, and each stripe has its own lock, so writers to
+different stripes never wait for each other and a resize only locks one stripe.
+ConcurrentCatalog wraps one ScalableHashTable per stripe. Its ISBN, title and
+author lookups take no lock at all, because ScalableHashTable writers only
+append to or swap out lists that a reader may be holding, so readers never block
+behind a writer or a resize. ConcurrentCheckedOutBooks stripes the checked-out
+dictionary the same way.
+"""
+import threading
+
+from scalable_hash_table import ScalableHashTable
+
+DEFAULT_STRIPES = 16
+
+
+def _stripe(key, num_stripes):
+    # Pick a stripe for key. Hashing a tuple re-mixes hash(key), so the stripe choice is
+    # independent of the bucket index (hash(key) % table_size) used inside each stripe.
+    return hash((key, num_stripes)) % num_stripes
+
+
+class ConcurrentCatalog:
+    def __init__(self, num_stripes=DEFAULT_STRIPES):
+        # One hash table and one writer lock per stripe
+        self.num_stripes = num_stripes
+        self.stripes = [ScalableHashTable() for _ in range(num_stripes)]
+        self.locks = [threading.Lock() for _ in range(num_stripes)]
+
+    def add_book(self, key, value):
+        # Add or update a book; only writers to the same stripe wait for each other
+        i = _stripe(key, self.num_stripes)
+        with self.locks[i]:
+            self.stripes[i].add_book(key, value)
+
+    def remove_book(self, isbn):
+        # Remove a book by ISBN; return True if it was removed, False if it wasn't found
+        i = _stripe(isbn, self.num_stripes)
+        with self.locks[i]:
+            return self.stripes[i].remove_book(isbn)
+
+    def search_by_isbn(self, isbn):
+        # Lock-free lookup in the owning stripe
+        return self.stripes[_stripe(isbn, self.num_stripes)].search_by_isbn(isbn)
+
+    def search_by_title(self, title):
+        # Titles aren't striped, so ask every stripe and return the first ISBN found
+        for table in self.stripes:
+            isbn = table.search_by_title(title)
+            if isbn != "Book not found":
+                return isbn
+        return "Book not found"
+
+    def search_by_author(self, author):
+        # Gather the author's ISBNs from every stripe
+        isbns = []
+        for table in self.stripes:
+            isbns.extend(table.search_by_author(author))
+        return isbns
+
+    def __len__(self):
+        # Total number of books across all stripes
+        return sum(table.num_entries for table in self.stripes)
+
+
+class ConcurrentCheckedOutBooks:
+    def __init__(self, num_stripes=DEFAULT_STRIPES):
+        # One dictionary of checked-out titles and one lock per stripe
+        self.num_stripes = num_stripes
+        self.stripes = [{} for _ in range(num_stripes)]
+        self.locks = [threading.Lock() for _ in range(num_stripes)]
+
+    def check_out(self, book_title):
+        # Check out a book; return False if it was already checked out
+        i = _stripe(book_title, self.num_stripes)
+        with self.locks[i]:
+            if book_title in self.stripes[i]:
+                return False
+            self.stripes[i][book_title] = True
+            return True
+
+    def return_book(self, book_title):
+        # Return a book; return False if it wasn't checked out
+        i = _stripe(book_title, self.num_stripes)
+        with self.locks[i]:
+            return self.stripes[i].pop(book_title, False)
+
+    def is_checked_out(self, book_title):
+        # Lock-free membership check in the owning stripe
+        return book_title in self.stripes[_stripe(book_title, self.num_stripes)]
+
+    def __len__(self):
+        # Total number of checked-out books across all stripes
+        return sum(len(stripe) for stripe in self.stripes)
@@ -0,0 +1,269 @@
+"""
+This code adds opt-in instrumentation to the catalog structures, for finding out
+why latency spikes: long hash chains, resize storms, a skewed hash distribution,
+or an AVL tree doing many rotations. instrument(structure) wraps the methods of
+that one object by setting instance attributes that shadow the class methods. The
+classes themselves are never modified, so structures that are not instrumented
+run exactly the same code as before and pay nothing, and uninstrument() removes
+the wrappers again. What gets recorded:
+
+    every public method     call count and a latency histogram
+    _hash / lookups         chain length of the bucket each key hashes to
+    _resize                 resize count and a duration histogram
+    _rotate_left/_right     rotation count, and rotations per insert and delete
+
+stats() returns a snapshot of all of this, plus gauges computed on demand: load
+factor, longest chain and empty-bucket share for hash tables, and height and size
+for trees. A metrics sink, a callable taking (name, value), receives each resize
+as it happens and the whole flattened snapshot on export().
+"""
+import inspect
+import time
+
+
+class LatencyHistogram:
+    def __init__(self, buckets=32):
+        # Bucket i counts latencies below 2**i microseconds (and at least 2**(i-1))
+        self.counts = [0] * buckets
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        # Add one latency sample
+        micros = int(seconds * 1e6)
+        self.counts[min(micros.bit_length(), len(self.counts) - 1)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, fraction):
+        # Upper bound in microseconds of the bucket holding the given percentile (0.0-1.0)
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return float(2 ** i)
+        return float(2 ** (len(self.counts) - 1))
+
+    def snapshot(self):
+        # Summary plus the non-empty buckets, keyed by their upper bound in microseconds
+        return {
+            "count": self.count,
+            "mean_us": self.total / self.count * 1e6 if self.count else 0.0,
+            "p50_us": self.percentile(0.50),
+            "p99_us": self.percentile(0.99),
+            "max_us": self.max * 1e6,
+            "buckets": {str(2 ** i): count for i, count in enumerate(self.counts) if count},
+        }
+
+
+class CountHistogram:
+    def __init__(self):
+        # Exact counts of small non-negative integers, such as chain lengths
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+
+    def record(self, value):
+        self.counts[value] = self.counts.get(value, 0) + 1
+        self.count += 1
+        self.total += value
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "max": max(self.counts) if self.counts else 0,
+            "counts": dict(sorted(self.counts.items())),
+        }
+
+
+class Instrumentation:
+    def __init__(self, structure, sink=None):
+        # Recorders for one structure; sink(name, value) receives live events and exports
+        self.structure = structure
+        self.sink = sink
+        self.calls = {}         # method name -> LatencyHistogram
+        self.distributions = {} # e.g. "chain_length" -> CountHistogram
+        self.counters = {}      # e.g. "resizes", "rotations"
+        self.resize_time = LatencyHistogram()
+        self.wrapped = []
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name, value):
+        if name not in self.distributions:
+            self.distributions[name] = CountHistogram()
+        self.distributions[name].record(value)
+
+    def emit(self, name, value):
+        # Forward one event to the sink, if there is one
+        if self.sink is not None:
+            self.sink(name, value)
+
+    def gauges(self):
+        # Shape of the structure right now (costs a bucket scan for hash tables)
+        structure = self.structure
+        gauges = {}
+        table = getattr(structure, "table", None)
+        if isinstance(table, list) and table and isinstance(table[0], list):
+            lengths = [len(bucket) for bucket in table]
+            gauges["table_size"] = len(table)
+            gauges["load_factor"] = sum(lengths) / len(table)
+            gauges["longest_chain"] = max(lengths)
+            gauges["empty_bucket_share"] = lengths.count(0) / len(table)
+        if hasattr(structure, "root") and hasattr(structure, "_get_height"):
+            gauges["height"] = structure._get_height(structure.root)
+            gauges["size"] = len(structure)
+        return gauges
+
+    def stats(self):
+        # Snapshot of everything recorded so far
+        return {
+            "structure": type(self.structure).__name__,
+            "calls": {name: histogram.snapshot() for name, histogram in self.calls.items()},
+            "counters": dict(self.counters),
+            "distributions": {name: histogram.snapshot() for name, histogram in self.distributions.items()},
+            "resize_time": self.resize_time.snapshot(),
+            "gauges": self.gauges(),
+        }
+
+    def export(self, sink=None):
+        # Send the snapshot to sink (default: this instrumentation's sink) as flat (name, value)
+        # pairs, e.g. ("calls.search_by_isbn.p99_us", 4.0)
+        sink = sink or self.sink
+        stats = self.stats()
+        prefix = stats.pop("structure")
+
+        def flatten(path, value):
+            if isinstance(value, dict):
+                for key, inner in value.items():
+                    flatten(f"{path}.{key}", inner)
+            else:
+                sink(path, value)
+
+        flatten(prefix, stats)
+
+    def wrap(self, name, make_wrapper):
+        # Shadow structure.name with make_wrapper(original bound method) on this instance only
+        original = getattr(self.structure, name)
+        setattr(self.structure, name, make_wrapper(original))
+        self.wrapped.append(name)
+
+
+def _public_methods(structure):
+    # Names of the plain public methods defined by the structure's class. Generators are left
+    # out, since timing them would only time creating the generator.
+    names = []
+    for name in dir(type(structure)):
+        attribute = inspect.getattr_static(type(structure), name)
+        if not name.startswith("_") and inspect.isfunction(attribute) \
+                and not inspect.isgeneratorfunction(attribute):
+            names.append(name)
+    return names
+
+
+def _timed(histogram, method):
+    clock = time.perf_counter
+
+    def timed(*args, **kwargs):
+        start = clock()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            histogram.record(clock() - start)
+
+    return timed
+
+
+def instrument(structure, sink=None):
+    """
+    Start recording metrics for structure and return its Instrumentation. Calling
+    it again on an instrumented structure returns the existing Instrumentation.
+    """
+    existing = structure.__dict__.get("_instrumentation")
+    if existing is not None:
+        return existing
+    probe = Instrumentation(structure, sink)
+
+    # Chain lengths: _hash covers add_book and remove_book; lookups compute their bucket inline,
+    # so they are measured by a wrapper that checks the bucket first
+    table = getattr(structure, "table", None)
+    chained = isinstance(table, list) and hasattr(structure, "_hash")
+    if chained:
+        def wrap_hash(original):
+            def hashed(key):
+                index = original(key)
+                probe.observe("chain_length", len(structure.table[index]))
+                return index
+            return hashed
+        probe.wrap("_hash", wrap_hash)
+
+    if hasattr(structure, "_resize"):
+        def wrap_resize(original):
+            clock = time.perf_counter
+
+            def resized(*args, **kwargs):
+                start = clock()
+                result = original(*args, **kwargs)
+                duration = clock() - start
+                probe.count("resizes")
+                probe.resize_time.record(duration)
+                probe.emit("resize_seconds", duration)
+                return result
+            return resized
+        probe.wrap("_resize", wrap_resize)
+
+    rotating = hasattr(structure, "_rotate_left") and hasattr(structure, "_rotate_right")
+    if rotating:
+        def wrap_rotation(original):
+            def rotated(node):
+                probe.count("rotations")
+                return original(node)
+            return rotated
+        probe.wrap("_rotate_left", wrap_rotation)
+        probe.wrap("_rotate_right", wrap_rotation)
+
+    for name in _public_methods(structure):
+        histogram = probe.calls[name] = LatencyHistogram()
+        if chained and name in ("search_by_isbn", "search_many_by_isbn"):
+            def wrap_lookup(original, many=(name == "search_many_by_isbn")):
+                def looked_up(keys):
+                    if many:
+                        keys = list(keys)  # Counted here and then searched, so a generator must be read once
+                    table = structure.table
+                    for key in (keys if many else (keys,)):
+                        probe.observe("chain_length", len(table[hash(key) % len(table)]))
+                    return original(keys)
+                return _timed(histogram, looked_up)
+            probe.wrap(name, wrap_lookup)
+        elif rotating and name in ("insert", "delete"):
+            def wrap_update(original, name=name, histogram=histogram):
+                def updated(*args, **kwargs):
+                    before = probe.counters.get("rotations", 0)
+                    try:
+                        return original(*args, **kwargs)
+                    finally:
+                        probe.observe(f"rotations_per_{name}", probe.counters.get("rotations", 0) - before)
+                return _timed(histogram, updated)
+            probe.wrap(name, wrap_update)
+        else:
+            probe.wrap(name, lambda original, histogram=histogram: _timed(histogram, original))
+
+    structure._instrumentation = probe
+    return probe
+
+
+def uninstrument(structure):
+    # Remove the wrappers, restoring the class methods; return the final Instrumentation or None
+    probe = structure.__dict__.pop("_instrumentation", None)
+    if probe is not None:
+        for name in probe.wrapped:
+            structure.__dict__.pop(name, None)
+    return probe
@@ -0,0 +1,33 @@
+"""
+This code defines ISBN normalization, shared by the ingestion pipeline and the
+key-encoding layer. An ISBN-10 or ISBN-13, with or without hyphens and spaces,
+is validated by its check digit and returned as a 13-digit ISBN-13 string.
+"""
+
+
+def _isbn13_check_digit(first12):
+    # Check digit for the first 12 digits of an ISBN-13
+    total = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(first12))
+    return str((10 - total % 10) % 10)
+
+
+def normalize_isbn(raw):
+    """
+    Return raw (an ISBN-10 or ISBN-13, with or without hyphens and spaces) as a
+    13-digit string. Raises ValueError if the ISBN is malformed or its check digit
+    is wrong.
+    """
+    isbn = raw.replace("-", "").replace(" ", "").upper()
+    if len(isbn) == 10:
+        if not isbn[:9].isdigit() or not (isbn[9].isdigit() or isbn[9] == "X"):
+            raise ValueError(f"Malformed ISBN-10: {raw!r}")
+        digits = [int(d) for d in isbn[:9]] + [10 if isbn[9] == "X" else int(isbn[9])]
+        if sum((10 - i) * d for i, d in enumerate(digits)) % 11:
+            raise ValueError(f"Bad ISBN-10 check digit: {raw!r}")
+        first12 = "978" + isbn[:9]
+        return first12 + _isbn13_check_digit(first12)
+    if len(isbn) == 13 and isbn.isdigit():
+        if _isbn13_check_digit(isbn[:12]) != isbn[12]:
+            raise ValueError(f"Bad ISBN-13 check digit: {raw!r}")
+        return isbn
+    raise ValueError(f"Malformed ISBN: {raw!r}")
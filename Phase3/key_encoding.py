@@ -0,0 +1,172 @@
+"""
+This code defines a key-encoding layer for the catalog. ISBNs are stored as
+integers, and titles and authors are stored once each in symbol tables. Every
+ISBN-10 or ISBN-13, with or without hyphens, normalizes to a 13-digit ISBN-13,
+and that number always fits in 64 bits. A Python int hashes and compares faster
+than a 14-character string and takes about half the memory. The SymbolTable
+class dictionary-encodes strings: each distinct title or author is stored once
+and referred to by a small integer id, so a popular author's name is no longer
+repeated in every one of their books.
+
+EncodedCatalog uses both. Each book is a single dictionary entry that maps an
+ISBN code to its title and author ids, packed into one int. Each author's books
+are an array('Q') of ISBN codes instead of a list of ISBN strings. Its methods
+have the same signatures as ScalableHashTable's. They accept ISBN strings in any
+form, encoding them on the way in. The ISBNs they return are decoded as
+normalized 13-digit ISBN-13 strings, which may differ from the strings the books
+were added under. Callers that already hold ISBN codes can use search_by_code
+and codes_by_author to skip that step. ISBNs are validated when books are added.
+A lookup for a malformed ISBN simply finds nothing.
+"""
+from array import array
+
+from isbn import normalize_isbn
+
+
+def encode_isbn(raw):
+    # 64-bit integer code of an ISBN-10 or ISBN-13; raises ValueError if it is not a valid ISBN
+    return int(normalize_isbn(raw))
+
+
+def decode_isbn(code):
+    # The 13-digit ISBN string an encode_isbn code stands for. Every ISBN-13 starts with 978 or
+    # 979, so str() never needs zero padding.
+    return str(code)
+
+
+def _lookup_code(raw):
+    # Code to look raw up by, or None if it can't be a stored ISBN. A 13-digit ISBN skips check
+    # digit validation, since an invalid one was never stored and simply won't be found.
+    isbn = raw.replace("-", "")
+    if len(isbn) == 13 and isbn.isdigit():
+        return int(isbn)
+    try:
+        return encode_isbn(raw)
+    except ValueError:
+        return None
+
+
+class SymbolTable:
+    def __init__(self):
+        # Each distinct string is stored once, in strings, and known by its index there
+        self.ids = {}
+        self.strings = []
+
+    def intern(self, string):
+        # Return string's id, adding it if it's new
+        symbol = self.ids.get(string)
+        if symbol is None:
+            symbol = self.ids[string] = len(self.strings)
+            self.strings.append(string)
+        return symbol
+
+    def id_of(self, string):
+        # Return string's id, or None if it has never been interned
+        return self.ids.get(string)
+
+    def __getitem__(self, symbol):
+        return self.strings[symbol]
+
+    def __len__(self):
+        return len(self.strings)
+
+
+class EncodedCatalog:
+    def __init__(self):
+        self.titles = SymbolTable()
+        self.authors = SymbolTable()
+        self.books = {}  # ISBN code -> title id << 32 | author id
+        # Indexed by title id: the ISBN code, an array('Q') of codes once two books share the
+        # title, or None once it has none. A list slot is far smaller than a dictionary entry.
+        self.isbns_by_title = []
+        self.isbns_by_author = {}  # author id -> array('Q') of ISBN codes
+
+    def add_book(self, isbn, book):
+        # Add a book with the given ISBN and book data (title, author); an existing ISBN is updated
+        code = encode_isbn(isbn)
+        if code in self.books:
+            self._unindex_book(code, self.books[code])
+        title_id = self.titles.intern(book[0])
+        author_id = self.authors.intern(book[1])
+        self.books[code] = title_id << 32 | author_id
+        if title_id == len(self.isbns_by_title):
+            self.isbns_by_title.append(None)
+        codes = self.isbns_by_title[title_id]
+        if codes is None:
+            self.isbns_by_title[title_id] = code
+        elif isinstance(codes, array):
+            codes.append(code)
+        else:
+            self.isbns_by_title[title_id] = array("Q", (codes, code))
+        postings = self.isbns_by_author.get(author_id)
+        if postings is None:
+            postings = self.isbns_by_author[author_id] = array("Q")
+        postings.append(code)
+
+    def _unindex_book(self, code, packed):
+        # Remove code from its title's and author's entries, dropping ones that become empty
+        title_id, author_id = packed >> 32, packed & 0xFFFFFFFF
+        codes = self.isbns_by_title[title_id]
+        if isinstance(codes, array):
+            codes.remove(code)
+            if len(codes) == 1:
+                self.isbns_by_title[title_id] = codes[0]
+        else:
+            self.isbns_by_title[title_id] = None
+        postings = self.isbns_by_author[author_id]
+        postings.remove(code)
+        if not postings:
+            del self.isbns_by_author[author_id]
+
+    def remove_book(self, isbn):
+        # Remove a book by ISBN; return True if it was removed, False if it wasn't found
+        code = _lookup_code(isbn)
+        packed = self.books.pop(code, None)
+        if packed is None:
+            return False
+        self._unindex_book(code, packed)
+        return True
+
+    def search_by_code(self, code):
+        # (title, author) of the book with ISBN code, or "Book not found"
+        packed = self.books.get(code)
+        if packed is None:
+            return "Book not found"
+        return self.titles.strings[packed >> 32], self.authors.strings[packed & 0xFFFFFFFF]
+
+    def search_by_isbn(self, isbn):
+        # (title, author) of the book with the given ISBN-10 or ISBN-13, or "Book not found"
+        return self.search_by_code(_lookup_code(isbn))
+
+    def search_many_by_isbn(self, isbns):
+        # Look up a batch of ISBNs and return their (title, author) or "Book not found" in input order
+        get = self.books.get
+        titles = self.titles.strings
+        authors = self.authors.strings
+        results = []
+        for isbn in isbns:
+            packed = get(_lookup_code(isbn))
+            if packed is None:
+                results.append("Book not found")
+            else:
+                results.append((titles[packed >> 32], authors[packed & 0xFFFFFFFF]))
+        return results
+
+    def search_by_title(self, title):
+        # ISBN of the book with this title (the earliest added if titles repeat), or "Book not found"
+        title_id = self.titles.id_of(title)
+        codes = None if title_id is None else self.isbns_by_title[title_id]
+        if codes is None:
+            return "Book not found"
+        return decode_isbn(codes[0] if isinstance(codes, array) else codes)
+
+    def codes_by_author(self, author):
+        # A copy of the author's ISBN codes as an array('Q'), without decoding them (empty if unknown)
+        return array("Q", self.isbns_by_author.get(self.authors.id_of(author), ()))
+
+    def search_by_author(self, author):
+        # ISBNs of every book by the author, in the order they were added
+        return list(map(decode_isbn, self.isbns_by_author.get(self.authors.id_of(author), ())))
+
+    def __len__(self):
+        return len(self.books)
@@ -0,0 +1,164 @@
+"""
+This code is a load generator for catalog_service.py. It replays the same
+request mix two ways and reports requests per second and latency percentiles
+for each:
+
+    direct   the existing path: synchronous search_by_isbn, check_out and
+             return_book calls on a ScalableHashTable and OptimizedCheckedOutBooks
+    service  the same requests sent over TCP to a CatalogService running in a
+             separate process, from many concurrent connections, each waiting
+             for its response before sending the next request
+
+The service is run with micro-batching on and off (max_batch 1), so the effect of
+coalescing lookups can be seen on its own. Example:
+
+    python load_generator.py --books 100000 --requests 50000 --connections 64
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import time
+
+from benchmarks import percentile
+from catalog_service import preload, serve
+from scalable_hash_table import ScalableHashTable
+from optimized_checked_out_books import OptimizedCheckedOutBooks
+
+
+def make_requests(count, books, lookup_share=0.9, seed=42):
+    # Request dictionaries: lookup_share ISBN lookups (5% of them misses), the rest split
+    # between check-outs and returns of existing titles
+    rng = random.Random(seed)
+    requests = []
+    for i in range(count):
+        roll = rng.random()
+        book = rng.randrange(int(books * 1.05))
+        if roll < lookup_share:
+            requests.append({"id": i, "op": "search_by_isbn", "isbn": f"978-{book}"})
+        elif roll < lookup_share + (1 - lookup_share) / 2:
+            requests.append({"id": i, "op": "check_out", "title": f"Book {book}"})
+        else:
+            requests.append({"id": i, "op": "return_book", "title": f"Book {book}"})
+    return requests
+
+
+def summarize(latencies, seconds):
+    # Throughput and latency percentiles of one run
+    return {
+        "requests": len(latencies),
+        "req_per_s": len(latencies) / seconds,
+        "p50_us": percentile(latencies, 0.50) * 1e6,
+        "p99_us": percentile(latencies, 0.99) * 1e6,
+        "max_us": max(latencies) * 1e6,
+    }
+
+
+def run_direct(requests, books):
+    # Time each request as a direct method call, one after another
+    catalog = ScalableHashTable()
+    preload(catalog, books)
+    checked_out_books = OptimizedCheckedOutBooks()
+    calls = []
+    for request in requests:
+        if request["op"] == "search_by_isbn":
+            calls.append((catalog.search_by_isbn, request["isbn"]))
+        else:
+            calls.append((getattr(checked_out_books, request["op"]), request["title"]))
+    clock = time.perf_counter
+    latencies = []
+    start = clock()
+    for method, argument in calls:
+        begin = clock()
+        method(argument)
+        latencies.append(clock() - begin)
+    return summarize(latencies, clock() - start)
+
+
+def _run_server(conn, books, max_batch, max_delay):
+    # Server process entry point: report the bound port through conn, then serve until killed
+    asyncio.run(serve(port=0, books=books, max_batch=max_batch, max_delay=max_delay,
+                      ready=lambda address: conn.send(address[1])))
+
+
+async def _drive(port, requests, connections):
+    # Send requests over several connections; each waits for a response before sending again
+    latencies = []
+    lines = [json.dumps(request).encode() + b"\n" for request in requests]
+    streams = [await asyncio.open_connection("127.0.0.1", port) for _ in range(connections)]
+    clock = time.perf_counter
+
+    async def client(reader, writer, share):
+        for line in share:
+            begin = clock()
+            writer.write(line)
+            response = json.loads(await reader.readline())
+            latencies.append(clock() - begin)
+            if "error" in response:
+                raise RuntimeError(response["error"])
+
+    start = clock()
+    await asyncio.gather(*(client(reader, writer, lines[i::connections])
+                           for i, (reader, writer) in enumerate(streams)))
+    elapsed = clock() - start
+    writer = streams[0][1]
+    writer.write(json.dumps({"op": "stats"}).encode() + b"\n")
+    stats = json.loads(await streams[0][0].readline())["result"]
+    for _, writer in streams:
+        writer.close()
+    return latencies, elapsed, stats
+
+
+def run_service(requests, books, connections=64, max_batch=256, max_delay=0.0):
+    # Start a CatalogService in its own process and drive it over TCP
+    parent, child = multiprocessing.Pipe()
+    server = multiprocessing.Process(target=_run_server, args=(child, books, max_batch, max_delay), daemon=True)
+    server.start()
+    try:
+        port = parent.recv()
+        latencies, elapsed, stats = asyncio.run(_drive(port, requests, connections))
+    finally:
+        server.terminate()
+        server.join()
+    result = summarize(latencies, elapsed)
+    result["mean_batch_size"] = stats["mean_batch_size"]
+    result["server_lookup_p99_us"] = stats["latency"]["search_by_isbn"]["p99_us"]
+    return result
+
+
+def run_load(books=100000, requests=50000, connections=64, max_delay=0.0):
+    """
+    Run the direct path and the service with and without micro-batching, print a
+    line for each, and return the results.
+    """
+    mix = make_requests(requests, books)
+    print(f"Load test ({books:,} books, {requests:,} requests, {connections} connections)")
+    results = {"direct": run_direct(mix, books)}
+    for name, max_batch in (("service, batched", 256), ("service, unbatched", 1)):
+        results[name] = run_service(mix, books, connections, max_batch, max_delay)
+    for name, r in results.items():
+        batching = f"  mean batch {r['mean_batch_size']:5.1f}" if "mean_batch_size" in r else ""
+        print(f"  {name:20} {r['req_per_s']:10,.0f} req/s  p50 {r['p50_us']:8.1f} us  "
+              f"p99 {r['p99_us']:8.1f} us{batching}")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test catalog_service.py against direct calls.")
+    parser.add_argument("--books", type=int, default=100000, help="books preloaded into the catalog")
+    parser.add_argument("--requests", type=int, default=50000, help="requests per run")
+    parser.add_argument("--connections", type=int, default=64, help="concurrent client connections")
+    parser.add_argument("--max-delay", type=float, default=0.0,
+                        help="seconds the service's batcher waits for more lookups")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args(argv)
+    results = run_load(args.books, args.requests, args.connections, args.max_delay)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+This code adds a bounded lookup cache in front of the catalog search methods.
+Search traffic is heavily skewed towards a few hundred popular books, so caching
+their results avoids repeating the lookup work. LookupCache is a small LRU cache
+with an optional time-to-live. It counts hits, misses, evictions and expirations.
+CachedCatalog wraps a LibraryCatalog or ScalableHashTable, and CachedAVLTree
+wraps a ScalableAVLTree. Both serve repeated searches from the cache, also cache
+"not found" answers (negative caching), and invalidate exactly the affected
+entries when a book is added, updated or removed. Any object with the same
+get/put/invalidate/clear methods can be passed in place of LookupCache.
+"""
+import time
+from collections import OrderedDict
+
+MISSING = object()  # Returned by LookupCache.get when the key isn't cached
+
+
+class LookupCache:
+    def __init__(self, maxsize=1024, ttl=None, clock=time.monotonic):
+        # maxsize bounds the entry count (LRU eviction); ttl, in clock units, expires old entries
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()  # key -> (value, expiry time or None), oldest first
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        # Return the cached value for key, or MISSING; a hit marks the entry most recently used
+        entries = self.entries
+        entry = entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return MISSING
+        value, expires = entry
+        if expires is not None and self.clock() >= expires:
+            del self.entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return MISSING
+        entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        # Cache value for key, evicting the least recently used entry if the cache is full
+        expires = self.clock() + self.ttl if self.ttl is not None else None
+        self.entries[key] = (value, expires)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key):
+        # Drop key from the cache if present
+        self.entries.pop(key, None)
+
+    def clear(self):
+        # Drop every entry (counters are kept)
+        self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def stats(self):
+        # Snapshot of the counters and current size
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "size": len(self.entries),
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class CachedCatalog:
+    """
+    Caching front end for a LibraryCatalog or ScalableHashTable. Searches by
+    ISBN, title and author are cached, including "Book not found" results unless
+    cache_negative is False. Writes go through add_book/remove_book so the
+    affected cache entries can be invalidated.
+    """
+
+    def __init__(self, catalog, cache=None, cache_negative=True):
+        self.catalog = catalog
+        self.cache = cache if cache is not None else LookupCache()
+        self.cache_negative = cache_negative
+
+    def _cached(self, kind, key, search, not_found):
+        # Serve (kind, key) from the cache, falling back to search(key) on a miss
+        value = self.cache.get((kind, key))
+        if value is not MISSING:
+            return value
+        value = search(key)
+        if self.cache_negative or value != not_found:
+            self.cache.put((kind, key), value)
+        return value
+
+    def search_by_isbn(self, isbn):
+        return self._cached("isbn", isbn, self.catalog.search_by_isbn, "Book not found")
+
+    def search_by_title(self, title):
+        return self._cached("title", title, self.catalog.search_by_title, "Book not found")
+
+    def search_by_author(self, author):
+        # Cached as a tuple copy, since LibraryCatalog returns its live list, which later writes
+        # would change behind the cache; each caller gets a list of its own
+        search = lambda key: tuple(self.catalog.search_by_author(key))
+        return list(self._cached("author", author, search, ()))
+
+    def _invalidate_book(self, isbn, book):
+        # Drop the cache entries that may mention this ISBN or this (title, author) pair
+        self.cache.invalidate(("isbn", isbn))
+        if isinstance(book, tuple) and len(book) >= 2:
+            self.cache.invalidate(("title", book[0]))
+            self.cache.invalidate(("author", book[1]))
+
+    def add_book(self, isbn, *details):
+        # Add or update a book. Accepts LibraryCatalog's (isbn, title, author) and
+        # ScalableHashTable's (isbn, (title, author)) signatures.
+        old = self.catalog.search_by_isbn(isbn)
+        self.catalog.add_book(isbn, *details)
+        self._invalidate_book(isbn, old)
+        self._invalidate_book(isbn, details[0] if len(details) == 1 else details)
+
+    def remove_book(self, isbn):
+        # Remove a book (ScalableHashTable only) and invalidate its cache entries
+        old = self.catalog.search_by_isbn(isbn)
+        removed = self.catalog.remove_book(isbn)
+        self._invalidate_book(isbn, old)
+        return removed
+
+
+class CachedAVLTree:
+    """
+    Caching front end for ScalableAVLTree.search. Results (including None for
+    missing keys unless cache_negative is False) are cached per key, and insert
+    and delete invalidate that key.
+    """
+
+    def __init__(self, tree, cache=None, cache_negative=True):
+        self.tree = tree
+        self.cache = cache if cache is not None else LookupCache()
+        self.cache_negative = cache_negative
+
+    def search(self, key):
+        node = self.cache.get(key)
+        if node is not MISSING:
+            return node
+        node = self.tree.search(key)
+        if self.cache_negative or node is not None:
+            self.cache.put(key, node)
+        return node
+
+    def insert(self, key, value):
+        self.tree.insert(key, value)
+        self.cache.invalidate(key)
+
+    def delete(self, key):
+        # Deleting a node with two children moves its successor's entry into it, so the
+        # successor's cached node goes stale too; invalidate both keys
+        for successor, _ in self.tree.items_after(key, 1):
+            self.cache.invalidate(successor)
+        self.cache.invalidate(key)
+        return self.tree.delete(key)
@@ -2,24 +2,153 @@
 This code implements an AVL tree data structure using two classes: AVLNode and ScalableAVLTree. 
 The AVLNode class represents individual nodes in the tree, each containing a key, value, and 
 pointers to its left and right children. The ScalableAVLTree class manages the overall tree 
-structure, providing methods for inserting new nodes and searching for keys. The AVL tree 
-automatically balances itself after each insertion to maintain optimal search performance, 
-ensuring that operations like insertion and search run in O(log n) time.
+structure, providing methods for inserting, deleting and searching for keys. All three are 
+iterative: insert and delete record the root-to-leaf path on an explicit stack and rebalance 
+on the way back up, so no Python frame is spent per level. The AVL tree 
+automatically balances itself after each insertion and deletion to maintain optimal search performance, 
+ensuring that operations like insertion and search run in O(log n) time. Large batches can 
+skip per-key insertion entirely: bulk_load builds a perfectly balanced tree from a batch in 
+one pass, and merge folds a batch into an existing tree by rebuilding it in O(n + m). 
+Ordered queries (items, range, prefix and items_after) are lazy generators that walk the 
+tree with a stack instead of materializing it, and every node tracks its subtree size so 
+rank and select can compute pagination offsets in O(log n). search_many resolves a batch of 
+keys in a single sorted sweep. save writes the tree to a compact snapshot file, and load 
+maps one back for lookups without rebuilding the tree. A tree created with persistent=True 
+never modifies a node once another version can see it: insert, delete and merge copy the 
+nodes on the path they change (path copying) and share every other subtree, and the new 
+root is published with a single assignment. snapshot() is then O(1), and a reader can walk 
+its version without locks while writers keep going.
 """
+from bisect import bisect_left, bisect_right
+
+from catalog_snapshot import MappedCatalog, save_snapshot
+
+SWEEP_CUTOFF = 8  # search_many splits runs longer than this; shorter ones descend key by key
+
 
 class AVLNode:
+    # Fixed attribute slots avoid a per-node __dict__, which dominates memory in large trees
+    __slots__ = ("key", "value", "left", "right", "height", "size")
+
     def __init__(self, key, value):
-        # Initialize a node with a key, value, and height
+        # Initialize a node with a key, value, height and subtree size
         self.key = key
         self.value = value
         self.left = None   # Left child
         self.right = None  # Right child
         self.height = 1    # Height of the node for balancing
+        self.size = 1      # Number of nodes in this subtree, for rank/select
 
 class ScalableAVLTree:
-    def __init__(self):
-        # Initialize an empty AVL tree
+    def __init__(self, persistent=False):
+        # Initialize an empty AVL tree; persistent=True switches updates to path copying
         self.root = None
+        self.persistent = persistent
+
+    @classmethod
+    def bulk_load(cls, iterable, presorted=False):
+        # Build a balanced tree from (key, value) pairs; pass presorted=True to skip sorting.
+        # As with insert, the first occurrence of a duplicate key wins.
+        tree = cls()
+        nodes = [AVLNode(key, value) for key, value in cls._sorted_unique(iterable, presorted)]
+        tree.root = tree._build_balanced(nodes, 0, len(nodes))
+        return tree
+
+    def merge(self, batch, presorted=False):
+        # Merge (key, value) pairs into the tree in O(n + m) by merging sorted runs and rebuilding.
+        # Existing nodes are reused (copied, in a persistent tree) and keep their values when a key
+        # is already present.
+        incoming = self._sorted_unique(batch, presorted)
+        existing = self._in_order_nodes()
+        if self.persistent:
+            existing = [AVLNode(node.key, node.value) for node in existing]
+        merged = []
+        i = j = 0
+        while i < len(existing) and j < len(incoming):
+            node = existing[i]
+            key, value = incoming[j]
+            if node.key < key:
+                merged.append(node)
+                i += 1
+            elif key < node.key:
+                merged.append(AVLNode(key, value))
+                j += 1
+            else:
+                # Duplicate keys are not allowed; keep the existing node
+                merged.append(node)
+                i += 1
+                j += 1
+        merged.extend(existing[i:])
+        merged.extend(AVLNode(key, value) for key, value in incoming[j:])
+        self.root = self._build_balanced(merged, 0, len(merged))
+
+    def snapshot(self):
+        # Return a tree holding the current version. For a persistent tree this is O(1): the
+        # snapshot shares every node, and later updates to either tree never touch them. Other
+        # trees are copied in O(n).
+        if not self.persistent:
+            return type(self).bulk_load(self.items(), presorted=True)
+        version = type(self)(persistent=True)
+        version.root = self.root
+        return version
+
+    def _copy(self, node):
+        # A private copy of node, for a persistent tree to modify instead of node itself
+        copy = AVLNode(node.key, node.value)
+        copy.left = node.left
+        copy.right = node.right
+        copy.height = node.height
+        copy.size = node.size
+        return copy
+
+    def _copy_path(self, path):
+        # Replace the root-to-node path with private copies, linked to each other and sharing
+        # every subtree off the path. The old root is left as it was.
+        copies = [self._copy(node) for node in path]
+        for i in range(1, len(path)):
+            if copies[i - 1].left is path[i]:
+                copies[i - 1].left = copies[i]
+            else:
+                copies[i - 1].right = copies[i]
+        return copies
+
+    @staticmethod
+    def _sorted_unique(pairs, presorted):
+        # Return (key, value) pairs sorted by key with later duplicates dropped
+        pairs = list(pairs)
+        if not presorted:
+            pairs.sort(key=lambda pair: pair[0])  # Stable sort keeps the first duplicate first
+        unique = []
+        for pair in pairs:
+            if not unique or unique[-1][0] < pair[0]:
+                unique.append(pair)
+        return unique
+
+    def _in_order_nodes(self):
+        # Collect the tree's nodes in key order using an explicit stack
+        nodes = []
+        stack = []
+        node = self.root
+        while stack or node:
+            while node:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            nodes.append(node)
+            node = node.right
+        return nodes
+
+    def _build_balanced(self, nodes, lo, hi):
+        # Link nodes[lo:hi] into a perfectly balanced subtree, setting heights directly
+        if lo >= hi:
+            return None
+        mid = (lo + hi) // 2
+        node = nodes[mid]
+        node.left = self._build_balanced(nodes, lo, mid)
+        node.right = self._build_balanced(nodes, mid + 1, hi)
+        node.height = 1 + max(self._get_height(node.left), self._get_height(node.right))
+        node.size = hi - lo
+        return node
 
     def _get_height(self, node):
         # Return the height of a node, or 0 if None
@@ -27,6 +156,12 @@ class ScalableAVLTree:
             return 0
         return node.height
 
+    def _get_size(self, node):
+        # Return the number of nodes in a subtree, or 0 if None
+        if not node:
+            return 0
+        return node.size
+
     def _get_balance(self, node):
         # Calculate and return the balance factor of a node
         if not node:
@@ -34,99 +169,287 @@ class ScalableAVLTree:
         return self._get_height(node.left) - self._get_height(node.right)
 
     def _rotate_right(self, y):
-        # Perform a right rotation around node y
+        # Perform a right rotation around node y. In a persistent tree, y must already be a
+        # private copy; its left child is copied here before it is changed.
         x = y.left
+        if self.persistent:
+            x = self._copy(x)
         T2 = x.right
 
         # Rotate nodes
         x.right = y
         y.left = T2
 
-        # Update heights
+        # Update heights and subtree sizes
         y.height = 1 + max(self._get_height(y.left), self._get_height(y.right))
         x.height = 1 + max(self._get_height(x.left), self._get_height(x.right))
+        x.size = y.size
+        y.size = 1 + self._get_size(y.left) + self._get_size(y.right)
 
         # Return new root after rotation
         return x
 
     def _rotate_left(self, x):
-        # Perform a left rotation around node x
+        # Perform a left rotation around node x (a private copy, in a persistent tree)
         y = x.right
+        if self.persistent:
+            y = self._copy(y)
         T2 = y.left
 
         # Rotate nodes
         y.left = x
         x.right = T2
 
-        # Update heights
+        # Update heights and subtree sizes
         x.height = 1 + max(self._get_height(x.left), self._get_height(x.right))
         y.height = 1 + max(self._get_height(y.left), self._get_height(y.right))
+        y.size = x.size
+        x.size = 1 + self._get_size(x.left) + self._get_size(x.right)
 
         # Return new root after rotation
         return y
 
+    def _rebalance(self, node):
+        # Restore the AVL property at node (whose height is up to date) and return the subtree root
+        balance = self._get_balance(node)
+        if balance > 1:
+            # Left Right Case reduces to Left Left after rotating the left child
+            if self._get_balance(node.left) < 0:
+                child = self._copy(node.left) if self.persistent else node.left
+                node.left = self._rotate_left(child)
+            # Left Left Case
+            return self._rotate_right(node)
+        if balance < -1:
+            # Right Left Case reduces to Right Right after rotating the right child
+            if self._get_balance(node.right) > 0:
+                child = self._copy(node.right) if self.persistent else node.right
+                node.right = self._rotate_right(child)
+            # Right Right Case
+            return self._rotate_left(node)
+        return node
+
+    def _rebalance_path(self, path):
+        # Walk the recorded root-to-parent path bottom-up, updating heights and rotating as needed.
+        # Returns the node now at the top of the path, for the caller to make the root.
+        top = path[0]
+        for i in range(len(path) - 1, -1, -1):
+            node = path[i]
+            old_height = node.height
+            node.height = 1 + max(self._get_height(node.left), self._get_height(node.right))
+            node.size = 1 + self._get_size(node.left) + self._get_size(node.right)
+            subtree = self._rebalance(node)
+            if subtree is not node:
+                # Re-attach the rotated subtree to its parent (or make it the new root)
+                if i == 0:
+                    top = subtree
+                elif path[i - 1].left is node:
+                    path[i - 1].left = subtree
+                else:
+                    path[i - 1].right = subtree
+            if subtree.height == old_height:
+                # Subtree height is unchanged, so no ancestor needs rebalancing; only sizes remain
+                for ancestor in reversed(path[:i]):
+                    ancestor.size = 1 + self._get_size(ancestor.left) + self._get_size(ancestor.right)
+                break
+        return top
+
     def insert(self, key, value):
-        # Insert a key-value pair into the AVL tree
+        # Insert a key-value pair into the AVL tree. A persistent tree returns its new root, which
+        # is the old one if the key was already present.
         if not self.root:
             # If the tree is empty, create a new root node
             self.root = AVLNode(key, value)
+            return self.root if self.persistent else None
+        # Descend iteratively, recording the path so we can rebalance without recursion
+        path = []
+        node = self.root
+        while node:
+            path.append(node)
+            if key < node.key:
+                node = node.left
+            elif key > node.key:
+                node = node.right
+            else:
+                # Duplicate keys are not allowed; keep the existing node
+                return self.root if self.persistent else None
+        if self.persistent:
+            path = self._copy_path(path)
+        parent = path[-1]
+        if key < parent.key:
+            parent.left = AVLNode(key, value)
         else:
-            # Insert recursively starting from the root
-            self.root = self._insert(self.root, key, value)
+            parent.right = AVLNode(key, value)
+        # Publishing the new root is a single assignment, so readers see the old or new version
+        self.root = self._rebalance_path(path)
+        if self.persistent:
+            return self.root
 
-    def _insert(self, node, key, value):
-        # Recursive helper function to insert a node
+    def delete(self, key):
+        # Remove the node with the given key; return True if it was removed, False if not found
+        path = []
+        node = self.root
+        while node and node.key != key:
+            path.append(node)
+            node = node.left if key < node.key else node.right
         if not node:
-            # Insert new node at the correct position
-            return AVLNode(key, value)
-        if key < node.key:
-            # Traverse left subtree
-            node.left = self._insert(node.left, key, value)
-        elif key > node.key:
-            # Traverse right subtree
-            node.right = self._insert(node.right, key, value)
+            return False
+        if self.persistent:
+            path = self._copy_path(path + [node])
+            node = path.pop()
+        if node.left and node.right:
+            # Two children: move the in-order successor's entry here and delete the successor instead
+            path.append(node)
+            start = len(path)
+            successor = node.right
+            while successor.left:
+                path.append(successor)
+                successor = successor.left
+            if self.persistent and len(path) > start:
+                # Copy the way down to the successor too, since its parent gets a new child
+                path[start:] = self._copy_path(path[start:])
+                node.right = path[start]
+            node.key, node.value = successor.key, successor.value
+            node = successor
+        # node now has at most one child, which takes its place
+        child = node.left or node.right
+        if not path:
+            self.root = child
+            return True
+        if path[-1].left is node:
+            path[-1].left = child
         else:
-            # Duplicate keys are not allowed; return the existing node
-            return node
+            path[-1].right = child
+        self.root = self._rebalance_path(path)
+        return True
 
-        # Update the height of the ancestor node
-        node.height = 1 + max(self._get_height(node.left), self._get_height(node.right))
+    def search(self, key):
+        # Search for a node by key and return it, or None if not found
+        node = self.root
+        while node and node.key != key:
+            # Traverse the left or right subtree
+            node = node.left if key < node.key else node.right
+        return node
 
-        # Get the balance factor to check if the node is unbalanced
-        balance = self._get_balance(node)
+    def search_many(self, keys):
+        # Search for a batch of keys and return their nodes (or None) in input order.
+        # The keys are sorted once and swept down the tree together: at each node the sorted
+        # run is split around node.key, so a shared path prefix is walked only once.
+        keys = list(keys)
+        results = [None] * len(keys)
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        sorted_keys = [keys[i] for i in order]
+        stack = [(self.root, 0, len(keys))]
+        while stack:
+            node, lo, hi = stack.pop()
+            if not node or lo >= hi:
+                continue
+            if hi - lo <= SWEEP_CUTOFF:
+                # Few keys share this subtree; finishing each with a plain descent is cheaper
+                for i in range(lo, hi):
+                    key = sorted_keys[i]
+                    found = node
+                    while found and found.key != key:
+                        found = found.left if key < found.key else found.right
+                    results[order[i]] = found
+                continue
+            # Keys in [lo, mid) go left, [mid, split) match node.key, [split, hi) go right
+            mid = bisect_left(sorted_keys, node.key, lo, hi)
+            split = bisect_right(sorted_keys, node.key, mid, hi)
+            for i in range(mid, split):
+                results[order[i]] = node
+            stack.append((node.left, lo, mid))
+            stack.append((node.right, split, hi))
+        return results
 
-        # Left Left Case
-        if balance > 1 and key < node.left.key:
-            return self._rotate_right(node)
+    def __len__(self):
+        # Return the number of keys in the tree
+        return self._get_size(self.root)
 
-        # Right Right Case
-        if balance < -1 and key > node.right.key:
-            return self._rotate_left(node)
+    def _iter_from(self, key, inclusive):
+        # Yield nodes in key order starting at the first key >= key (or > key when not inclusive).
+        # Only the current root-to-node path is kept on the stack, so iteration is lazy.
+        stack = []
+        node = self.root
+        while node:
+            if key is None or node.key > key or (inclusive and node.key == key):
+                stack.append(node)
+                node = node.left
+            else:
+                node = node.right
+        while stack:
+            node = stack.pop()
+            yield node
+            child = node.right
+            while child:
+                stack.append(child)
+                child = child.left
 
-        # Left Right Case
-        if balance > 1 and key > node.left.key:
-            node.left = self._rotate_left(node.left)
-            return self._rotate_right(node)
+    def items(self):
+        # Lazily yield every (key, value) pair in sorted order
+        for node in self._iter_from(None, True):
+            yield node.key, node.value
 
-        # Right Left Case
-        if balance < -1 and key < node.right.key:
-            node.right = self._rotate_right(node.right)
-            return self._rotate_left(node)
+    def range(self, lo=None, hi=None):
+        # Lazily yield (key, value) pairs with lo <= key < hi in sorted order; None leaves a bound open
+        for node in self._iter_from(lo, True):
+            if hi is not None and not node.key < hi:
+                return
+            yield node.key, node.value
 
-        # Return the (possibly updated) node pointer
-        return node
+    def prefix(self, p):
+        # Lazily yield (key, value) pairs whose (string) key starts with p, in sorted order
+        for node in self._iter_from(p, True):
+            if not node.key.startswith(p):
+                return
+            yield node.key, node.value
 
-    def search(self, key):
-        # Search for a node by key and return it
-        return self._search(self.root, key)
-
-    def _search(self, node, key):
-        # Recursive helper function to search for a key
-        if not node or node.key == key:
-            # Return the node if found, or None if not found
-            return node
-        if key < node.key:
-            # Traverse left subtree
-            return self._search(node.left, key)
-        # Traverse right subtree
-        return self._search(node.right, key)
+    def items_after(self, key, limit):
+        # Yield up to limit (key, value) pairs with keys strictly after key, for cursor pagination.
+        # Pass key=None to start from the smallest key.
+        if limit <= 0:
+            return
+        for node in self._iter_from(key, key is None):
+            yield node.key, node.value
+            limit -= 1
+            if limit == 0:
+                return
+
+    def rank(self, key):
+        # Return the number of keys strictly less than key in O(log n)
+        rank = 0
+        node = self.root
+        while node:
+            if key <= node.key:
+                node = node.left
+            else:
+                rank += 1 + self._get_size(node.left)
+                node = node.right
+        return rank
+
+    def select(self, i):
+        # Return the node holding the i-th smallest key (0-based) in O(log n)
+        if i < 0:
+            i += self._get_size(self.root)
+        if not 0 <= i < self._get_size(self.root):
+            raise IndexError("select index out of range")
+        node = self.root
+        while True:
+            left_size = self._get_size(node.left)
+            if i < left_size:
+                node = node.left
+            elif i == left_size:
+                return node
+            else:
+                i -= left_size + 1
+                node = node.right
+
+    def save(self, path):
+        # Write the tree's (key, value) pairs, already in key order, to a snapshot file.
+        # Keys must be strings and values strings or tuples of strings.
+        save_snapshot(path, self.items(), presorted=True)
+
+    @staticmethod
+    def load(path):
+        # Map a snapshot written by save; MappedCatalog.search returns the stored value
+        # (not a node) by binary-searching the file instead of rebuilding the tree
+        return MappedCatalog(path)
@@ -6,49 +6,143 @@ books using their ISBN as the key and associated data (like title and other
 details) as the value. The hash table automatically resizes itself when the 
 load factor exceeds 0.75 to maintain efficient performance. It provides methods 
 to search for a book by its ISBN and to find an ISBN based on the book's title.
+Like the Phase 2 LibraryCatalog, it maintains secondary indexes mapping titles 
+and authors to ISBNs, so title and author lookups avoid scanning every bucket. 
+The indexes are kept consistent when a book is added, updated or removed; book 
+data must be a (title, author) tuple, checked before anything is changed. 
+search_many_by_isbn resolves a batch of ISBNs in one call. Writers only append to 
+or swap out the lists a reader may be iterating, never remove from them, so under 
+the GIL one writer can run alongside lock-free readers (see ConcurrentCatalog). save writes the table 
+to a compact snapshot file, and load maps one back for lookups without rebuilding. 
+reserve grows the table once ahead of a bulk load, instead of doubling repeatedly.
 """
+from catalog_snapshot import MappedCatalog, save_snapshot
+
+
 class ScalableHashTable:
     def __init__(self):
         # Initialize the hash table with a default size and empty buckets
         self.table_size = 100
         self.table = [[] for _ in range(self.table_size)]  # List of buckets for chaining
         self.num_entries = 0  # Track the number of entries in the table
+        # Secondary indexes: title -> list of ISBNs and author -> list of ISBNs
+        self.isbns_by_title = {}
+        self.isbns_by_author = {}
 
     def _hash(self, key):
         # Compute the hash index for a given key
         return hash(key) % self.table_size
 
+    def _index_book(self, key, value):
+        # Record the book's title and author (book_data[0] and book_data[1]) in the secondary indexes
+        self.isbns_by_title.setdefault(value[0], []).append(key)
+        self.isbns_by_author.setdefault(value[1], []).append(key)
+
+    def _unindex_book(self, key, value):
+        # Remove the book's ISBN from the secondary indexes, dropping keys that become empty
+        for index, field in ((self.isbns_by_title, value[0]), (self.isbns_by_author, value[1])):
+            # Build a new list rather than mutating in place, so a concurrent reader keeps a consistent copy
+            isbns = [isbn for isbn in index[field] if isbn != key]
+            if isbns:
+                index[field] = isbns
+            else:
+                del index[field]
+
     def add_book(self, key, value):
-        # Add a book with the given ISBN (key) and book data (value) to the hash table
+        # Add a book with the given ISBN (key) and book data (value) to the hash table.
+        # If the ISBN is already present its data is replaced and the indexes are updated.
+        # The value is checked first, so a malformed one raises before anything has changed.
+        if not isinstance(value, tuple) or len(value) != 2:
+            raise ValueError(f"Book data must be a (title, author) tuple, got {value!r}")
         index = self._hash(key)
-        self.table[index].append((key, value))  # Append to the appropriate bucket
+        bucket = self.table[index]
+        for i, (book_isbn, book_data) in enumerate(bucket):
+            if book_isbn == key:
+                self._unindex_book(key, book_data)
+                bucket[i] = (key, value)
+                self._index_book(key, value)
+                return
+        bucket.append((key, value))  # Append to the appropriate bucket
+        self._index_book(key, value)
         self.num_entries += 1
         # Resize the table if the load factor exceeds 0.75
         if self.num_entries / self.table_size > 0.75:
             self._resize()
 
-    def _resize(self):
-        # Double the table size and rehash all existing entries
-        self.table_size *= 2
-        new_table = [[] for _ in range(self.table_size)]  # Create a new larger table
+    def _resize(self, new_size=None):
+        # Grow the table (by default, double it) and rehash all existing entries
+        new_size = new_size or self.table_size * 2
+        new_table = [[] for _ in range(new_size)]  # Create a new larger table
         for bucket in self.table:
             for key, value in bucket:
-                new_index = hash(key) % self.table_size
+                new_index = hash(key) % new_size
                 new_table[new_index].append((key, value))  # Rehash entries into new table
-        self.table = new_table  # Replace the old table with the new one
+        # Replace the old table with the new one in a single assignment; readers that already
+        # hold the old table finish their lookup against it
+        self.table = new_table
+        self.table_size = new_size
 
-    def search_by_isbn(self, isbn):
-        # Search for a book by ISBN and return its data
+    def reserve(self, count):
+        # Grow the table once so count entries fit without further resizes, e.g. before a bulk load
+        new_size = self.table_size
+        while count / new_size > 0.75:
+            new_size *= 2
+        if new_size > self.table_size:
+            self._resize(new_size)
+
+    def remove_book(self, isbn):
+        # Remove a book by ISBN; return True if it was removed, False if it wasn't found
         index = self._hash(isbn)
-        for book_isbn, book_data in self.table[index]:
+        bucket = self.table[index]
+        for i, (book_isbn, book_data) in enumerate(bucket):
+            if book_isbn == isbn:
+                # Replace the bucket instead of deleting in place so concurrent readers iterating
+                # the old bucket don't skip the entry after it
+                self.table[index] = bucket[:i] + bucket[i + 1:]
+                self._unindex_book(isbn, book_data)
+                self.num_entries -= 1
+                return True
+        return False
+
+    def search_by_isbn(self, isbn):
+        # Search for a book by ISBN and return its data. The index is taken from the table we
+        # read, so a lookup racing with _resize never pairs the new size with the old table.
+        table = self.table
+        for book_isbn, book_data in table[hash(isbn) % len(table)]:
             if book_isbn == isbn:
                 return book_data  # Return the book data if ISBN matches
         return "Book not found"
 
+    def search_many_by_isbn(self, isbns):
+        # Look up a batch of ISBNs and return their data (or "Book not found") in input order.
+        # The table and its size are bound once, so each key costs a bucket scan but no method calls.
+        table = self.table
+        table_size = len(table)
+        results = []
+        for isbn in isbns:
+            for book_isbn, book_data in table[hash(isbn) % table_size]:
+                if book_isbn == isbn:
+                    results.append(book_data)
+                    break
+            else:
+                results.append("Book not found")
+        return results
+
     def search_by_title(self, title):
-        # Search for a book by title and return its ISBN
-        for bucket in self.table:
-            for book_isbn, book_data in bucket:
-                if book_data[0] == title:  # Assuming book_data[0] contains the title
-                    return book_isbn  # Return the ISBN if title matches
-        return "Book not found"
+        # Search for a book by title and return its ISBN (the earliest added if titles repeat)
+        isbns = self.isbns_by_title.get(title)
+        return isbns[0] if isbns else "Book not found"
+
+    def search_by_author(self, author):
+        # Search for books by author and return a list of their ISBNs
+        return list(self.isbns_by_author.get(author, []))
+
+    def save(self, path):
+        # Write every (ISBN, book data) entry to a snapshot file; book data must be strings
+        save_snapshot(path, (entry for bucket in self.table for entry in bucket))
+
+    @staticmethod
+    def load(path):
+        # Map a snapshot written by save; the returned MappedCatalog answers search_by_isbn
+        # by binary-searching the file instead of re-inserting every book
+        return MappedCatalog(path)
@@ -0,0 +1,193 @@
+"""
+This code defines a ShardedCatalog that spreads the catalog over several worker
+processes, so lookups are not limited by a single interpreter's GIL. Books are
+partitioned by a stable hash of their ISBN. Each shard process owns its own
+ScalableHashTable (ISBN -> (title, author)) and a ScalableAVLTree keyed by
+(title, ISBN), so books sharing a title each keep their own entry. It answers
+requests sent over a pipe. Batch operations are scattered: each shard gets its
+share of the batch, all shards work at the same time, and the answers are
+gathered back into input order. Queries by title or author go to every shard,
+and ordered title ranges are merged from the shards' sorted answers. The front
+end can be shared between threads; each shard's pipe has its own lock, and a
+batch locks the shards it needs in a fixed order.
+"""
+import heapq
+import multiprocessing
+import threading
+import zlib
+from itertools import islice
+
+from scalable_hash_table import ScalableHashTable
+from scalable_avl_tree import ScalableAVLTree
+
+
+def shard_of(isbn, num_shards):
+    # Shard owning isbn. crc32 rather than hash(), which is salted differently in every process.
+    return zlib.crc32(isbn.encode()) % num_shards
+
+
+def _serve_shard(conn):
+    # Shard process main loop: apply each (operation, argument) request to this shard's
+    # table and tree and send back the result, until asked to stop
+    table = ScalableHashTable()
+    tree = ScalableAVLTree()
+
+    def untitle(isbn):
+        # Drop isbn's (title, isbn) entry from the tree, if the book is stored
+        old = table.search_by_isbn(isbn)
+        if old != "Book not found":
+            tree.delete((old[0], isbn))
+
+    def add(books):
+        for isbn, title, author in books:
+            untitle(isbn)
+            table.add_book(isbn, (title, author))
+            tree.insert((title, isbn), None)
+        return len(books)
+
+    def titles(args):
+        # The first limit (title, isbn) pairs with lo <= title < hi; (hi,) sorts before every (hi, isbn)
+        lo, hi, limit = args
+        pairs = tree.range(None if lo is None else (lo,), None if hi is None else (hi,))
+        return [key for key, _ in islice(pairs, limit)]
+
+    def remove(isbns):
+        removed = []
+        for isbn in isbns:
+            untitle(isbn)
+            removed.append(table.remove_book(isbn))
+        return removed
+
+    operations = {
+        "add": add,
+        "remove": remove,
+        "get": table.search_many_by_isbn,
+        "title": table.search_by_title,
+        "author": table.search_by_author,
+        "range": titles,
+        "len": lambda _: table.num_entries,
+    }
+    while True:
+        operation, argument = conn.recv()
+        if operation == "stop":
+            conn.close()
+            return
+        try:
+            conn.send((True, operations[operation](argument)))
+        except Exception as error:
+            conn.send((False, error))
+
+
+class ShardedCatalog:
+    def __init__(self, num_shards=None):
+        # Start one worker process per shard (default: one per CPU), each reached over a pipe
+        self.num_shards = num_shards or multiprocessing.cpu_count()
+        self.conns = []
+        self.processes = []
+        self.locks = [threading.Lock() for _ in range(self.num_shards)]
+        for _ in range(self.num_shards):
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_serve_shard, args=(child,), daemon=True)
+            process.start()
+            child.close()
+            self.conns.append(parent)
+            self.processes.append(process)
+
+    def _call(self, requests):
+        """
+        Send {shard: (operation, argument)} to the shards and return {shard: result}.
+        Every request is sent before any answer is read, so the shards run in parallel.
+        """
+        shards = sorted(requests)
+        for shard in shards:
+            self.locks[shard].acquire()
+        try:
+            for shard in shards:
+                self.conns[shard].send(requests[shard])
+            answers = {shard: self.conns[shard].recv() for shard in shards}
+        finally:
+            for shard in shards:
+                self.locks[shard].release()
+        for ok, result in answers.values():
+            if not ok:
+                raise result
+        return {shard: result for shard, (_, result) in answers.items()}
+
+    def _broadcast(self, operation, argument=None):
+        # Send the same request to every shard; return the results in shard order
+        results = self._call({shard: (operation, argument) for shard in range(self.num_shards)})
+        return [results[shard] for shard in range(self.num_shards)]
+
+    def _scatter(self, operation, keys):
+        # Split keys by owning shard, run operation on each part, and return results in key order
+        parts = {}
+        owners = []
+        for key in keys:
+            shard = shard_of(key, self.num_shards)
+            owners.append(shard)
+            parts.setdefault(shard, []).append(key)
+        if not parts:
+            return []
+        results = self._call({shard: (operation, part) for shard, part in parts.items()})
+        iterators = {shard: iter(result) for shard, result in results.items()}
+        return [next(iterators[shard]) for shard in owners]
+
+    def add_book(self, isbn, title, author):
+        # Add or update one book
+        self.add_books([(isbn, title, author)])
+
+    def add_books(self, books):
+        # Add or update a batch of (isbn, title, author) books, one message per shard
+        parts = {}
+        for book in books:
+            parts.setdefault(shard_of(book[0], self.num_shards), []).append(book)
+        if parts:
+            self._call({shard: ("add", part) for shard, part in parts.items()})
+
+    def remove_book(self, isbn):
+        # Remove a book; return True if it was removed, False if it wasn't found
+        return self._scatter("remove", [isbn])[0]
+
+    def search_by_isbn(self, isbn):
+        return self._scatter("get", [isbn])[0]
+
+    def search_many_by_isbn(self, isbns):
+        # Look up a batch of ISBNs, (title, author) or "Book not found" each, in input order
+        return self._scatter("get", isbns)
+
+    def search_by_title(self, title):
+        # Titles aren't partitioned, so ask every shard and return the first ISBN found
+        for isbn in self._broadcast("title", title):
+            if isbn != "Book not found":
+                return isbn
+        return "Book not found"
+
+    def search_by_author(self, author):
+        # Gather the author's ISBNs from every shard
+        return [isbn for isbns in self._broadcast("author", author) for isbn in isbns]
+
+    def range(self, lo=None, hi=None, limit=None):
+        # (title, isbn) pairs with lo <= title < hi in title order, at most limit of them. Each
+        # shard returns its own first limit matches, already sorted, and they are merged.
+        parts = self._broadcast("range", (lo, hi, limit))
+        return list(islice(heapq.merge(*parts), limit))
+
+    def __len__(self):
+        # Total number of books across all shards
+        return sum(self._broadcast("len"))
+
+    def close(self):
+        # Stop the shard processes
+        for shard, conn in enumerate(self.conns):
+            with self.locks[shard]:
+                if not conn.closed:
+                    conn.send(("stop", None))
+                    conn.close()
+        for process in self.processes:
+            process.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
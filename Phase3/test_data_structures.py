@@ -1,24 +1,53 @@
 """
-This code provides a comprehensive set of test cases for three data structures: 
-ScalableAVLTree, ScalableHashTable, and OptimizedCheckedOutBooks. Each test function 
+This code provides a comprehensive set of test cases for the Phase 3 data structures, 
+starting with ScalableAVLTree, ScalableHashTable, and OptimizedCheckedOutBooks. Each test function 
 evaluates the basic functionality of its respective data structure by inserting 
 sample data, performing searches or updates, and using assertions to ensure correctness. 
-The code also includes stress tests that measure the performance of bulk operations, 
-such as inserting a large number of entries. The run_all_tests function orchestrates 
+The code also includes stress tests that check correctness after bulk operations, 
+such as inserting a large number of entries; performance is measured separately by 
+benchmark_suite.py. The run_all_tests function orchestrates 
 the execution of all individual tests, and the script executes this function when run as 
 the main module.
 """
 
+import asyncio
+import csv
+import json
+import multiprocessing
+import os
+import random
+import signal
+import sys
+import tempfile
+import threading
 import time
 from scalable_avl_tree import ScalableAVLTree
 from scalable_hash_table import ScalableHashTable
+from catalog_snapshot import MappedCatalog, save_snapshot
+from compact_hash_table import CompactHashTable
 from optimized_checked_out_books import OptimizedCheckedOutBooks
+from concurrent_catalog import ConcurrentCatalog, ConcurrentCheckedOutBooks
+from sharded_catalog import ShardedCatalog
+from catalog_service import CatalogService
+from instrumentation import LatencyHistogram, instrument, uninstrument
+from checkout_ledger import CheckoutLedger
+from catalog_ingest import ingest
+from isbn import normalize_isbn
+from lookup_cache import MISSING, LookupCache, CachedCatalog, CachedAVLTree
+from title_search import TitleSearchIndex, edit_distance
+from write_ahead_log import DurableCatalog
+from key_encoding import SymbolTable, EncodedCatalog, encode_isbn, decode_isbn
+
+# The Phase 2 proof-of-concept structures live in a sibling directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Phase 2"))
+from binary import BookBST
+from hash import LibraryCatalog
 
 # Comprehensive set of test cases for AVL Tree, Hash Table, and Checked Out Books (Hash Map)
 
 def test_avl_tree():
     """
-    Test the basic functionality and performance of the ScalableAVLTree class.
+    Test the basic functionality and scalability of the ScalableAVLTree class.
     This includes insertion, search, and stress testing with a large dataset.
     """
     print("Testing AVL Tree...")
@@ -41,15 +70,1118 @@ def test_avl_tree():
 
     # Stress test AVL tree with a large number of insertions
     print("Stress testing AVL Tree...")
-    start_time = time.time()
     for i in range(100000):
         avl_tree.insert(f"Book {i}", f"ISBN-{i}")
-    end_time = time.time()
-    print(f"Inserting 100,000 books into AVL Tree took {end_time - start_time:.2f} seconds.")
+    assert len(avl_tree) == 100003, "Every inserted book should be stored"
+    check_avl_invariants(avl_tree.root)
+
+def check_avl_invariants(node, lo=None, hi=None):
+    """
+    Recursively verify ordering, stored heights and sizes, and AVL balance below node.
+    Returns the height of the subtree.
+    """
+    if node is None:
+        return 0
+    assert lo is None or node.key > lo, "AVL ordering violated"
+    assert hi is None or node.key < hi, "AVL ordering violated"
+    left = check_avl_invariants(node.left, lo, node.key)
+    right = check_avl_invariants(node.right, node.key, hi)
+    assert node.height == 1 + max(left, right), "Stored height is stale"
+    assert abs(left - right) <= 1, "AVL balance violated"
+    assert node.size == 1 + (node.left.size if node.left else 0) + (node.right.size if node.right else 0), \
+        "Stored subtree size is stale"
+    return node.height
+
+def test_avl_delete():
+    """
+    Test ScalableAVLTree.delete, checking that the tree stays ordered and balanced
+    through random insertions and deletions, including sorted insertion order.
+    """
+    print("Testing AVL Tree delete...")
+    avl_tree = ScalableAVLTree()
+    avl_tree.insert("Introduction to Algorithms", "978-0262046305")
+    avl_tree.insert("The C Programming Language", "978-0131103627")
+    avl_tree.insert("The Mythical Man-Month", "978-0201616224")
+    assert avl_tree.delete("Introduction to Algorithms") == True, \
+        "Failed to delete 'Introduction to Algorithms'"
+    assert avl_tree.search("Introduction to Algorithms") == None, \
+        "Deleted book should no longer be found"
+    assert avl_tree.delete("Non-Existent Book") == False, \
+        "Deleting a non-existent book should return False"
+    assert avl_tree.search("The Mythical Man-Month").value == "978-0201616224", \
+        "Deleting one book should not affect the others"
+
+    # Sorted insertion followed by random deletions
+    avl_tree = ScalableAVLTree()
+    for i in range(5000):
+        avl_tree.insert(i, f"ISBN-{i}")
+    check_avl_invariants(avl_tree.root)
+    remaining = set(range(5000))
+    order = list(remaining)
+    random.shuffle(order)
+    for i, key in enumerate(order[:4000]):
+        assert avl_tree.delete(key) == True, f"Failed to delete key {key}"
+        remaining.discard(key)
+        if i % 500 == 0:
+            check_avl_invariants(avl_tree.root)
+    check_avl_invariants(avl_tree.root)
+    assert all(avl_tree.search(k).value == f"ISBN-{k}" for k in remaining), \
+        "Remaining keys should still be found after deletions"
+    for key in remaining:
+        avl_tree.delete(key)
+    assert avl_tree.root == None, "Deleting every key should leave an empty tree"
+
+    print("AVL Tree delete tests passed.")
+
+def test_avl_ordered_queries():
+    """
+    Test the lazy ordered queries (items, range, prefix, items_after) and the
+    size-augmented rank/select operations of ScalableAVLTree.
+    """
+    print("Testing AVL Tree ordered queries...")
+    titles = ["Introduction to Algorithms", "Introduction to Automata Theory", "Clean Code",
+              "The C Programming Language", "The Mythical Man-Month", "Design Patterns",
+              "Introductory Statistics", "Algorithms"]
+    avl_tree = ScalableAVLTree()
+    for title in titles:
+        avl_tree.insert(title, title.upper())
+    ordered = sorted(titles)
+
+    assert [k for k, _ in avl_tree.items()] == ordered, "items() should yield keys in order"
+    assert len(avl_tree) == len(titles), "len() should count every key"
+    assert [k for k, _ in avl_tree.prefix("Intro")] == \
+        ["Introduction to Algorithms", "Introduction to Automata Theory", "Introductory Statistics"], \
+        "prefix('Intro') should yield the three matching titles"
+    assert [k for k, _ in avl_tree.range("A", "D")] == ["Algorithms", "Clean Code"], \
+        "range('A', 'D') should include lo and exclude hi"
+    assert [k for k, _ in avl_tree.range("Design Patterns")] == ordered[2:], \
+        "range() with no upper bound should run to the end"
+    assert list(avl_tree.prefix("Zen")) == [], "prefix with no matches should be empty"
+
+    # Cursor pagination: each page starts after the last key of the previous one
+    pages = []
+    cursor = None
+    while True:
+        page = [k for k, _ in avl_tree.items_after(cursor, 3)]
+        if not page:
+            break
+        pages.append(page)
+        cursor = page[-1]
+    assert pages == [ordered[0:3], ordered[3:6], ordered[6:8]], "items_after should paginate in order"
+
+    for i, title in enumerate(ordered):
+        assert avl_tree.rank(title) == i, f"rank('{title}') should be {i}"
+        assert avl_tree.select(i).key == title, f"select({i}) should return '{title}'"
+    assert avl_tree.rank("Zzz") == len(titles), "rank past the end should equal the size"
+    try:
+        avl_tree.select(len(titles))
+        assert False, "select past the end should raise IndexError"
+    except IndexError:
+        pass
+
+    # Sizes must survive rotations, deletions and bulk rebuilds
+    avl_tree = ScalableAVLTree.bulk_load((i, i) for i in range(0, 2000, 2))
+    avl_tree.merge((i, i) for i in range(1, 1000, 2))
+    for i in range(500):
+        avl_tree.delete(i * 3)
+    check_avl_invariants(avl_tree.root)
+    expected = sorted((set(range(0, 2000, 2)) | set(range(1, 1000, 2))) - {i * 3 for i in range(500)})
+    assert [k for k, _ in avl_tree.items()] == expected, "items() should reflect merges and deletes"
+    assert avl_tree.select(100).key == expected[100] and avl_tree.rank(expected[100]) == 100, \
+        "rank/select should stay consistent after merges and deletes"
+
+    print("AVL Tree ordered query tests passed.")
+
+def test_avl_persistent():
+    """
+    Test the persistent (path-copying) mode of ScalableAVLTree: snapshots keep
+    their version through later inserts, deletes and merges, share unchanged
+    subtrees with the live tree, and can be iterated while a writer thread runs.
+    """
+    print("Testing persistent AVL Tree...")
+    rng = random.Random(7)
+    avl_tree = ScalableAVLTree(persistent=True)
+    expected = {}
+    versions = []
+    for step in range(6000):
+        key = rng.randrange(2000)
+        if rng.random() < 0.6:
+            old_root = avl_tree.root
+            new_root = avl_tree.insert(key, str(key))
+            assert new_root is avl_tree.root and (key not in expected) == (new_root is not old_root), \
+                "insert should return the new root, or the old one for a duplicate key"
+            expected.setdefault(key, str(key))
+        else:
+            assert avl_tree.delete(key) == (key in expected), f"Unexpected delete result for {key}"
+            expected.pop(key, None)
+        if step % 300 == 0:
+            versions.append((avl_tree.snapshot(), sorted(expected.items())))
+    avl_tree.merge([(key, "merged") for key in range(1990, 2010)])
+    for key in range(1990, 2010):
+        expected.setdefault(key, "merged")
+
+    for version, items in versions:
+        assert list(version.items()) == items and len(version) == len(items), \
+            "A snapshot should keep the version it was taken at"
+        check_avl_invariants(version.root)
+    assert list(avl_tree.items()) == sorted(expected.items()), "The live tree should hold every update"
+    check_avl_invariants(avl_tree.root)
+
+    version = avl_tree.snapshot()
+    assert version.root is avl_tree.root, "A persistent snapshot should share the root, not copy the tree"
+    avl_tree.insert(5000, "5000")
+    shared = version.root.left is avl_tree.root.left or version.root.right is avl_tree.root.right
+    assert shared and avl_tree.search(5000) and not version.search(5000), \
+        "An insert should copy only its path and share the untouched subtrees"
+    version.insert(6000, "6000")
+    assert version.search(6000) and not avl_tree.search(6000), "Updating a snapshot should not affect the tree"
+
+    plain = ScalableAVLTree()
+    for key in range(100):
+        plain.insert(key, key)
+    copy = plain.snapshot()
+    plain.delete(50)
+    assert len(copy) == 100 and copy.search(50).value == 50, "Snapshots of a plain tree should be full copies"
+
+    # A reader walks one version with no lock while a writer keeps inserting and deleting
+    errors = []
+    done = threading.Event()
+
+    def writer():
+        for i in range(20000):
+            avl_tree.insert(10000 + i, "new")
+            avl_tree.delete(10000 + i - 50)
+        done.set()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    while not done.is_set():
+        version = avl_tree.snapshot()
+        size = len(version)
+        keys = [key for key, _ in version.items()]
+        if len(keys) != size or keys != sorted(keys):
+            errors.append(size)
+    thread.join()
+    assert errors == [], "Iterating a snapshot during writes should see one consistent version"
+
+    print("Persistent AVL Tree tests passed.")
+
+def test_search_many():
+    """
+    Test the batch lookup APIs against their single-key counterparts, including
+    duplicates and misses within a batch.
+    """
+    print("Testing batch lookups...")
+    avl_tree = ScalableAVLTree()
+    table = ScalableHashTable()
+    catalog = LibraryCatalog()
+    for i in range(0, 5000, 2):
+        avl_tree.insert(f"Book {i}", f"ISBN-{i}")
+        table.add_book(f"ISBN-{i}", (f"Book {i}", f"Author {i % 7}"))
+        catalog.add_book(f"ISBN-{i}", f"Book {i}", f"Author {i % 7}")
+
+    queries = [random.randrange(5000) for _ in range(2000)] + [4, 4, 5]
+    titles = [f"Book {i}" for i in queries]
+    isbns = [f"ISBN-{i}" for i in queries]
+    assert avl_tree.search_many(titles) == [avl_tree.search(t) for t in titles], \
+        "AVL search_many should match search for every key"
+    assert avl_tree.search_many([]) == [], "An empty batch should return an empty list"
+    assert table.search_many_by_isbn(isbns) == [table.search_by_isbn(k) for k in isbns], \
+        "Hash table search_many_by_isbn should match search_by_isbn for every key"
+    assert catalog.search_many_by_isbn(isbns) == [catalog.search_by_isbn(k) for k in isbns], \
+        "Catalog search_many_by_isbn should match search_by_isbn for every key"
+    assert catalog.search_many_by_title(titles) == [catalog.search_by_title(t) for t in titles], \
+        "Catalog search_many_by_title should match search_by_title for every key"
+
+    print("Batch lookup tests passed.")
+
+def test_snapshots():
+    """
+    Test saving the hash table and AVL tree to snapshot files and looking books
+    up through the memory-mapped MappedCatalog.
+    """
+    print("Testing catalog snapshots...")
+    table = ScalableHashTable()
+    avl_tree = ScalableAVLTree()
+    for i in range(2000):
+        table.add_book(f"978-{i}", (f"Book {i}", f"Author {i % 13}"))
+        avl_tree.insert(f"Book {i}", f"978-{i}")
+    table.add_book("978-café", ("Café Society", "Zoë Ünicode"))
+
+    with tempfile.TemporaryDirectory() as directory:
+        table_path = os.path.join(directory, "table.snap")
+        tree_path = os.path.join(directory, "tree.snap")
+        table.save(table_path)
+        avl_tree.save(tree_path)
+
+        with ScalableHashTable.load(table_path) as mapped:
+            assert len(mapped) == table.num_entries, "Snapshot should hold every entry"
+            for i in range(0, 2000, 37):
+                assert mapped.search_by_isbn(f"978-{i}") == table.search_by_isbn(f"978-{i}"), \
+                    f"Mapped lookup for 978-{i} should match the hash table"
+            assert mapped.search_by_isbn("978-café") == ("Café Society", "Zoë Ünicode"), \
+                "Non-ASCII keys and values should round-trip"
+            assert mapped.search_by_isbn("Non-Existent ISBN") == "Book not found", \
+                "Should return 'Book not found' for non-existent ISBN"
+
+        with ScalableAVLTree.load(tree_path) as mapped:
+            assert list(mapped.items()) == list(avl_tree.items()), \
+                "Tree snapshot should preserve every pair in key order"
+            assert mapped.search("Book 1999") == "978-1999", "Failed to find 'Book 1999' in snapshot"
+            assert mapped.search("Book 2000") == None and "Book 2000" not in mapped, \
+                "Missing keys should not be found in snapshot"
+
+        # Tuple fields may be empty or contain any character, and saving replaces the file atomically
+        tricky = {"a": (), "b": ("",), "c": ("", ""), "d": ("x\x1fy", "z"), "e": ("\x1f",), "f": "plain"}
+        save_snapshot(table_path, tricky.items())
+        assert sorted(os.listdir(directory)) == ["table.snap", "tree.snap"], "Saving should leave no temporary file"
+        with MappedCatalog(table_path) as mapped:
+            assert dict(mapped.items()) == tricky, "Every tuple value should round-trip exactly"
+
+    print("Catalog snapshot tests passed.")
+
+def test_concurrent_structures():
+    """
+    Test ConcurrentCatalog and ConcurrentCheckedOutBooks with writer threads running
+    alongside lock-free readers that look books up while stripes resize.
+    """
+    print("Testing concurrent catalog...")
+    catalog = ConcurrentCatalog(num_stripes=4)
+    checked_out_books = ConcurrentCheckedOutBooks(num_stripes=4)
+    errors = []
+    done = threading.Event()
+
+    def writer(offset):
+        for i in range(offset, 20000, 4):
+            catalog.add_book(f"978-{i}", (f"Book {i}", f"Author {i % 10}"))
+            checked_out_books.check_out(f"Book {i}")
+
+    def reader():
+        # A lookup may run before the book is added, but must never return wrong data
+        try:
+            while not done.is_set():
+                for i in range(0, 20000, 97):
+                    result = catalog.search_by_isbn(f"978-{i}")
+                    if result != "Book not found" and result != (f"Book {i}", f"Author {i % 10}"):
+                        errors.append(f"Wrong data for 978-{i}: {result}")
+        except Exception as exc:  # A reader racing a resize must never crash
+            errors.append(repr(exc))
+
+    readers = [threading.Thread(target=reader) for _ in range(2)]
+    writers = [threading.Thread(target=writer, args=(offset,)) for offset in range(4)]
+    for thread in readers + writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    done.set()
+    for thread in readers:
+        thread.join()
+
+    assert errors == [], f"Concurrent readers saw errors: {errors[:3]}"
+    assert len(catalog) == 20000, "Every concurrently added book should be stored"
+    assert len(checked_out_books) == 20000, "Every concurrent check-out should be recorded"
+    assert all(catalog.search_by_isbn(f"978-{i}") == (f"Book {i}", f"Author {i % 10}") for i in range(20000)), \
+        "Every book should be found after the writers finish"
+    assert catalog.search_by_title("Book 123") == "978-123", "Failed to find ISBN for 'Book 123'"
+    assert sorted(catalog.search_by_author("Author 3")) == sorted(f"978-{i}" for i in range(3, 20000, 10)), \
+        "search_by_author should gather ISBNs from every stripe"
+    assert catalog.remove_book("978-123") == True and catalog.search_by_isbn("978-123") == "Book not found", \
+        "Failed to remove ISBN 978-123"
+    assert checked_out_books.check_out("Book 5") == False, "A checked-out book can't be checked out twice"
+    assert checked_out_books.return_book("Book 5") == True, "Failed to return 'Book 5'"
+    assert checked_out_books.is_checked_out("Book 5") == False, "Returned book should not be checked out"
+    assert checked_out_books.return_book("Book 5") == False, "Returning a book twice should return False"
+
+    print("Concurrent catalog tests passed.")
+
+def test_sharded_catalog():
+    """
+    Test ShardedCatalog against a plain dictionary: scatter-gather batch lookups,
+    cross-shard title and author queries, merged title ranges, updates, removals,
+    and batches issued from several threads at once.
+    """
+    print("Testing sharded catalog...")
+    expected = {f"978-{i}": (f"Title {i:05d}", f"Author {i % 7}") for i in range(3000)}
+    with ShardedCatalog(num_shards=3) as catalog:
+        catalog.add_books([(isbn, title, author) for isbn, (title, author) in expected.items()])
+        assert len(catalog) == 3000, "Every book should be stored in some shard"
+        isbns = [f"978-{i}" for i in range(0, 3200, 7)]
+        assert catalog.search_many_by_isbn(isbns) == [expected.get(isbn, "Book not found") for isbn in isbns], \
+            "Batch lookups should come back in input order"
+        assert catalog.search_by_isbn("978-42") == ("Title 00042", "Author 0"), "Failed to find ISBN 978-42"
+        assert catalog.search_by_title("Title 02999") == "978-2999", "Title lookups should search every shard"
+        assert sorted(catalog.search_by_author("Author 3")) == sorted(
+            isbn for isbn, (_, author) in expected.items() if author == "Author 3"), \
+            "Author lookups should gather every shard's ISBNs"
+        assert catalog.range("Title 00100", "Title 00110") == [(f"Title {i:05d}", f"978-{i}") for i in range(100, 110)], \
+            "Ranges should merge every shard's titles in order"
+        assert catalog.range(limit=5) == [(f"Title {i:05d}", f"978-{i}") for i in range(5)], \
+            "A limited range should return the smallest titles"
+
+        catalog.add_book("978-7", "Renamed", "Author 0")
+        assert catalog.search_by_title("Title 00007") == "Book not found" and \
+            catalog.search_by_title("Renamed") == "978-7", "Updating a title should move it in the shard's tree"
+        assert catalog.remove_book("978-8") == True and catalog.remove_book("978-8") == False, \
+            "remove_book should report whether the book existed"
+        assert catalog.range("Title 00008", "Title 00009") == [] and len(catalog) == 2999, \
+            "A removed book should be gone from the table and the tree"
+        # Books sharing a title keep their own entries; removing one leaves the others
+        catalog.add_books([("978-a", "Shared", "Author 1"), ("978-b", "Shared", "Author 2"), ("978-c", "Shared", "")])
+        catalog.remove_book("978-b")
+        assert catalog.range("Shared", "Shared\0") == [("Shared", "978-a"), ("Shared", "978-c")], \
+            "Removing one book with a shared title should keep the others in the tree"
+        try:
+            catalog.range(1, "Title")
+            assert False, "Errors raised inside a shard should reach the caller"
+        except TypeError:
+            pass
+
+        errors = []
+
+        def client(seed):
+            rng = random.Random(seed)
+            for _ in range(50):
+                batch = [f"978-{rng.randrange(10, 3000)}" for _ in range(40)]
+                if catalog.search_many_by_isbn(batch) != [expected[isbn] for isbn in batch]:
+                    errors.append(seed)
+
+        clients = [threading.Thread(target=client, args=(seed,)) for seed in range(4)]
+        for thread in clients:
+            thread.start()
+        for thread in clients:
+            thread.join()
+        assert errors == [], "Batches from concurrent threads should never mix up answers"
+
+    print("Sharded catalog tests passed.")
+
+def test_catalog_service():
+    """
+    Test the asyncio catalog service over TCP: lookups (micro-batched when they
+    arrive together), writes applied through the mutator task, error responses,
+    and the latency histograms returned by "stats".
+    """
+    print("Testing catalog service...")
+    histogram = LatencyHistogram()
+    for micros in (1, 3, 3, 5, 900):
+        histogram.record(micros / 1e6)
+    assert histogram.percentile(0.5) == 4.0 and histogram.percentile(1.0) == 1024.0, \
+        "Percentiles should report the upper bound of the matching bucket"
+
+    async def scenario():
+        service = CatalogService()
+        for i in range(1000):
+            service.catalog.add_book(f"978-{i}", (f"Book {i}", f"Author {i % 10}"))
+        host, port = await service.start()
+        reader, writer = await asyncio.open_connection(host, port)
+
+        async def call(**request):
+            writer.write(json.dumps(request).encode() + b"\n")
+            return json.loads(await reader.readline())
+
+        assert await call(id=1, op="search_by_isbn", isbn="978-7") == {"id": 1, "result": ["Book 7", "Author 7"]}, \
+            "A lookup should return the book's title and author"
+        assert (await call(op="search_by_isbn", isbn="978-5000"))["result"] == "Book not found", \
+            "A missing ISBN should report 'Book not found'"
+        assert (await call(op="add_book", isbn="978-5000", book=["New Book", "New Author"]))["result"] is None, \
+            "add_book should be acknowledged"
+        assert (await call(op="search_by_isbn", isbn="978-5000"))["result"] == ["New Book", "New Author"], \
+            "A lookup sent after a write is acknowledged should see the write"
+        assert (await call(op="search_by_title", title="New Book"))["result"] == "978-5000", \
+            "Title lookups should see added books"
+        await call(op="check_out", title="Book 3")
+        assert service.checked_out_books.checked_out_books == {"Book 3": True}, "check_out should reach the map"
+        assert (await call(op="return_book", title="Book 3"))["result"] is True, "Failed to return 'Book 3'"
+        assert (await call(op="return_book", title="Book 3"))["result"] is False, \
+            "Returning a book twice should return False"
+        assert "error" in await call(id=9, op="drop_tables") and "error" in await call(op="search_by_isbn"), \
+            "Unknown operations and missing fields should produce errors"
+        count = service.catalog.num_entries
+        for request in ({"op": "add_book", "isbn": "x", "book": ["only-title"]},
+                        {"op": "add_book", "isbn": "x", "book": "ab"},
+                        {"op": "add_book", "isbn": 5, "book": ["Title", "Author"]},
+                        {"op": "check_out", "title": ["Book 4"]}):
+            response = await call(id=10, **request)
+            assert response["id"] == 10 and "error" in response, f"Malformed write {request} should be rejected"
+        assert service.catalog.num_entries == count and service.catalog.search_by_isbn("x") == "Book not found" \
+            and not service.checked_out_books.checked_out_books, "Rejected writes should not reach the structures"
+        for op in ([], {"a": 1}, "no_such_op_1", "no_such_op_2"):
+            assert "error" in await call(id=11, op=op), f"op {op!r} should produce an error response"
+        assert "no_such_op_1" not in service.histograms and service.histograms["invalid"].count >= 5, \
+            "Unknown and malformed ops should share one 'invalid' histogram"
+        writer.write(b"not json\n")
+        assert "error" in json.loads(await reader.readline()), "Malformed lines should produce errors"
+
+        # A malformed lookup must not fail the valid lookups batched with it
+        good, bad = await asyncio.gather(service.handle({"op": "search_by_isbn", "isbn": "978-7"}),
+                                         service.handle({"op": "search_by_isbn", "isbn": ["x"]}),
+                                         return_exceptions=True)
+        assert good == ("Book 7", "Author 7") and isinstance(bad, ValueError), \
+            "A non-string ISBN should be rejected before it is queued"
+        good, bad = await asyncio.gather(service.search_by_isbn("978-8"), service.search_by_isbn(["x"]),
+                                         return_exceptions=True)
+        assert good == ("Book 8", "Author 8") and isinstance(bad, TypeError), \
+            "A failing batch should be retried key by key so only the bad lookup fails"
+
+        # 200 pipelined lookups on one connection arrive together and should share batches
+        for i in range(200):
+            writer.write(json.dumps({"id": i, "op": "search_by_isbn", "isbn": f"978-{i}"}).encode() + b"\n")
+        responses = [json.loads(await reader.readline()) for _ in range(200)]
+        assert sorted((r["id"], tuple(r["result"])) for r in responses) == \
+            [(i, (f"Book {i}", f"Author {i % 10}")) for i in range(200)], "Every pipelined lookup should be answered"
+        stats = (await call(op="stats"))["result"]
+        assert stats["batches"] < stats["latency"]["search_by_isbn"]["count"], "Concurrent lookups should be batched"
+        assert stats["latency"]["search_by_isbn"]["count"] == 204, "Every lookup over the socket should be recorded"
+        writer.close()
+        await service.stop()
+
+    asyncio.run(scenario())
+    print("Catalog service tests passed.")
+
+def test_instrumentation():
+    """
+    Test opt-in instrumentation: chain lengths, resizes and per-method timings
+    for ScalableHashTable, rotations and height for ScalableAVLTree, the metrics
+    sink, and that uninstrumenting restores the plain class methods.
+    """
+    print("Testing instrumentation...")
+    events = []
+    table = ScalableHashTable()
+    probe = instrument(table, sink=lambda name, value: events.append((name, value)))
+    assert instrument(table) is probe, "Instrumenting twice should return the same Instrumentation"
+    for i in range(1000):
+        table.add_book(f"978-{i}", (f"Book {i}", f"Author {i % 10}"))
+    table.add_book("978-5", ("Book 5", "Author 5"))
+    table.search_by_isbn("978-5")
+    table.search_many_by_isbn(["978-1", "978-2", "missing"])
+    table.remove_book("978-6")
+
+    stats = probe.stats()
+    assert stats["calls"]["add_book"]["count"] == 1001 and stats["calls"]["search_by_isbn"]["count"] == 1, \
+        "Every public call should be timed"
+    # 1001 adds and one removal go through _hash; four keys are looked up directly
+    assert stats["distributions"]["chain_length"]["count"] == 1001 + 1 + 4, "Every probed bucket should be recorded"
+    assert table.search_many_by_isbn(isbn for isbn in ("978-1", "missing")) == [("Book 1", "Author 1"), "Book not found"], \
+        "An instrumented batch lookup should accept a generator of keys"
+    assert stats["counters"]["resizes"] == 4 and stats["resize_time"]["count"] == 4, \
+        "Growing from 100 to 1600 buckets takes four resizes"
+    assert [name for name, _ in events] == ["resize_seconds"] * 4, "Each resize should reach the sink as it happens"
+    assert stats["gauges"]["table_size"] == 1600 and stats["gauges"]["load_factor"] == 999 / 1600, \
+        "Gauges should describe the table's current shape"
+
+    exported = {}
+    probe.export(lambda name, value: exported.__setitem__(name, value))
+    assert exported["ScalableHashTable.calls.add_book.count"] == 1001 and \
+        exported["ScalableHashTable.counters.resizes"] == 4, "export should flatten the snapshot into names"
+
+    uninstrument(table)
+    assert "add_book" not in vars(table) and "_hash" not in vars(table), "uninstrument should remove every wrapper"
+    table.add_book("978-2000", ("Book 2000", "Author 0"))
+    assert probe.stats()["calls"]["add_book"]["count"] == 1001, "An uninstrumented table should record nothing"
+    assert "add_book" not in vars(ScalableHashTable()), "Other instances should never be wrapped"
+
+    tree = ScalableAVLTree()
+    probe = instrument(tree)
+    for i in range(1023):
+        tree.insert(i, str(i))  # Ascending keys force a rotation on most inserts
+    tree.delete(0)
+    stats = probe.stats()
+    per_insert = stats["distributions"]["rotations_per_insert"]
+    assert per_insert["count"] == 1023 and per_insert["max"] <= 2, "An insert rotates at most twice"
+    assert stats["counters"]["rotations"] >= 1000 - 10, "Ascending inserts should rotate almost every time"
+    assert stats["gauges"]["height"] == 10 and stats["gauges"]["size"] == 1022, \
+        "Gauges should report the tree's height and size"
+    assert stats["distributions"]["rotations_per_delete"]["count"] == 1, "Deletes should be recorded too"
+    assert tree.search(512).value == "512" and probe.stats()["calls"]["search"]["count"] == 1, \
+        "Instrumented methods should still return the right results"
+    check_avl_invariants(tree.root)
+
+    print("Instrumentation tests passed.")
+
+def _durable_operations(thread, count):
+    # The operation sequence written by one thread of the crash test: adds, some removals of the
+    # previous book, and some check-outs and returns
+    operations = []
+    for i in range(count):
+        operations.append(("add_book", f"{thread}-{i}", (f"Book {thread}-{i}", f"Author {i % 7}")))
+        if i % 4 == 3:
+            operations.append(("remove_book", f"{thread}-{i - 1}"))
+        if i % 5 == 0:
+            operations.append(("check_out", f"Book {thread}-{i}"))
+        if i % 10 == 5:
+            operations.append(("return_book", f"Book {thread}-{i - 5}"))
+    return operations
+
+def _write_until_killed(directory, acknowledged):
+    # Crash test child: several threads write to a DurableCatalog with frequent background
+    # checkpoints, counting each write in shared memory once it has been acknowledged
+    catalog = DurableCatalog(directory, checkpoint_interval=0.05, checkpoint_records=150)
+
+    def writer(thread):
+        for operation, *args in _durable_operations(thread, 100000):
+            getattr(catalog, operation)(*args)
+            acknowledged[thread] += 1
+
+    threads = [threading.Thread(target=writer, args=(thread,)) for thread in range(len(acknowledged))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+def test_write_ahead_log():
+    """
+    Test DurableCatalog: recovery from checkpoints and the log, incremental
+    checkpoints, a torn record at the end of the log, and a writer process killed
+    mid-write, after which every acknowledged write must survive and each
+    thread's writes must be recovered as an unbroken prefix.
+    """
+    print("Testing write-ahead log...")
+    with tempfile.TemporaryDirectory() as directory:
+        with DurableCatalog(directory, checkpoint_interval=None) as catalog:
+            for i in range(100):
+                catalog.add_book(f"978-{i}", (f"Book {i}", f"Author {i % 3}"))
+            catalog.check_out("Book 1")
+            catalog.checkpoint()
+            assert catalog.remove_book("978-2") == True and catalog.remove_book("978-2") == False, \
+                "remove_book should report whether the book existed"
+            catalog.add_book("978-3", ("Renamed", "Author 0"))
+            catalog.checkpoint()
+            catalog.check_out("Book 4")
+            assert catalog.return_book("Book 1") == True, "Failed to return 'Book 1'"
+            files = sorted(os.listdir(directory))
+            assert [name[:5] for name in files] == ["base-", "delta", "wal-0"], \
+                f"A small change should be checkpointed as a delta, and covered segments deleted: {files}"
+
+        with DurableCatalog(directory, checkpoint_interval=None) as catalog:
+            assert catalog.replayed == 2, "Only the records after the last checkpoint should be replayed"
+            assert catalog.catalog.num_entries == 99 and catalog.search_by_isbn("978-2") == "Book not found", \
+                "Removals should survive a restart"
+            assert catalog.search_by_title("Renamed") == "978-3" and "978-1" in catalog.search_by_author("Author 1"), \
+                "Updates and secondary indexes should be rebuilt"
+            assert catalog.is_checked_out("Book 4") and not catalog.is_checked_out("Book 1"), \
+                "Check-outs and returns should survive a restart"
+
+        # Tear the last record in half, as a crash in the middle of a write would
+        segment = max(os.path.join(directory, name) for name in os.listdir(directory)
+                      if name.startswith("wal-") and os.path.getsize(os.path.join(directory, name)))
+        with open(segment, "r+b") as f:
+            f.truncate(os.path.getsize(segment) - 5)
+        with DurableCatalog(directory, checkpoint_interval=None) as catalog:
+            assert catalog.replayed == 1 and catalog.is_checked_out("Book 1"), "A torn record should be ignored"
+            catalog.add_book("978-500", ("Book 500", "Author 0"))
+        with DurableCatalog(directory, checkpoint_interval=None) as catalog:
+            assert catalog.search_by_isbn("978-500") == ("Book 500", "Author 0"), \
+                "Records written after a torn one was cut off should be recovered"
+
+    with tempfile.TemporaryDirectory() as directory:
+        with DurableCatalog(directory, checkpoint_interval=None) as catalog:
+            for bad in (lambda: catalog.add_book("978-1", (["Bad"], "Author")),
+                        lambda: catalog.add_book(978, ("Book", "Author")),
+                        lambda: catalog.check_out(None)):
+                try:
+                    bad()
+                    assert False, "Arguments that can't be applied should be rejected"
+                except TypeError:
+                    pass
+            for i in range(20):
+                catalog.add_book(f"978-{i}", (f"Book {i}", "Author"))
+            catalog.checkpoint()
+            catalog.add_book("978-100", ("Book 100", "Author"))
+            catalog.check_out("Book 100")
+
+            # A checkpoint that fails to reach the disk must keep its changes for the next one
+            replace = os.replace
+
+            def failing_replace(source, target):
+                raise OSError("No space left on device")
+
+            os.replace = failing_replace
+            try:
+                catalog.checkpoint()
+                assert False, "A failed checkpoint should raise"
+            except OSError:
+                pass
+            finally:
+                os.replace = replace
+            assert not any(name.endswith(".tmp") for name in os.listdir(directory)), \
+                "A failed checkpoint should not leave its temporary file"
+            catalog.add_book("978-101", ("Book 101", "Author"))
+            catalog.checkpoint()
+        with DurableCatalog(directory, checkpoint_interval=None) as catalog:
+            assert catalog.replayed == 0 and catalog.search_by_isbn("978-100") == ("Book 100", "Author") and \
+                catalog.is_checked_out("Book 100") and catalog.search_by_isbn("978-101") != "Book not found", \
+                "Changes from a failed checkpoint should be written by the next one"
+
+        # A failed fsync must fail its writers and every later one, without applying their changes
+        fsync = os.fsync
+
+        def failing_fsync(fd):
+            raise OSError("No space left on device")
+
+        for group_commit in (True, False):
+            with DurableCatalog(directory, group_commit=group_commit, checkpoint_interval=None) as catalog:
+                os.fsync = failing_fsync
+                try:
+                    catalog.add_book("978-200", ("Book 200", "Author"))
+                    assert False, "A write whose fsync failed should raise"
+                except OSError:
+                    pass
+                finally:
+                    os.fsync = fsync
+                assert catalog.search_by_isbn("978-200") == "Book not found", \
+                    "A write that never committed should not be visible"
+                try:
+                    catalog.check_out("Book 0")
+                    assert False, "A failed log should reject later writes"
+                except OSError:
+                    pass
+                assert not catalog.is_checked_out("Book 0"), "A rejected write should not be applied"
+            with DurableCatalog(directory, checkpoint_interval=None) as catalog:
+                catalog.remove_book("978-200")  # The failed write may or may not have reached the disk
+                assert catalog.search_by_isbn("978-100") == ("Book 100", "Author"), \
+                    "Reopening after a failed write should recover the committed state"
+
+        checkpoint = os.path.join(directory, max(name for name in os.listdir(directory) if name.endswith(".ckpt")))
+        with open(checkpoint, "r+b") as f:
+            f.seek(20)
+            f.write(b"#")
+        try:
+            DurableCatalog(directory, checkpoint_interval=None)
+            assert False, "A corrupt checkpoint should be reported"
+        except ValueError:
+            pass
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Titles and authors shared by many books must keep their ISBN order through checkpoints
+        with DurableCatalog(directory, checkpoint_interval=None) as catalog:
+            for i in range(200, 0, -1):
+                catalog.add_book(f"shared-{i}", ("Shared", f"Shared {i % 2}"))
+            catalog.add_book("shared-150", ("Shared", "Shared 0"))
+            catalog.checkpoint()
+            catalog.add_book("shared-199", ("Shared", "Shared 1"))
+            catalog.checkpoint()
+            catalog.add_book("shared-200", ("Shared", "Shared 0"))
+            expected = (catalog.search_by_title("Shared"), catalog.catalog.isbns_by_title["Shared"],
+                        catalog.search_by_author("Shared 0"), catalog.search_by_author("Shared 1"))
+        with DurableCatalog(directory, checkpoint_interval=None) as catalog:
+            assert (catalog.search_by_title("Shared"), catalog.catalog.isbns_by_title["Shared"],
+                    catalog.search_by_author("Shared 0"), catalog.search_by_author("Shared 1")) == expected, \
+                "Recovery should keep the order ISBNs were added in for each title and author"
+
+    with tempfile.TemporaryDirectory() as directory:
+        acknowledged = multiprocessing.Array("i", 4, lock=False)
+        child = multiprocessing.Process(target=_write_until_killed, args=(directory, acknowledged))
+        child.start()
+        while sum(acknowledged) < 2000 and child.is_alive():
+            time.sleep(0.01)
+        os.kill(child.pid, signal.SIGKILL)
+        child.join()
+        assert sum(acknowledged) >= 2000, "The writer process should not have failed"
+
+        catalog = DurableCatalog(directory, checkpoint_interval=None)
+        assert any(name.startswith("base-") for name in os.listdir(directory)), \
+            "Background checkpoints should have run before the crash"
+        books = {key: value for bucket in catalog.catalog.table for key, value in bucket}
+        loans = set(catalog.checked_out_books.checked_out_books)
+        for thread, count in enumerate(acknowledged):
+            # Replay the thread's operations until the model matches what was recovered
+            prefix = f"{thread}-"
+            recovered = ({isbn: book for isbn, book in books.items() if isbn.startswith(prefix)},
+                         {title for title in loans if title.startswith(f"Book {prefix}")})
+            model_books, model_loans = {}, set()
+            matched = None
+            for applied, (operation, key, *rest) in enumerate(_durable_operations(thread, 100000)):
+                if applied >= count and (model_books, model_loans) == recovered:
+                    matched = applied
+                    break
+                if operation == "add_book":
+                    model_books[key] = rest[0]
+                elif operation == "remove_book":
+                    model_books.pop(key, None)
+                elif operation == "check_out":
+                    model_loans.add(key)
+                else:
+                    model_loans.discard(key)
+            assert matched is not None, \
+                f"Thread {thread}: recovered state should be a prefix of its writes covering all {count} acknowledged"
+        catalog.close()
+
+    print("Write-ahead log tests passed.")
+
+def test_lookup_cache():
+    """
+    Test LookupCache LRU and TTL eviction and counters, and the CachedCatalog and
+    CachedAVLTree front ends, including negative caching and invalidation on writes.
+    """
+    print("Testing lookup cache...")
+    now = [0.0]
+    cache = LookupCache(maxsize=2, ttl=10, clock=lambda: now[0])
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1, "Failed to read cached 'a'"
+    cache.put("c", 3)  # Evicts 'b', the least recently used
+    assert cache.get("b") is MISSING, "'b' should have been evicted"
+    now[0] = 10.0
+    assert cache.get("a") is MISSING, "'a' should have expired"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["expirations"]) == (1, 2, 1, 1), \
+        f"Unexpected cache counters: {stats}"
+
+    for catalog, add in ((LibraryCatalog(), lambda c, i, t, a: c.add_book(i, t, a)),
+                         (ScalableHashTable(), lambda c, i, t, a: c.add_book(i, (t, a)))):
+        cached = CachedCatalog(catalog)
+        add(cached, "978-0262046305", "Introduction to Algorithms", "Thomas H. Cormen")
+        assert cached.search_by_title("Introduction to Algorithms") == \
+            catalog.search_by_title("Introduction to Algorithms"), "Cached title search should match"
+        cached.search_by_title("Introduction to Algorithms")
+        assert cached.cache.hits == 1, "Repeated title search should be a cache hit"
+        assert cached.search_by_isbn("978-0131103627") == "Book not found", "Missing ISBN should not be found"
+        cached.search_by_isbn("978-0131103627")
+        assert cached.cache.hits == 2, "'Book not found' should be cached"
+        assert cached.search_by_author("Brian W. Kernighan") == [], "Unknown author should have no books"
+        add(cached, "978-0131103627", "The C Programming Language", "Brian W. Kernighan")
+        assert cached.search_by_isbn("978-0131103627") != "Book not found", \
+            "Adding a book should invalidate its negative cache entry"
+        assert cached.search_by_author("Brian W. Kernighan") == ["978-0131103627"], \
+            "Adding a book should invalidate its author's cached results"
+        cached.search_by_author("Brian W. Kernighan").append("978-junk")
+        add(catalog, "978-0131101630", "The AWK Programming Language", "Brian W. Kernighan")
+        assert cached.search_by_author("Brian W. Kernighan") == ["978-0131103627"], \
+            "A cached author result should not change with the caller's or the catalog's lists"
+        # Retitling a book must invalidate the old title too
+        add(cached, "978-0262046305", "Introduction to Algorithms, 4th Ed.", "Thomas H. Cormen")
+        assert cached.search_by_isbn("978-0262046305")[0] == "Introduction to Algorithms, 4th Ed.", \
+            "Updating a book should invalidate its cached ISBN lookup"
+
+    cached = CachedCatalog(ScalableHashTable())
+    cached.add_book("978-0201616224", ("The Mythical Man-Month", "Frederick P. Brooks"))
+    assert cached.search_by_title("The Mythical Man-Month") == "978-0201616224", "Failed to find title"
+    assert cached.remove_book("978-0201616224") == True, "Failed to remove ISBN 978-0201616224"
+    assert cached.search_by_title("The Mythical Man-Month") == "Book not found", \
+        "Removing a book should invalidate its cached title"
+
+    cached_tree = CachedAVLTree(ScalableAVLTree(), LookupCache(maxsize=100))
+    for i in range(50):
+        cached_tree.insert(i, f"ISBN-{i}")
+    assert cached_tree.search(60) == None, "Missing key should not be found"
+    cached_tree.insert(60, "ISBN-60")
+    assert cached_tree.search(60).value == "ISBN-60", "Insert should invalidate the negative entry"
+    for i in range(50):
+        cached_tree.search(i)
+    for i in range(0, 50, 3):
+        cached_tree.delete(i)
+    assert all((cached_tree.search(i) is None) == (i % 3 == 0) for i in range(50)), \
+        "Deletes should never leave stale cached nodes"
+    assert all(cached_tree.search(i).key == i for i in range(50) if i % 3), \
+        "Cached nodes should hold the key they were looked up by"
+
+    print("Lookup cache tests passed.")
+
+def test_catalog_ingest():
+    """
+    Test ISBN normalization and the streaming CSV/JSONL ingestion pipeline, both
+    serial and with a worker pool, feeding all three catalog structures.
+    """
+    print("Testing catalog ingestion...")
+    assert normalize_isbn("978-0262046305") == "9780262046305", "Hyphenated ISBN-13 should normalize"
+    assert normalize_isbn("0-201-61622-X") == "9780201616224", "ISBN-10 should convert to ISBN-13"
+    assert normalize_isbn("0131103628") == "9780131103627", "ISBN-10 should convert to ISBN-13"
+    for bad in ("978-0262046306", "0-201-61622-1", "12345", "97802620463XX"):
+        try:
+            normalize_isbn(bad)
+            assert False, f"{bad} should be rejected"
+        except ValueError:
+            pass
+
+    rows = [("978-0262046305", "Introduction to Algorithms", "Thomas H. Cormen"),
+            ("0-13-110362-8", "The C Programming Language", "Brian W. Kernighan"),
+            ("0201616221", "Bad Checksum", "Nobody"),
+            ("978-0201616224", "", "Untitled"),
+            ("020161622X", "The Mythical Man-Month", "Frederick P. Brooks")]
+    for i in range(2500):
+        # Generated ISBN-13s with valid check digits; titles exercise CSV quoting
+        first12 = f"979{i:09d}"
+        check = (10 - sum(int(d) * (3 if k % 2 else 1) for k, d in enumerate(first12)) % 10) % 10
+        rows.append((f"{first12}{check}", f"Book {i}, Vol. \"{i % 3}\"", f"Author {i % 5}"))
+
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = os.path.join(directory, "export.csv")
+        tsv_path = os.path.join(directory, "export.tsv")
+        jsonl_path = os.path.join(directory, "export.jsonl")
+        json_path = os.path.join(directory, "export.json")
+        for path, delimiter in ((csv_path, ","), (tsv_path, "\t")):
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f, delimiter=delimiter)
+                writer.writerow(["isbn", "title", "author"])
+                writer.writerows(rows)
+        with open(jsonl_path, "w", encoding="utf-8") as f:
+            for isbn, title, author in rows:
+                f.write(json.dumps({"isbn": isbn, "title": title, "author": author}) + "\n")
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump([{"isbn": isbn, "title": title, "author": author} for isbn, title, author in rows], f)
+
+        for path, workers in ((csv_path, 0), (csv_path, 2), (tsv_path, 0), (tsv_path, 2), (jsonl_path, 0),
+                              (jsonl_path, 2), (json_path, 0), (json_path, 2)):
+            catalog, table, avl_tree = LibraryCatalog(), ScalableHashTable(), ScalableAVLTree()
+            stats = ingest(path, catalog, table, avl_tree, batch_size=300, workers=workers)
+            assert (stats.rows, stats.accepted, stats.rejected) == (len(rows), len(rows) - 2, 2), \
+                f"Unexpected ingest counts for {path} with {workers} workers: {stats}"
+            assert catalog.search_by_isbn("9780201616224") == ("The Mythical Man-Month", "Frederick P. Brooks"), \
+                "ISBN-10 rows should be stored under their ISBN-13"
+            assert table.search_by_title('Book 7, Vol. "1"') == catalog.books_by_title['Book 7, Vol. "1"'], \
+                "Hash table and catalog should agree after ingestion"
+            assert len(avl_tree) == len(rows) - 2 and avl_tree.search("The C Programming Language").value == \
+                "9780131103627", "AVL tree should hold every accepted title"
+            check_avl_invariants(avl_tree.root)
+
+        # Lines that aren't JSON, or aren't objects, are rejected without stopping the ingest
+        broken_path = os.path.join(directory, "broken.jsonl")
+        with open(broken_path, "w", encoding="utf-8") as f:
+            f.write('{"isbn": "9780262046305", "title": "Introduction to Algorithms"}\n{"isbn": \n[1, 2]\n"text"\n')
+            f.write('{"isbn": "0131103628", "title": "The C Programming Language"}\n')
+        for workers in (0, 2):
+            catalog = LibraryCatalog()
+            stats = ingest(broken_path, catalog, workers=workers)
+            assert (stats.accepted, stats.rejected) == (2, 3), f"Bad JSONL lines should be counted as rejected: {stats}"
+
+    print("Catalog ingestion tests passed.")
+
+def test_key_encoding():
+    """
+    Test ISBN integer encoding, the symbol table, and EncodedCatalog against
+    ScalableHashTable: lookups by either ISBN form, title and author queries,
+    updates and removals, and the array('Q') author posting lists.
+    """
+    print("Testing key encoding...")
+    assert encode_isbn("978-0262046305") == 9780262046305 and decode_isbn(9780262046305) == "9780262046305", \
+        "ISBN-13s should round-trip through their integer code"
+    assert encode_isbn("0-201-61622-X") == encode_isbn("9780201616224") < 2 ** 64, \
+        "ISBN-10s should encode like their ISBN-13 form"
+    try:
+        encode_isbn("978-0262046306")
+        assert False, "An ISBN with a bad check digit should be rejected"
+    except ValueError:
+        pass
+
+    symbols = SymbolTable()
+    assert symbols.intern("Knuth") == symbols.intern("Kn" + "uth") == 0 and symbols.intern("Cormen") == 1, \
+        "Equal strings should share one id"
+    assert symbols[1] == "Cormen" and symbols.id_of("Nobody") is None and len(symbols) == 2, \
+        "Ids should map back to their strings"
+
+    catalog = EncodedCatalog()
+    table = ScalableHashTable()
+    for i in range(3000):
+        first12 = f"979{i:09d}"
+        check = (10 - sum(int(d) * (3 if k % 2 else 1) for k, d in enumerate(first12)) % 10) % 10
+        book = (f"Book {i % 2500}", f"Author {i % 40}")
+        catalog.add_book(f"{first12}{check}", book)
+        table.add_book(f"{first12}{check}", book)
+    catalog.add_book("0-13-110362-8", ("The C Programming Language", "Brian W. Kernighan"))
+    table.add_book("9780131103627", ("The C Programming Language", "Brian W. Kernighan"))
+    assert len(catalog) == 3001 and len(catalog.authors) == 41, "Each author should be stored once"
+
+    isbns = list(table.isbns_by_title.values())
+    lookups = [isbn for group in isbns for isbn in group] + ["9790000000000", "not an isbn"]
+    assert catalog.search_many_by_isbn(lookups) == table.search_many_by_isbn(lookups), \
+        "Batch lookups should match the string-keyed hash table"
+    assert catalog.search_by_isbn("0131103628") == catalog.search_by_isbn("978-0-13-110362-7") == \
+        ("The C Programming Language", "Brian W. Kernighan"), "Either ISBN form should find the book"
+    assert catalog.search_by_code(9780131103627)[1] == "Brian W. Kernighan", "Lookups by code should work"
+    for title in ("Book 7", "Book 2600", "Missing"):
+        assert catalog.search_by_title(title) == table.search_by_title(title), f"Title lookup for {title!r} differs"
+    postings = catalog.codes_by_author("Author 3")
+    assert postings.typecode == "Q" and [decode_isbn(code) for code in postings] == \
+        catalog.search_by_author("Author 3") == table.search_by_author("Author 3"), \
+        "Author postings should be an array('Q') matching the hash table's ISBNs"
+    postings.append(9790000000000)
+    assert catalog.search_by_author("Author 3") == table.search_by_author("Author 3"), \
+        "Changing the array codes_by_author returns should leave the catalog alone"
+
+    moved = table.search_by_title("Book 7")
+    catalog.add_book(moved, ("Book 7", "Author 39"))
+    table.add_book(moved, ("Book 7", "Author 39"))
+    for isbn in isbns[5]:
+        assert catalog.remove_book(isbn) == table.remove_book(isbn) == True, f"Failed to remove {isbn}"
+    assert catalog.remove_book(isbns[5][0]) == False and catalog.remove_book("junk") == False, \
+        "Removing a missing book should return False"
+    for author in ("Author 3", "Author 39", "Author 5"):
+        assert catalog.search_by_author(author) == table.search_by_author(author), \
+            f"Updates and removals should keep {author}'s postings in step"
+    assert catalog.search_by_title("Book 7") == table.search_by_title("Book 7") and \
+        catalog.search_by_title("Book 5") == "Book not found", "Title entries should follow removals"
+
+    print("Key encoding tests passed.")
+
+def test_title_search():
+    """
+    Test the full-text title index: multi-word matching, typo-tolerant search,
+    top-k ranking, and incremental updates and removals.
+    """
+    print("Testing title search index...")
+    index = TitleSearchIndex()
+    books = [("978-0262046305", "Introduction to Algorithms", "Thomas H. Cormen"),
+             ("978-0131103627", "The C Programming Language", "Brian W. Kernighan"),
+             ("978-0201616224", "The Mythical Man-Month", "Frederick P. Brooks"),
+             ("978-0134685991", "Effective Java", "Joshua Bloch"),
+             ("978-1593279288", "Python Crash Course", "Eric Matthes"),
+             ("978-1491946008", "Fluent Python", "Luciano Ramalho"),
+             ("978-0596007126", "Head First Design Patterns", "Eric Freeman")]
+    for book in books:
+        index.add_book(*book)
+
+    assert edit_distance("pyhton", "python", 2) == 2 and edit_distance("kitten", "sitting", 1) == 2, \
+        "Edit distance should be exact within the limit and limit + 1 beyond it"
+    assert index.match("python") == ["978-1593279288", "978-1491946008"], "Every book with the word should match"
+    assert index.match("PYTHON crash") == ["978-1593279288"], "Multi-word queries should intersect, ignoring case"
+    assert index.match("eric") == ["978-1593279288", "978-0596007126"], "Author names should be searchable"
+    assert index.match("python java") == [] and index.match("pythn") == [], "match should be exact and conjunctive"
+
+    assert [r[0] for r in index.search("Pyhton Crash")] == ["978-1593279288"], "Typos should be corrected"
+    assert index.search("Pyhton Crash", fuzzy=False) == [], "Typos shouldn't match without fuzzy"
+    assert index.search("algoritms")[0][1] == "Introduction to Algorithms", "A dropped letter should be corrected"
+    assert index.search("man month mythcal")[0][2] == "Frederick P. Brooks", "Hyphenated words should be split"
+    assert index.search("zzzzzz") == [] and index.search("") == [], "Unknown words should find nothing"
+
+    # Ranking: the nearest correction wins, and rarer words score higher
+    index.add_book("978-0000000002", "Pattern Recognition", "William Gibson")
+    assert [r[1] for r in index.search("pattern")] == ["Pattern Recognition"], \
+        "Only the exact word should match when it exists"
+    assert [r[1] for r in index.search("patern")] == ["Pattern Recognition"], \
+        "A one-edit correction should be preferred over a two-edit one"
+    index.add_book("978-0000000003", "The Book Thief", "Markus Zusak")
+    index.add_book("978-0000000004", "The Book of Dust", "Philip Pullman")
+    index.add_book("978-0000000005", "Box of Rain", "Robert Hunter")
+    ranked = index.search("bok")
+    assert [r[1] for r in ranked] == ["Box of Rain", "The Book Thief", "The Book of Dust"], \
+        "Equally close corrections should rank the rarer word first"
+    assert ranked[0][3] > ranked[1][3] == ranked[2][3], "Scores should follow word rarity"
+    assert len(index.search("the", k=1)) == 1 and len(index.search("e", k=5)) == 0, "k should bound the results"
+
+    # Updates replace the indexed words; removals drop the book
+    index.add_book("978-1491946008", "Fluent Python, Second Edition", "Luciano Ramalho")
+    assert index.match("second edition") == ["978-1491946008"], "Updated titles should be searchable"
+    assert index.match("python") == ["978-1593279288", "978-1491946008"], "Updating shouldn't duplicate a book"
+    assert index.remove_book("978-1593279288") and not index.remove_book("978-1593279288"), \
+        "remove_book should report whether the book was indexed"
+    assert index.match("crash") == [] and index.search("python")[0][1] == "Fluent Python, Second Edition", \
+        "Removed books shouldn't be returned"
+
+    # Enough removals to trigger a rebuild; the index must answer the same afterwards
+    random.seed(14)
+    words = ["red", "green", "blue", "river", "stone", "night", "garden", "winter", "silver", "shadow"]
+    expected = {}
+    for i in range(2000):
+        isbn = f"isbn-{i}"
+        title = " ".join(random.sample(words, 3))
+        index.add_book(isbn, title, f"Author {i % 7}")
+        expected[isbn] = title
+    for i in range(0, 2000, 3):
+        index.remove_book(f"isbn-{i}")
+        del expected[f"isbn-{i}"]
+    assert len(index) == len(expected) + 10, "Index size should count live books only"
+    wanted = sorted(isbn for isbn, title in expected.items() if {"river", "stone"} <= set(title.split()))
+    assert sorted(index.match("stone river")) == wanted, "Intersections should survive removals"
+    assert len(index.search("stone rivr", k=1000)) == len(wanted), "Corrected queries should find the same books"
+    for i in range(1, 2000, 3):
+        index.remove_book(f"isbn-{i}")
+    assert index.removed < len(index), "Removing most books should compact the index"
+    assert sorted(index.match("author")) == sorted(f"isbn-{i}" for i in range(2, 2000, 3)), \
+        "Compaction should keep every live book"
+    weighted = TitleSearchIndex()
+    for i in range(4):
+        weighted.add_book(f"w-{i}", "rare" if i == 0 else "common")
+    before = weighted._weight("rare")
+    weighted.remove_book("w-3")
+    assert weighted._weight("rare") < before, "Word weights should count live books only, not removed ones"
+
+    # Combinations of corrections are generated best first and lazily, not all up front
+    choices = [[(3.0, "a1"), (1.0, "a2")], [(2.0, "b1"), (1.5, "b2"), (0.5, "b3")]]
+    scores = [score for score, _ in TitleSearchIndex._combinations(choices)]
+    assert scores == sorted((a + b for a in (3.0, 1.0) for b in (2.0, 1.5, 0.5)), reverse=True), \
+        "Combinations should come out in score order"
+    many = TitleSearchIndex._combinations([[(1.0 / (i + 1), f"w{word}-{i}") for i in range(8)] for word in range(12)])
+    assert next(many)[1] == {f"w{word}-0" for word in range(12)}, \
+        "The best of 8 ** 12 combinations should come first without building the rest"
+    index.search("algoritm introductin programing languag structur desgin patern")
+
+    print("Title search tests passed.")
+
+def test_book_bst():
+    """
+    Test the Phase 2 BookBST iterative insert, search and delete, including sorted
+    input that used to exceed the recursion limit.
+    """
+    print("Testing Book BST...")
+    bst = BookBST()
+    bst.insert("Introduction to Algorithms", "978-0262046305")
+    bst.insert("The C Programming Language", "978-0131103627")
+    bst.insert("The Mythical Man-Month", "978-0201616224")
+    bst.insert("Design Patterns", "978-0201633610")
+    assert bst.search("The C Programming Language").value == "978-0131103627", \
+        "Failed to find 'The C Programming Language'"
+    assert bst.delete("Introduction to Algorithms") == True, \
+        "Failed to delete the root book"
+    assert bst.search("Introduction to Algorithms") == None, \
+        "Deleted book should no longer be found"
+    assert bst.delete("Non-Existent Book") == False, \
+        "Deleting a non-existent book should return False"
+    assert bst.search("Design Patterns").value == "978-0201633610", \
+        "Deleting the root should keep the rest of the tree"
+
+    # A degenerate (sorted) tree deeper than the default recursion limit
+    bst = BookBST()
+    for i in range(3000):
+        bst.insert(i, f"ISBN-{i}")
+    assert bst.search(2999).value == "ISBN-2999", "Failed to find the deepest key"
+    assert bst.delete(1500) == True, "Failed to delete from a degenerate tree"
+    assert bst.search(1500) == None and bst.search(2999) != None, \
+        "Deleting from a degenerate tree should keep the remaining keys"
+
+    print("Book BST tests passed.")
+
+def test_avl_bulk_load():
+    """
+    Test ScalableAVLTree.bulk_load and merge, checking contents, duplicate handling
+    and that the rebuilt tree is perfectly balanced.
+    """
+    print("Testing AVL Tree bulk load...")
+    books = [("The Mythical Man-Month", "978-0201616224"),
+             ("Introduction to Algorithms", "978-0262046305"),
+             ("The C Programming Language", "978-0131103627"),
+             ("Introduction to Algorithms", "duplicate")]
+    avl_tree = ScalableAVLTree.bulk_load(books)
+    assert avl_tree.search("Introduction to Algorithms").value == "978-0262046305", \
+        "bulk_load should keep the first value for a duplicate key"
+    assert avl_tree.search("The Mythical Man-Month").value == "978-0201616224", \
+        "Failed to find 'The Mythical Man-Month' after bulk load"
+    assert avl_tree.root.height == 2, "Three keys should load into a tree of height 2"
+
+    # Merge a batch that overlaps the existing keys
+    avl_tree.merge([("Design Patterns", "978-0201633610"),
+                    ("The C Programming Language", "ignored"),
+                    ("Structure and Interpretation of Computer Programs", "978-0262510875")])
+    assert avl_tree.search("Design Patterns").value == "978-0201633610", \
+        "Failed to find merged book 'Design Patterns'"
+    assert avl_tree.search("The C Programming Language").value == "978-0131103627", \
+        "merge should keep the existing value for a duplicate key"
+    assert avl_tree.root.height == 3, "Five keys should merge into a tree of height 3"
+
+    # Build a large tree from unsorted input and merge a second batch into it
+    keys = list(range(0, 200000, 2))
+    random.shuffle(keys)
+    avl_tree = ScalableAVLTree.bulk_load((k, f"ISBN-{k}") for k in keys)
+    avl_tree.merge(((k, f"ISBN-{k}") for k in range(1, 200000, 2)), presorted=True)
+    assert avl_tree.root.height == 18, "200,000 keys should form a perfectly balanced tree"
+    assert all(avl_tree.search(k).value == f"ISBN-{k}" for k in range(0, 200000, 997)), \
+        "Failed to find keys after merging into a bulk-loaded tree"
+    avl_tree.insert(-1, "ISBN--1")
+    assert avl_tree.search(-1).value == "ISBN--1", "Insert should still work after merge"
+
+    print("AVL Tree bulk load tests passed.")
 
 def test_hash_table():
     """
-    Test the basic functionality and performance of the ScalableHashTable class.
+    Test the basic functionality and scalability of the ScalableHashTable class.
     This includes adding books, searching by ISBN, and stress testing with a large dataset.
     """
     print("Testing Hash Table...")
@@ -66,20 +1198,90 @@ def test_hash_table():
         "Failed to find correct book for ISBN 978-0131103627"
     assert catalog.search_by_isbn("Non-Existent ISBN") == "Book not found", \
         "Should return 'Book not found' for non-existent ISBN"
-    
+
+    # Test the title and author indexes across insert, update and delete
+    assert catalog.search_by_title("Introduction to Algorithms") == "978-0262046305", \
+        "Failed to find ISBN for 'Introduction to Algorithms'"
+    assert catalog.search_by_author("Brian W. Kernighan") == ["978-0131103627"], \
+        "Failed to find books by Brian W. Kernighan"
+    catalog.add_book("978-0131103627", ("The C Programming Language, 2nd Ed.", "Brian W. Kernighan"))
+    assert catalog.search_by_title("The C Programming Language") == "Book not found", \
+        "Updating a book should drop its old title from the index"
+    assert catalog.search_by_title("The C Programming Language, 2nd Ed.") == "978-0131103627", \
+        "Updating a book should index its new title"
+    assert catalog.num_entries == 2, "Updating a book should not add an entry"
+    assert catalog.remove_book("978-0131103627") == True, "Failed to remove ISBN 978-0131103627"
+    assert catalog.remove_book("978-0131103627") == False, "Removing a missing ISBN should return False"
+    assert catalog.search_by_isbn("978-0131103627") == "Book not found", \
+        "Removed book should no longer be found by ISBN"
+    assert catalog.search_by_author("Brian W. Kernighan") == [], \
+        "Removed book should no longer be found by author"
+
+    # A malformed value is rejected before the table or its indexes change
+    state = (catalog.num_entries, dict(catalog.isbns_by_title), dict(catalog.isbns_by_author))
+    for bad in (("Only a title",), "ab", ["Title", "Author"]):
+        try:
+            catalog.add_book("978-bad", bad)
+            assert False, f"Book data {bad!r} should be rejected"
+        except ValueError:
+            pass
+    assert (catalog.num_entries, catalog.isbns_by_title, catalog.isbns_by_author) == state and \
+        catalog.search_by_isbn("978-bad") == "Book not found" and catalog.remove_book("978-bad") == False, \
+        "A rejected value should leave the table and both indexes unchanged"
+
     print("Hash Table basic tests passed.")
     
     # Stress test Hash Table with a large number of insertions
     print("Stress testing Hash Table...")
-    start_time = time.time()
     for i in range(1000000):
         catalog.add_book(f"978-{i}", (f"Book {i}", f"Author {i}"))
-    end_time = time.time()
-    print(f"Inserting 1 million books into Hash Table took {end_time - start_time:.2f} seconds.")
+    assert catalog.num_entries == 1000001, "Every inserted book should be stored"
+    assert catalog.search_by_isbn("978-999999") == ("Book 999999", "Author 999999"), \
+        "Failed to find ISBN after stress insertion"
+
+def test_compact_hash_table():
+    """
+    Test the open-addressing CompactHashTable, including lookups and updates made
+    while an incremental resize is still migrating entries out of the old arrays.
+    """
+    print("Testing Compact Hash Table...")
+    catalog = CompactHashTable()
+
+    catalog.add_book("978-0262046305", ("Introduction to Algorithms", "Thomas H. Cormen"))
+    catalog.add_book("978-0131103627", ("The C Programming Language", "Brian W. Kernighan"))
+
+    assert catalog.search_by_isbn("978-0262046305") == ("Introduction to Algorithms", "Thomas H. Cormen"), \
+        "Failed to find correct book for ISBN 978-0262046305"
+    assert catalog.search_by_isbn("Non-Existent ISBN") == "Book not found", \
+        "Should return 'Book not found' for non-existent ISBN"
+    assert catalog.search_by_title("The C Programming Language") == "978-0131103627", \
+        "Failed to find ISBN for 'The C Programming Language'"
+
+    # Insert until a resize is in progress and check every key is still reachable
+    i = 0
+    while catalog.old_hashes is None:
+        catalog.add_book(f"978-{i}", (f"Book {i}", f"Author {i}"))
+        i += 1
+    catalog.add_book("978-0", ("Updated Book 0", "Author 0"))
+    for j in range(i):
+        expected = ("Updated Book 0", "Author 0") if j == 0 else (f"Book {j}", f"Author {j}")
+        assert catalog.search_by_isbn(f"978-{j}") == expected, \
+            f"Lost ISBN 978-{j} during incremental resize"
+    assert catalog.search_by_title(f"Book {i - 1}") == f"978-{i - 1}", \
+        "Title search should cover entries that are not migrated yet"
+    assert catalog.num_entries == i + 2, "Updating an ISBN should not add an entry"
+
+    print("Compact Hash Table basic tests passed.")
+
+    print("Stress testing Compact Hash Table...")
+    for i in range(1000000):
+        catalog.add_book(f"978-{i}", (f"Book {i}", f"Author {i}"))
+    assert catalog.search_by_isbn("978-999999") == ("Book 999999", "Author 999999"), \
+        "Failed to find ISBN after stress insertion"
 
 def test_checked_out_books():
     """
-    Test the basic functionality and performance of the OptimizedCheckedOutBooks class.
+    Test the basic functionality and scalability of the OptimizedCheckedOutBooks class.
     This includes checking out and returning books, and stress testing with a large dataset.
     """
     print("Testing Checked Out Books (Hash Map)...")
@@ -99,11 +1301,61 @@ def test_checked_out_books():
     
     # Stress test Checked Out Books with a large number of check-outs
     print("Stress testing Checked Out Books...")
-    start_time = time.time()
     for i in range(1000000):
         checked_out_books.check_out(f"Book {i}")
-    end_time = time.time()
-    print(f"Checking out 1 million books took {end_time - start_time:.2f} seconds.")
+    assert len(checked_out_books.checked_out_books) == 1000001, \
+        "Every checked-out book should be recorded"
+
+def test_checkout_ledger():
+    """
+    Test CheckoutLedger loan records, the per-patron index, renewals and the
+    due-date heap used for overdue sweeps, checked against a brute-force scan.
+    """
+    print("Testing Checkout Ledger...")
+    ledger = CheckoutLedger()
+    assert ledger.check_out("978-0262046305", "alice", 10, "Introduction to Algorithms") == True, \
+        "Failed to check out 978-0262046305"
+    assert ledger.check_out("978-0262046305", "bob", 12) == False, \
+        "A book already on loan can't be checked out again"
+    ledger.check_out("978-0131103627", "alice", 5)
+    ledger.check_out("978-0201616224", "bob", 20)
+
+    assert sorted(loan.isbn for loan in ledger.loans_for("alice")) == ["978-0131103627", "978-0262046305"], \
+        "loans_for should list all of alice's loans"
+    assert [loan.isbn for loan in ledger.overdue(11)] == ["978-0131103627", "978-0262046305"], \
+        "overdue should list loans due before now, earliest first"
+    assert ledger.overdue(5) == [], "A loan due exactly now is not overdue"
+    assert ledger.renew("978-0131103627", 30) == True, "Failed to renew 978-0131103627"
+    assert [loan.isbn for loan in ledger.overdue(11)] == ["978-0262046305"], \
+        "A renewed loan should not be overdue at its old due date"
+    assert ledger.next_due().isbn == "978-0262046305", "next_due should skip the stale renewal entry"
+    assert ledger.return_book("978-0262046305") == True, "Failed to return 978-0262046305"
+    assert ledger.return_book("978-0262046305") == False, "Returning a book twice should return False"
+    assert ledger.overdue(11) == [], "Returned loans should not be overdue"
+    assert ledger.loans_for("carol") == [], "A patron without loans should have none"
+
+    # Random check-outs, returns and renewals against a brute-force scan
+    rng = random.Random(3)
+    ledger = CheckoutLedger()
+    for step in range(20000):
+        isbn = f"978-{rng.randrange(3000)}"
+        action = rng.random()
+        if action < 0.5:
+            ledger.check_out(isbn, f"patron {rng.randrange(50)}", rng.randrange(10000))
+        elif action < 0.8:
+            ledger.return_book(isbn)
+        else:
+            ledger.renew(isbn, rng.randrange(10000))
+        if step % 2000 == 0:
+            now = rng.randrange(10000)
+            expected = sorted((loan.due, loan.isbn) for loan in ledger.loans.values() if loan.due < now)
+            assert sorted((loan.due, loan.isbn) for loan in ledger.overdue(now)) == expected, \
+                "overdue should match a full scan of active loans"
+    assert len(ledger.due_heap) <= 2 * len(ledger) + 65, "Stale heap entries should be compacted"
+    assert sum(len(ledger.loans_for(f"patron {p}")) for p in range(50)) == len(ledger), \
+        "Per-patron index should cover every active loan"
+
+    print("Checkout Ledger tests passed.")
 
 def run_all_tests():
     """
@@ -113,12 +1365,50 @@ def run_all_tests():
     
     # Run tests for AVL Tree
     test_avl_tree()
+    test_avl_bulk_load()
+    test_avl_delete()
+    test_avl_ordered_queries()
+    test_avl_persistent()
+
+    # Run tests for the batch lookup APIs
+    test_search_many()
+
+    # Run tests for the snapshot files
+    test_snapshots()
+
+    # Run tests for the thread-safe variants and the sharded catalog
+    test_concurrent_structures()
+    test_sharded_catalog()
+
+    # Run tests for the asyncio service and the instrumentation
+    test_catalog_service()
+    test_instrumentation()
+
+    # Run tests for the write-ahead log
+    test_write_ahead_log()
+
+    # Run tests for the lookup cache
+    test_lookup_cache()
+
+    # Run tests for the ingestion pipeline and the title search index
+    test_catalog_ingest()
+    test_title_search()
+
+    # Run tests for the integer ISBN and interned string encoding
+    test_key_encoding()
+
+    # Run tests for the Phase 2 Binary Search Tree
+    test_book_bst()
     
     # Run tests for Hash Table
     test_hash_table()
+
+    # Run tests for the open-addressing Hash Table
+    test_compact_hash_table()
     
     # Run tests for Checked Out Books
     test_checked_out_books()
+    test_checkout_ledger()
     
     print("All tests passed successfully.")
 
@@ -0,0 +1,306 @@
+"""
+This code defines a full-text search index over book titles and authors, for
+patrons who don't type exact titles. Titles and authors are split into lowercase
+word tokens. Each token has a posting list, an array('I') of the ids of the books
+containing it. Ids are handed out in increasing order, so posting lists are sorted
+just by appending. A query matches the books that contain every query word. These
+are found by walking the shortest posting list and narrowing the others to the
+matching id ranges by binary search. Query words that aren't in the vocabulary
+are treated as typos and replaced by their nearest corrections. One-edit
+corrections are found by generating every variant of the word one edit away and
+looking it up. Two-edit corrections are tried only when there are none at one
+edit. Their candidates come from a trigram index over the vocabulary and are
+confirmed with a bounded edit distance. A match scores the summed inverse
+document frequency of its words, with corrected words scaled down by their edit
+distance. Every combination of word choices has a fixed score, so combinations
+are generated lazily, best first, from a heap, and the search stops as soon as it
+has k books or has tried MAX_COMBINATIONS of them. add_book and
+remove_book keep the index up to date incrementally.
+"""
+import heapq
+import math
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from itertools import chain, islice
+
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+MAX_EXPANSIONS = 8  # Corrections tried per misspelled query word
+MAX_COMBINATIONS = 64  # Combinations of word choices tried per search
+INTERSECT_BLOCK = 32  # Ids first taken at a time from the shortest posting list
+MAX_INTERSECT_BLOCK = 4096
+
+
+def tokenize(text):
+    # Lowercase word tokens of text
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def trigrams(token):
+    # Distinct trigrams of token padded with "$$" on both sides; one edit removes at most 3
+    padded = f"$${token}$$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def distance_from(a):
+    """
+    Return a function (b, limit) -> Levenshtein distance between a and b, capped at
+    limit + 1, for checking many strings against the same a. It uses Myers'
+    bit-parallel algorithm: bit i of pv (mv) says that row i + 1 of the current DP
+    column is one more (less) than row i, so each character of b updates a whole
+    column with a few integer operations.
+    """
+    positions = {}
+    for i, char in enumerate(a):
+        positions[char] = positions.get(char, 0) | 1 << i
+    mask = (1 << len(a)) - 1
+    high = 1 << (len(a) - 1) if a else 0
+
+    def distance(b, limit):
+        if abs(len(a) - len(b)) > limit:
+            return limit + 1
+        if not a:
+            return min(len(b), limit + 1)
+        pv, mv, score = mask, 0, len(a)
+        for char in b:
+            eq = positions.get(char, 0)
+            xv = eq | mv
+            xh = (((eq & pv) + pv) ^ pv) | eq
+            ph = mv | ~(xh | pv)
+            mh = pv & xh
+            if ph & high:
+                score += 1
+            elif mh & high:
+                score -= 1
+            ph = (ph << 1) | 1
+            pv = ((mh << 1) | ~(xv | ph)) & mask
+            mv = ph & xv
+        return min(score, limit + 1)
+
+    return distance
+
+
+def edit_distance(a, b, limit):
+    # Levenshtein distance between a and b, or limit + 1 if it exceeds limit
+    return distance_from(a)(b, limit)
+
+
+def auto_edits(term):
+    # Edits tolerated in a query word: none up to 2 letters, one up to 5, two beyond
+    return 0 if len(term) < 3 else 1 if len(term) < 6 else 2
+
+
+class TitleSearchIndex:
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        # Per-book columns indexed by book id (isbn is None once removed), the ISBN -> id map,
+        # token -> posting array, the vocabulary's trigrams grouped by token length, and the
+        # characters used in the vocabulary
+        self.isbns = []
+        self.titles = []
+        self.authors = []
+        self.ids_by_isbn = {}
+        self.postings = {}
+        self.grams_by_length = {}
+        self.alphabet = set()
+        self.removed = 0
+
+    def __len__(self):
+        # Number of indexed books
+        return len(self.ids_by_isbn)
+
+    def add_book(self, isbn, title, author=""):
+        # Index a book under the words of its title and author, replacing any earlier entry
+        if isbn in self.ids_by_isbn:
+            self.remove_book(isbn)
+        book_id = len(self.isbns)
+        self.isbns.append(isbn)
+        self.titles.append(title)
+        self.authors.append(author)
+        self.ids_by_isbn[isbn] = book_id
+        postings = self.postings
+        for token in set(tokenize(title)).union(tokenize(author)):
+            posting = postings.get(token)
+            if posting is None:
+                posting = postings[token] = array("I")
+                self._add_to_vocabulary(token)
+            posting.append(book_id)
+
+    def _add_to_vocabulary(self, token):
+        # Register a new token in the trigram index and the alphabet
+        by_gram = self.grams_by_length.setdefault(len(token), {})
+        for gram in trigrams(token):
+            by_gram.setdefault(gram, []).append(token)
+        self.alphabet.update(token)
+
+    def remove_book(self, isbn):
+        # Forget a book; return False if it wasn't indexed. Its posting entries stay behind and
+        # are skipped, until removed books outnumber live ones and the index is rebuilt.
+        book_id = self.ids_by_isbn.pop(isbn, None)
+        if book_id is None:
+            return False
+        self.isbns[book_id] = self.titles[book_id] = self.authors[book_id] = None
+        self.removed += 1
+        if self.removed > len(self.ids_by_isbn):
+            self._compact()
+        return True
+
+    def _compact(self):
+        # Rebuild from the live books, dropping stale posting entries and unused tokens
+        books = [(isbn, self.titles[i], self.authors[i]) for i, isbn in enumerate(self.isbns) if isbn is not None]
+        self._reset()
+        for book in books:
+            self.add_book(*book)
+
+    def _weight(self, token):
+        # Inverse document frequency of token among the live books. Posting arrays still hold
+        # removed books until the next compaction, so both counts may include a few of them.
+        return math.log(1 + (len(self.isbns) - self.removed) / len(self.postings[token]))
+
+    def corrections(self, term, max_edits=None):
+        """
+        Return the vocabulary tokens nearest to term, at most max_edits edits away
+        (default: by auto_edits), as (distance, token) pairs, most common first.
+        """
+        max_edits = auto_edits(term) if max_edits is None else max_edits
+        if max_edits < 1:
+            return []
+        postings = self.postings
+        found = [token for token in self._one_edit_variants(term) if token in postings]
+        distance = 1
+        if not found and max_edits > 1:
+            distance, found = self._far_corrections(term, max_edits)
+        found.sort(key=lambda token: (-len(postings[token]), token))
+        return [(distance, token) for token in found]
+
+    def _one_edit_variants(self, term):
+        # Every string one deletion, substitution or insertion (over the alphabet) away from term
+        alphabet = self.alphabet
+        splits = [(term[:i], term[i:]) for i in range(len(term) + 1)]
+        variants = {head + tail[1:] for head, tail in splits if tail}
+        variants.update(head + char + tail[1:] for head, tail in splits if tail for char in alphabet)
+        variants.update(head + char + tail for head, tail in splits for char in alphabet)
+        variants.discard(term)
+        return variants
+
+    def _far_corrections(self, term, max_edits):
+        # (distance, tokens) for the nearest tokens 2 to max_edits edits from term. A token
+        # within d edits keeps all but at most 3*d of term's trigrams, so only tokens of a
+        # close enough length that pass that count get a full edit distance check.
+        grams = trigrams(term)
+        counts = Counter()
+        for length in range(len(term) - max_edits, len(term) + max_edits + 1):
+            by_gram = self.grams_by_length.get(length)
+            if by_gram:
+                counts.update(chain.from_iterable(by_gram.get(gram, ()) for gram in grams))
+        for edits in range(2, max_edits + 1):
+            needed = len(grams) - 3 * edits
+            if needed > 0:
+                candidates = [token for token, count in counts.items()
+                              if count >= needed and abs(len(token) - len(term)) <= edits]
+            else:
+                # Too many edits allowed for the trigram count to rule anything out
+                candidates = [token for token in self.postings if abs(len(token) - len(term)) <= edits]
+            distance = distance_from(term)
+            found = [token for token in candidates if distance(token, edits) == edits]
+            if found:
+                return edits, found
+        return max_edits, []
+
+    def _choices(self, term, fuzzy):
+        # (weight, token) options for one query word: the word itself if indexed, otherwise
+        # (with fuzzy) its closest corrections, weighted down by edit distance
+        if term in self.postings:
+            return [(self._weight(term), term)]
+        if not fuzzy:
+            return []
+        return [(self._weight(token) * (1 - distance / (len(term) + 1)), token)
+                for distance, token in self.corrections(term)[:MAX_EXPANSIONS]]
+
+    def _intersect(self, tokens):
+        # Yield the ids found in every token's posting array, in increasing order. The shortest
+        # array is walked in blocks. Each other array is narrowed to the block's id range by
+        # binary search, then intersected as a set when that slice is small, or probed id by id
+        # when it is much larger than the block. Yielding per block keeps it lazy.
+        lists = sorted((self.postings[token] for token in tokens), key=len)
+        first, rest = lists[0], lists[1:]
+        if not rest:
+            yield from first
+            return
+        start, size = 0, INTERSECT_BLOCK
+        while start < len(first):
+            # Blocks double in size, so a search that stops after a few results stays cheap
+            block = first[start:start + size]
+            start += size
+            size = min(2 * size, MAX_INTERSECT_BLOCK)
+            matches = set(block)
+            for other in rest:
+                low = bisect_left(other, block[0])
+                high = bisect_right(other, block[-1], low)
+                if high - low <= 4 * len(matches):
+                    matches.intersection_update(other[low:high])
+                else:
+                    kept = set()
+                    for book_id in matches:
+                        j = bisect_left(other, book_id, low, high)
+                        if j < high and other[j] == book_id:
+                            kept.add(book_id)
+                    matches = kept
+                if not matches:
+                    break
+            yield from sorted(matches)
+
+    def match(self, query):
+        # ISBNs of the books containing every word of query exactly, in the order they were added
+        terms = set(tokenize(query))
+        if not terms or not terms <= self.postings.keys():
+            return []
+        return [self.isbns[i] for i in self._intersect(terms) if self.isbns[i] is not None]
+
+    @staticmethod
+    def _combinations(choices):
+        # Yield (score, tokens) for every combination of one choice per word, best first. Each
+        # word's choices are sorted by weight, so the best combination takes every word's first
+        # choice, and each next best one differs from an already yielded one by moving a single
+        # word to its next choice. A heap over those candidates yields them lazily, instead of
+        # building all len(choices[0]) * len(choices[1]) * ... combinations up front.
+        choices = [sorted(options, key=lambda option: -option[0]) for options in choices]
+        start = (0,) * len(choices)
+        heap = [(-sum(options[0][0] for options in choices), start)]
+        queued = {start}
+        while heap:
+            negative_score, picks = heapq.heappop(heap)
+            yield -negative_score, {choices[word][pick][1] for word, pick in enumerate(picks)}
+            for word, pick in enumerate(picks):
+                if pick + 1 < len(choices[word]):
+                    following = picks[:word] + (pick + 1,) + picks[word + 1:]
+                    if following not in queued:
+                        queued.add(following)
+                        score = sum(choices[w][p][0] for w, p in enumerate(following))
+                        heapq.heappush(heap, (-score, following))
+
+    def search(self, query, k=10, fuzzy=True):
+        """
+        Return up to k (isbn, title, author, score) results for the books containing
+        every word of query, best first. With fuzzy, a word missing from the vocabulary
+        matches its closest corrections instead. Books with equal scores come back in
+        the order they were added.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        choices = [self._choices(term, fuzzy) for term in terms]
+        if not terms or not all(choices) or k <= 0:
+            return []
+        results = []
+        seen = set()
+        for score, tokens in islice(self._combinations(choices), MAX_COMBINATIONS):
+            for book_id in self._intersect(tokens):
+                if book_id in seen or self.isbns[book_id] is None:
+                    continue
+                seen.add(book_id)
+                results.append((self.isbns[book_id], self.titles[book_id], self.authors[book_id], score))
+                if len(results) == k:
+                    return results
+        return results
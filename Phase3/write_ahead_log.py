@@ -0,0 +1,526 @@
+"""
+This code makes the catalog and the checked-out books map durable without
+re-serializing them after every change. DurableCatalog records each add_book,
+remove_book, check_out and return_book in an append-only write-ahead log before
+acknowledging it, and rebuilds its state on startup from the latest checkpoint
+plus the log written since.
+
+WriteAheadLog assigns every record a log sequence number (LSN) and writes it as
+one line: a CRC32 of the JSON payload, then the payload. With group commit, a
+committer thread writes every record that has queued up while the previous fsync
+was running, and then fsyncs once for the whole group. Without it, each append
+writes and fsyncs on its own. A torn or corrupt line at the end of the log (from a
+crash mid-write) fails its checksum, and replay stops there. A change is applied to
+the in-memory catalog only once its record is durable, in log order, so readers
+never see a write that could still be lost. If a write or fsync fails, every
+writer waiting on it gets the error and the log refuses further writes; reopening
+the directory recovers from what reached the disk.
+
+Checkpoints are incremental. DurableCatalog tracks which ISBNs and titles have
+changed since the last checkpoint, and a background thread periodically writes
+just those entries to a delta file. Once the deltas add up to half the size of
+the last full (base) checkpoint, a new base is written instead and older files
+are deleted. Each checkpoint starts a new log segment, so the segments it covers
+can be deleted as soon as it is safely on disk. Checkpoint files use the same
+checksummed JSON encoding as log records, as a single line. Recovery loads the
+newest base, applies the later deltas in order, then replays the log records
+past the last checkpoint's LSN.
+"""
+import gc
+import json
+import os
+import threading
+import zlib
+from collections import deque
+
+from scalable_hash_table import ScalableHashTable
+from optimized_checked_out_books import OptimizedCheckedOutBooks
+
+_json_decode = json.JSONDecoder().decode  # Skips json.loads's encoding detection on every record
+
+
+def _encode(record):
+    # One log line: CRC32 of the JSON payload (8 hex digits), a space, the payload
+    payload = json.dumps(record, separators=(",", ":")).encode()
+    return b"%08x %s\n" % (zlib.crc32(payload), payload)
+
+
+def _decode(line):
+    # The record on a log line, or None if the line is torn or corrupt
+    if not line.endswith(b"\n") or len(line) < 10:
+        return None
+    payload = line[9:-1]
+    try:
+        if int(line[:8], 16) != zlib.crc32(payload):
+            return None
+        return _json_decode(payload.decode())
+    except ValueError:
+        return None
+
+
+def _check_strings(*values):
+    # Reject arguments that couldn't be applied or replayed, before they reach the log
+    for value in values:
+        if not isinstance(value, str):
+            raise TypeError(f"Expected a string, got {type(value).__name__}: {value!r}")
+
+
+def _fsync_directory(directory):
+    # Make new, renamed and deleted files in directory durable
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class WriteAheadLog:
+    def __init__(self, directory, next_lsn=1, group_commit=True, sync=True):
+        # Log segments are named wal-<first LSN>.log; sync=False skips fsync (not crash-safe)
+        self.directory = directory
+        self.group_commit = group_commit
+        self.sync = sync
+        self.next_lsn = next_lsn
+        self.durable_lsn = next_lsn - 1
+        self.pending = []  # (LSN, encoded line) pairs not yet written
+        self.closing = False
+        self.error = None  # The exception that stopped the log; every later write fails with it
+        self.commits = 0  # Number of group writes, to see how many records share an fsync
+        self.cond = threading.Condition()
+        self.io_lock = threading.Lock()  # Held while writing to or switching the segment file
+        self.file = self._open_segment(next_lsn)
+        self.committer = None
+        if group_commit:
+            self.committer = threading.Thread(target=self._commit_loop, daemon=True)
+            self.committer.start()
+
+    def _open_segment(self, first_lsn):
+        path = os.path.join(self.directory, f"wal-{first_lsn:016d}.log")
+        segment = open(path, "ab", buffering=0)
+        _fsync_directory(self.directory)
+        return segment
+
+    def append(self, record):
+        # Queue record (a JSON-serializable list) and return its LSN. Callers must append in the
+        # order they apply changes; wait(lsn) blocks until the record is durable.
+        with self.cond:
+            if self.error is not None:
+                raise self.error
+            lsn = self.next_lsn
+            self.next_lsn += 1
+            self.pending.append((lsn, _encode([lsn] + record)))
+            if self.group_commit:
+                self.cond.notify_all()
+                return lsn
+        self._write_pending()
+        return lsn
+
+    def wait(self, lsn):
+        # Block until every record up to lsn is on disk; raises the log's error if it never will be
+        with self.cond:
+            while self.durable_lsn < lsn:
+                if self.error is not None:
+                    raise self.error
+                if self.closing and (self.committer is None or not self.committer.is_alive()):
+                    raise RuntimeError("Write-ahead log closed before the record was written")
+                self.cond.wait()
+
+    def _write_pending(self):
+        # Write and fsync everything queued so far as one group, then wake the waiters
+        with self.io_lock:
+            with self.cond:
+                batch, self.pending = self.pending, []
+            if not batch:
+                return
+            try:
+                self.file.write(b"".join(line for _, line in batch))
+                if self.sync:
+                    os.fsync(self.file.fileno())
+            except Exception as error:
+                self._fail(error)
+                raise
+            with self.cond:
+                self.commits += 1
+                self.durable_lsn = batch[-1][0]
+                self.cond.notify_all()
+
+    def _fail(self, error):
+        # Put the log in a failed state: drop what's queued and wake every waiter to raise error.
+        # Part of the failed group may still have reached the disk and be replayed on reopening.
+        with self.cond:
+            if self.error is None:
+                self.error = error
+            self.pending = []
+            self.cond.notify_all()
+
+    def _commit_loop(self):
+        # Group commit: while one fsync runs, new records pile up and share the next one
+        while True:
+            with self.cond:
+                while not self.pending and not self.closing:
+                    self.cond.wait()
+                if not self.pending:
+                    return
+            try:
+                self._write_pending()
+            except Exception:
+                return  # _write_pending stored the error for the waiters
+
+    def rotate(self):
+        # Flush what's queued, then start a new segment at the next LSN. Returns the last LSN in
+        # the old segments, so a checkpoint covering that LSN makes them deletable.
+        with self.io_lock:
+            with self.cond:
+                if self.error is not None:
+                    raise self.error
+                batch, self.pending = self.pending, []
+                last_lsn = self.next_lsn - 1
+            try:
+                if batch:
+                    self.file.write(b"".join(line for _, line in batch))
+                if self.sync:
+                    os.fsync(self.file.fileno())
+                self.file.close()
+                self.file = self._open_segment(last_lsn + 1)
+            except Exception as error:
+                self._fail(error)
+                raise
+            with self.cond:
+                if batch:
+                    self.commits += 1
+                self.durable_lsn = last_lsn
+                self.cond.notify_all()
+        return last_lsn
+
+    def close(self):
+        # Write everything still queued and close the segment
+        with self.cond:
+            self.closing = True
+            self.cond.notify_all()
+        if self.committer is not None:
+            self.committer.join()
+        if self.error is None:
+            self._write_pending()
+        self.file.close()
+
+
+def read_log(directory, after_lsn=0, repair=False):
+    """
+    Yield the records with an LSN above after_lsn from the log segments in
+    directory, oldest first, stopping at the first torn or corrupt line. With
+    repair=True, that line and everything after it is cut off the log, so new
+    records can be appended after the last good one.
+    """
+    segments = sorted(name for name in os.listdir(directory) if name.startswith("wal-") and name.endswith(".log"))
+    for position, name in enumerate(segments):
+        path = os.path.join(directory, name)
+        good_bytes = 0
+        torn = False
+        with open(path, "rb") as segment:
+            for line in segment:
+                record = _decode(line)
+                if record is None:
+                    torn = True
+                    break
+                good_bytes += len(line)
+                if record[0] > after_lsn:
+                    yield record
+        if torn:
+            if repair:
+                with open(path, "r+b") as segment:
+                    segment.truncate(good_bytes)
+                    os.fsync(segment.fileno())
+                for later in segments[position + 1:]:
+                    os.remove(os.path.join(directory, later))
+                _fsync_directory(directory)
+            return
+
+
+class DurableCatalog:
+    def __init__(self, directory, group_commit=True, sync=True,
+                 checkpoint_interval=30.0, checkpoint_records=100000):
+        """
+        Open the durable catalog kept in directory, recovering its state from the
+        checkpoints and log found there. A background checkpoint is taken every
+        checkpoint_interval seconds, or sooner once checkpoint_records writes have
+        been logged since the last one; checkpoint_interval=None turns background
+        checkpoints off, leaving only explicit checkpoint() calls.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.catalog = ScalableHashTable()
+        self.checked_out_books = OptimizedCheckedOutBooks()
+        self.lock = threading.Lock()  # Held while appending to the log, and by checkpoints to pause writers
+        self.applied = threading.Lock()  # Held while applying committed records to the in-memory state
+        self.unapplied = deque()  # (LSN, operation, args) of logged records, in LSN order
+        self.results = {}  # LSN -> (ok, result or exception) of records applied for another writer
+        # ISBN -> (title, author) of every book, in the order they were last added or updated. The
+        # hash table's title and author indexes list ISBNs in that order, so a base checkpoint
+        # written in it rebuilds them exactly ("earliest added" title lookups included).
+        self.books = {}
+        self.dirty_books = {}  # ISBN -> (title, author), or None if removed, since the last checkpoint
+        self.dirty_loans = {}  # title -> checked out?, since the last checkpoint
+        self.has_base = False
+        self.base_size = 0  # Entries in the last base checkpoint
+        self.delta_size = 0  # Entries in the delta checkpoints written since
+        self.checkpoint_lsn = 0
+        self.replayed = 0  # Log records replayed by recovery
+        self.checkpoint_lock = threading.Lock()
+        self.checkpoint_records = checkpoint_records
+        last_lsn = self._recover()
+        self.log = WriteAheadLog(directory, last_lsn + 1, group_commit, sync)
+        self.stop_checkpoints = threading.Event()
+        self.wake = threading.Event()  # Set by writers once checkpoint_records have been logged
+        self.checkpointer = None
+        if checkpoint_interval is not None:
+            self.checkpointer = threading.Thread(target=self._checkpoint_loop, args=(checkpoint_interval,),
+                                                 daemon=True)
+            self.checkpointer.start()
+
+    def _recover(self):
+        # Rebuild state from the newest base checkpoint, the deltas after it and the log; return
+        # the last LSN recovered. Recovery only creates objects that stay alive, so the cyclic
+        # garbage collector is paused rather than left to rescan them again and again.
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            return self._load()
+        finally:
+            if collecting:
+                gc.enable()
+
+    def _load(self):
+        for name in os.listdir(self.directory):
+            if name.endswith(".tmp"):
+                os.remove(os.path.join(self.directory, name))  # A checkpoint interrupted by a crash
+        checkpoints = sorted(name for name in os.listdir(self.directory) if name.endswith(".ckpt"))
+        bases = [name for name in checkpoints if name.startswith("base-")]
+        if bases:
+            base_lsn = int(bases[-1][5:-5])
+            deltas = [name for name in checkpoints if name.startswith("delta-") and int(name[6:-5]) > base_lsn]
+            for name in [bases[-1]] + deltas:
+                with open(os.path.join(self.directory, name), "rb") as f:
+                    checkpoint = _decode(f.read())
+                if checkpoint is None:
+                    # The log it replaced is gone, so carrying on would silently lose writes
+                    raise ValueError(f"Checkpoint {name} in {self.directory} is torn or corrupt")
+                self._apply_changes(checkpoint["books"], checkpoint["loans"])
+                self.checkpoint_lsn = checkpoint["lsn"]
+            self.has_base = True
+            self.base_size = self.catalog.num_entries + len(self.checked_out_books.checked_out_books)
+        self.dirty_books.clear()
+        self.dirty_loans.clear()
+
+        # Only the last change to each ISBN and title matters, so the log is first reduced to
+        # those and each is applied once, the same way as a delta checkpoint
+        books, loans = {}, {}
+        last_lsn = self.checkpoint_lsn
+        for lsn, operation, key, *rest in read_log(self.directory, self.checkpoint_lsn, repair=True):
+            if operation == "add_book":
+                # Re-inserting moves the ISBN to the end, matching the order add_book indexes titles in
+                books.pop(key, None)
+                books[key] = rest[0]
+            elif operation == "remove_book":
+                books[key] = None
+            elif operation in ("check_out", "return_book"):
+                loans[key] = operation == "check_out"
+            else:
+                raise ValueError(f"Unknown log operation: {operation!r}")
+            last_lsn = lsn
+            self.replayed += 1
+        self._apply_changes(books, loans)
+        return last_lsn
+
+    def _apply_changes(self, books, loans):
+        # Apply {ISBN: book or None} and {title: checked out?} changes from a checkpoint or the log
+        self.catalog.reserve(self.catalog.num_entries + len(books))
+        for isbn, book in books.items():
+            self._apply_book(isbn, book)
+        for title, checked_out in loans.items():
+            self._apply_loan(title, checked_out)
+
+    def _apply_book(self, isbn, book):
+        # Add or update (book is (title, author)) or remove (book is None) a catalog entry,
+        # remembering it for the next delta checkpoint. Re-inserting moves the ISBN to the end of
+        # both dicts, as add_book moves it to the end of its title's and author's index lists.
+        self.dirty_books.pop(isbn, None)
+        self.dirty_books[isbn] = book
+        self.books.pop(isbn, None)
+        if book is None:
+            return self.catalog.remove_book(isbn)
+        book = self.books[isbn] = tuple(book)
+        self.catalog.add_book(isbn, book)
+
+    def _apply_loan(self, title, checked_out):
+        # Check a title out or return it, remembering it for the next delta checkpoint
+        self.dirty_loans[title] = checked_out
+        if checked_out:
+            return self.checked_out_books.check_out(title)
+        return self.checked_out_books.return_book(title)
+
+    def _apply(self, operation, args):
+        # Apply one logged operation to the in-memory structures and return its result
+        if operation == "add_book":
+            return self._apply_book(args[0], args[1])
+        if operation == "remove_book":
+            return self._apply_book(args[0], None)
+        if operation == "check_out":
+            return self._apply_loan(args[0], True)
+        if operation == "return_book":
+            return self._apply_loan(args[0], False)
+        raise ValueError(f"Unknown log operation: {operation!r}")
+
+    def _apply_committed(self):
+        # Apply every logged record that is now durable, in LSN order, keeping each result for the
+        # writer that logged it. Must be called with self.applied held.
+        durable_lsn = self.log.durable_lsn
+        unapplied = self.unapplied
+        while unapplied and unapplied[0][0] <= durable_lsn:
+            lsn, operation, args = unapplied.popleft()
+            try:
+                self.results[lsn] = (True, self._apply(operation, args))
+            except Exception as error:
+                self.results[lsn] = (False, error)
+
+    def _write(self, operation, *args):
+        # Log a change, wait for its record to be durable, then apply it. The wait happens outside
+        # the lock, so concurrent writers can share one group commit. Whichever writer gets to
+        # apply first applies every committed record, so changes land in LSN order without
+        # writers waiting for each other's turn. A record that never commits is never applied.
+        with self.lock:
+            lsn = self.log.append([operation, *args])
+            self.unapplied.append((lsn, operation, args))
+        self.log.wait(lsn)
+        with self.applied:
+            self._apply_committed()
+            ok, result = self.results.pop(lsn)
+        if not ok:
+            raise result
+        if self.checkpoint_records and lsn - self.checkpoint_lsn >= self.checkpoint_records:
+            self.wake.set()
+        return result
+
+    def add_book(self, isbn, book):
+        # Add or update a book; book is (title, author). Arguments are checked before logging,
+        # since a record that fails to apply would fail again on every replay.
+        book = list(book)
+        if len(book) != 2:
+            raise ValueError(f"Expected (title, author), got {book!r}")
+        _check_strings(isbn, *book)
+        self._write("add_book", isbn, book)
+
+    def remove_book(self, isbn):
+        # Remove a book; return True if it was removed, False if it wasn't found
+        _check_strings(isbn)
+        return self._write("remove_book", isbn)
+
+    def check_out(self, title):
+        _check_strings(title)
+        self._write("check_out", title)
+
+    def return_book(self, title):
+        # Return a book; return False if it wasn't checked out
+        _check_strings(title)
+        return self._write("return_book", title)
+
+    def search_by_isbn(self, isbn):
+        return self.catalog.search_by_isbn(isbn)
+
+    def search_by_title(self, title):
+        return self.catalog.search_by_title(title)
+
+    def search_by_author(self, author):
+        return self.catalog.search_by_author(author)
+
+    def is_checked_out(self, title):
+        return title in self.checked_out_books.checked_out_books
+
+    def checkpoint(self):
+        """
+        Write a checkpoint of everything logged so far and delete the log segments
+        and older checkpoints it makes redundant; return the checkpoint's LSN.
+        Writers are paused only while the changed entries (or, for a base, all
+        entries) are copied, not while the file is written. If writing fails, the
+        changes stay marked dirty and nothing is deleted, so a later checkpoint
+        covers them.
+        """
+        with self.checkpoint_lock:
+            with self.lock, self.applied:
+                # Every record up to lsn has committed once rotate returns; apply them all
+                lsn = self.log.rotate()
+                self._apply_committed()
+                # The first checkpoint is always a base, since deltas are only read on top of one
+                changed = len(self.dirty_books) + len(self.dirty_loans)
+                full = not self.has_base or self.delta_size + changed > self.base_size // 2
+                dirty_books, dirty_loans = self.dirty_books, self.dirty_loans
+                if full:
+                    books = dict(self.books)
+                    loans = dict.fromkeys(self.checked_out_books.checked_out_books, True)
+                else:
+                    books, loans = dirty_books, dirty_loans
+                self.dirty_books = {}
+                self.dirty_loans = {}
+            kind = "base" if full else "delta"
+            path = os.path.join(self.directory, f"{kind}-{lsn:016d}.ckpt")
+            try:
+                with open(path + ".tmp", "wb") as f:
+                    f.write(_encode({"lsn": lsn, "books": books, "loans": loans}))
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(path + ".tmp", path)
+                _fsync_directory(self.directory)
+            except BaseException:
+                # Put the changes back under the ones made since, which are newer
+                with self.applied:
+                    dirty_books.update(self.dirty_books)
+                    dirty_loans.update(self.dirty_loans)
+                    self.dirty_books, self.dirty_loans = dirty_books, dirty_loans
+                if os.path.exists(path + ".tmp"):
+                    os.remove(path + ".tmp")
+                raise
+            if full:
+                self.has_base = True
+                self.base_size = len(books) + len(loans)
+                self.delta_size = 0
+            else:
+                self.delta_size += len(books) + len(loans)
+            self.checkpoint_lsn = lsn
+            self._delete_covered_files(lsn, full)
+            return lsn
+
+    def _delete_covered_files(self, lsn, full):
+        # Delete the log segments before lsn's checkpoint and, after a base, all older checkpoints
+        for name in os.listdir(self.directory):
+            if name.startswith("wal-") and name.endswith(".log"):
+                covered = int(name[4:-4]) <= lsn
+            elif name.endswith(".ckpt"):
+                covered = full and int(name[name.index("-") + 1:-5]) < lsn
+            else:
+                covered = False
+            if covered:
+                os.remove(os.path.join(self.directory, name))
+
+    def _checkpoint_loop(self, interval):
+        # Background checkpoints, every interval seconds or sooner when woken by a busy writer
+        while not self.stop_checkpoints.is_set():
+            self.wake.wait(interval)
+            self.wake.clear()
+            if not self.stop_checkpoints.is_set() and self.log.next_lsn - 1 > self.checkpoint_lsn:
+                try:
+                    self.checkpoint()
+                except OSError:
+                    pass  # E.g. a full disk; the log still holds everything, so try again next time
+
+    def close(self):
+        # Stop background checkpoints and flush the log; the state on disk stays recoverable
+        self.stop_checkpoints.set()
+        self.wake.set()
+        if self.checkpointer is not None:
+            self.checkpointer.join()
+        self.log.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()